@@ -0,0 +1,129 @@
+# agenda.py — Nessa Coiffeur — Grade da agenda: profissionais x dias x horários
+#
+# Uma semana ou um mês de todos os profissionais ativos numa passada vetorizada: cada
+# agendamento (booked/done) e bloqueio do período vira os índices das células que ele
+# cobre (np.repeat dos intervalos, em passos de `step_min`) e as células são preenchidas
+# de uma vez por índice plano (profissional, dia, horário). Fora do expediente padrão a
+# célula fica `fora`. O app guarda a grade por versão do DB e período e só monta a
+# tabela da página visível (alguns profissionais x uma semana).
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+import perf
+from availability import BUSY_STATUSES, hhmm_to_min_col
+
+FREE, BUSY, BLOCKED, OFF = "livre", "ocupado", "bloqueado", "fora"
+STATES = np.array([FREE, BUSY, BLOCKED, OFF], dtype=object)
+_FREE, _BUSY, _BLOCKED, _OFF = range(4)
+COLUMNS = ["employee_id", "date", "start_min", "time", "state", "label"]
+WEEKDAYS = "seg ter qua qui sex sáb dom".split()
+PAGE_SIZE = 8   # profissionais por página da tabela
+
+
+def _minutes(df: pd.DataFrame, col: str) -> np.ndarray:
+    return ((df[col] - df["date"]) / pd.Timedelta(minutes=1)).to_numpy("float64")
+
+
+def _cells(e, d, s, t, lo: int, step: int, n_days: int, n_slots: int):
+    """Índices planos das células cobertas por cada intervalo [s, t) e o intervalo de origem."""
+    first = np.clip(np.floor((s - lo) / step), 0, n_slots).astype("int64")
+    last = np.clip(np.ceil((t - lo) / step), 0, n_slots).astype("int64")
+    n = np.clip(last - first, 0, None)
+    src = np.repeat(np.arange(len(n)), n)
+    slot = first[src] + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    return (e[src] * n_days + d[src]) * n_slots + slot, src
+
+
+@perf.timed()
+def agenda_grid(appts: pd.DataFrame, blocks: pd.DataFrame, employees: pd.DataFrame, start,
+                days: int, step_min: int = 30) -> pd.DataFrame:
+    """Células (employee_id, date 'YYYY-MM-DD', start_min, time, state, label) de `days`
+    dias a partir de `start`, ordenadas por profissional, data e horário.
+
+    `appts`/`blocks` são os DataFrames do Model (date datetime64, start_dt/end_dt);
+    `employees` precisa de employee_id/default_start/default_end. `state` é livre, ocupado,
+    bloqueado ou fora (do expediente); `label` = "cliente · serviço" ou o motivo do bloqueio.
+    Agendamento e bloqueio na mesma célula: vale o agendamento.
+    """
+    step = int(step_min)
+    start = pd.Timestamp(start).normalize()
+    if employees.empty or days <= 0 or step <= 0:
+        return pd.DataFrame(columns=COLUMNS)
+    ids = pd.Index(employees["employee_id"].astype(str))
+    ds = hhmm_to_min_col(employees["default_start"].fillna("09:00")).fillna(9 * 60).to_numpy("int64")
+    de = hhmm_to_min_col(employees["default_end"].fillna("19:00")).fillna(19 * 60).to_numpy("int64")
+    lo, hi = int(ds.min()) // step * step, int(de.max())
+    n_emp, n_days, n_slots = len(ids), int(days), max(0, -(-(hi - lo) // step))
+    slots = lo + np.arange(n_slots) * step
+
+    # expediente: (profissional, horário), igual em todos os dias
+    inside = (slots[None, :] >= ds[:, None]) & (slots[None, :] < de[:, None])
+    state = np.where(inside, _FREE, _OFF).astype("int8")
+    state = np.broadcast_to(state[:, None, :], (n_emp, n_days, n_slots)).reshape(-1).copy()
+    label = np.full(state.shape, "", dtype=object)
+
+    end = start + pd.Timedelta(days=n_days)
+    for df, code in ((blocks, _BLOCKED), (appts, _BUSY)):   # agendamento por cima do bloqueio
+        if df.empty:
+            continue
+        df = df[(df["date"] >= start) & (df["date"] < end)]
+        if code == _BUSY:
+            df = df[df["status"].astype(str).isin(BUSY_STATUSES)]
+        e = ids.get_indexer(df["employee_id"].astype(str))
+        df, e = df[e >= 0], e[e >= 0]
+        if df.empty:
+            continue
+        s, t = _minutes(df, "start_dt"), _minutes(df, "end_dt")
+        ok = ~(np.isnan(s) | np.isnan(t))
+        df, e, s, t = df[ok], e[ok], s[ok], t[ok]
+        d = ((df["date"] - start).dt.days).to_numpy("int64")
+        idx, src = _cells(e, d, s, t, lo, step, n_days, n_slots)
+        if code == _BUSY:
+            text = (df["client_name"].fillna("").astype(str).str.strip() + " · "
+                    + df["service_name"].astype(str).str.strip()).str.strip(" ·")
+        else:
+            text = df["reason"].fillna("").astype(str).str.strip()
+        state[idx] = code
+        label[idx] = text.to_numpy(object)[src]
+
+    dates = pd.date_range(start, periods=n_days).strftime("%Y-%m-%d").to_numpy(object)
+    times = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in slots], dtype=object)
+    return pd.DataFrame({
+        "employee_id": np.repeat(ids.to_numpy(object), n_days * n_slots),
+        "date": np.tile(np.repeat(dates, n_slots), n_emp),
+        "start_min": np.tile(slots, n_emp * n_days),
+        "time": np.tile(times, n_emp * n_days),
+        "state": STATES[state],
+        "label": label,
+    })
+
+
+def page_table(grid: pd.DataFrame, employee_ids, dates, names: dict) -> pd.DataFrame:
+    """Tabela de uma página: linhas = dia + horário, colunas = profissionais da página.
+
+    Horários em que todos da página estão fora do expediente são omitidos.
+    """
+    keys = [d if isinstance(d, str) else d.strftime("%Y-%m-%d") for d in dates]
+    ids = [str(i) for i in employee_ids]
+    page = grid[grid["employee_id"].isin(ids) & grid["date"].isin(keys)]
+    if page.empty:
+        return pd.DataFrame()
+    cell = page["label"].where(page["label"] != "", page["state"])
+    cell = cell.where(page["state"] != OFF, "—")
+    cell = cell.mask(page["state"] == BLOCKED, "🔒 " + page["label"].where(page["label"] != "", BLOCKED))
+    wide = pd.DataFrame({"employee_id": page["employee_id"], "date": page["date"], "time": page["time"],
+                         "cell": cell, "off": page["state"] == OFF})
+    off = wide.groupby(["date", "time"], sort=False)["off"].all()
+    table = wide.pivot(index=["date", "time"], columns="employee_id", values="cell").reindex(columns=ids)
+    table = table[~off.reindex(table.index).to_numpy()]
+    days = pd.to_datetime(table.index.get_level_values(0))
+    labels = days.strftime("%d/%m") + " (" + np.array(WEEKDAYS, dtype=object)[days.weekday] + ")"
+    table.index = labels + " " + table.index.get_level_values(1)
+    return table.rename(columns=names).rename_axis("horário")
+
+
+def week_starts(start: dt.date, days: int) -> list[dt.date]:
+    """Início de cada página de 7 dias do período."""
+    return [start + dt.timedelta(days=d) for d in range(0, max(1, days), 7)]
@@ -1,122 +1,176 @@
-# app.py — Nessa Coiffeur (PT-BR) — Backend: JSON no GitHub
+# app.py — Nessa Coiffeur (PT-BR) — Backend: JSON no GitHub ou SQLite local
 import os
 import hmac
 import hashlib
-import base64
+import io
 import json
 import time
-from functools import wraps
+import zipfile
 
 import streamlit as st
 import pandas as pd
 import datetime as dt
 from dateutil import tz
-import requests
+
+import agenda
+import archive
+import github_api
+import perf
+import planilha
+import sheet_sync
+import storage
+from availability import SLOT_STEPS, AvailabilityIndex, SlotTaken, check_slots, earliest_slots, free_slots, to_min
+from clients import phone_digits
+from journal import Flusher, Journal
+from model import Model
+from refresher import Refresher
+from rollups import PERIODS, capacity_minutes, period_range
+from storage import month_of, op_append, op_update
+from write_queue import WriteQueue
 
 st.set_page_config(page_title="Nessa Coiffeur - Agenda", layout="wide")
 st.set_option("client.showErrorDetails", True)
 
+# Instrumentação (perf.py): spans deste rerun; o anterior fica para o painel do Admin
+_perf_prev = st.session_state.get("_perf_run")
+if _perf_prev is not None:
+    _perf_prev.finish(idle=True)   # rerun encerrado por st.stop()/st.rerun()
+st.session_state["_perf_prev"] = _perf_prev
+RUN = st.session_state["_perf_run"] = perf.start_run()
+
 # =========================
 # Config via Secrets
 # =========================
-GH_TOKEN  = st.secrets["GITHUB_TOKEN"]             # obrigatório
-GH_REPO   = st.secrets.get("GH_REPO", "yurirasch/nessacoiffeur")
-GH_BRANCH = st.secrets.get("GH_BRANCH", "main")
-DB_PATH   = st.secrets.get("DB_PATH", "db/db.json")
-
-
+STORAGE_BACKEND = str(st.secrets.get("STORAGE_BACKEND", "github")).strip().lower()  # "github" | "sqlite"
+GH_TOKEN  = st.secrets.get("GITHUB_TOKEN", "")       # obrigatório no backend "github"
+DB_REVALIDATE_SECONDS = float(st.secrets.get("DB_REVALIDATE_SECONDS", 15))
+DB_REFRESH_SECONDS = float(st.secrets.get("DB_REFRESH_SECONDS", 5))   # 0 = sem refresher em segundo plano
+GROUP_COMMIT_MS = int(st.secrets.get("GROUP_COMMIT_MS", 250))   # 0 = um commit por escrita
+SLOT_STEP_MIN = int(st.secrets.get("SLOT_STEP_MIN", 60))   # 15 | 30 | 60
+ARCHIVE_AFTER_DAYS = int(st.secrets.get("ARCHIVE_AFTER_DAYS", archive.DEFAULT_DAYS))
+JOURNAL_PATH = str(st.secrets.get("JOURNAL_PATH", "db/journal.jsonl")).strip()   # "" = escrita síncrona
+SHEET_CSV_URL = str(st.secrets.get("SHEET_CSV_URL", "")).strip()   # aba DB_AGENDAMENTOS publicada em CSV
+if SLOT_STEP_MIN not in SLOT_STEPS:
+    SLOT_STEP_MIN = 60
 
-API_BASE = "https://api.github.com"
+if STORAGE_BACKEND not in ("github", "sqlite"):
+    st.error(f"❌ STORAGE_BACKEND inválido: {STORAGE_BACKEND!r} (use 'github' ou 'sqlite').")
+    st.stop()
+if STORAGE_BACKEND == "github" and not GH_TOKEN:
+    st.error("❌ Configure GITHUB_TOKEN em st.secrets (backend 'github').")
+    st.stop()
 
 # =========================
-# Helpers GitHub API
+# Banco (DB) — backend plugável
 # =========================
-def gh_headers():
-    return {
-        "Authorization": f"Bearer {GH_TOKEN}",
-        "Accept": "application/vnd.github+json",
-    }
+@st.cache_resource(show_spinner=False)
+def gh_session():
+    # uma Session keep-alive por processo, compartilhada por todas as sessões do Streamlit
+    return github_api.new_session()
 
-def with_backoff(func):
-    @wraps(func)
-    def _wrap(*a, **kw):
-        delay = 0.7
-        for i in range(5):
-            try:
-                return func(*a, **kw)
-            except requests.HTTPError as e:
-                status = e.response.status_code if e.response is not None else None
-                # backoff para 403/429/5xx
-                if status in (403, 429) or (status and 500 <= status < 600):
-                    time.sleep(delay)
-                    delay = min(delay * 1.8, 6)
-                    continue
-                raise
-            except Exception:
-                raise
-        return func(*a, **kw)
-    return _wrap
-
-@with_backoff
-def gh_get_file(repo: str, path: str, ref: str):
-    # GET /repos/{owner}/{repo}/contents/{path}?ref=branch
-    url = f"{API_BASE}/repos/{repo}/contents/{path}"
-    r = requests.get(url, headers=gh_headers(), params={"ref": ref})
-    if r.status_code == 404:
-        # arquivo pode não existir (primeiro deploy)
-        return {"sha": None, "content": None}
-    r.raise_for_status()
-    data = r.json()
-    # content vem em base64
-    content_b64 = data.get("content", "")
-    decoded = base64.b64decode(content_b64).decode("utf-8") if content_b64 else ""
-    return {"sha": data.get("sha"), "content": decoded}
-
-@with_backoff
-def gh_put_file(repo: str, path: str, ref: str, content_str: str, sha: str | None, message: str):
-    # PUT /repos/{owner}/{repo}/contents/{path}
-    url = f"{API_BASE}/repos/{repo}/contents/{path}"
-    payload = {
-        "message": message,
-        "content": base64.b64encode(content_str.encode("utf-8")).decode("utf-8"),
-        "branch": ref,
-    }
-    if sha:
-        payload["sha"] = sha
-    r = requests.put(url, headers=gh_headers(), json=payload)
-    r.raise_for_status()
-    return r.json()
+@st.cache_resource(show_spinner=False)
+def get_storage():
+    # backend/layout conforme STORAGE_BACKEND, DB_LAYOUT e GH_API (ver storage.from_config)
+    return storage.from_config(st.secrets, session=gh_session() if STORAGE_BACKEND == "github" else None)
 
-# =========================
-# Banco (DB) no JSON
-# =========================
-@st.cache_data(ttl=60, show_spinner=False)
-def load_db():
-    res = gh_get_file(GH_REPO, DB_PATH, GH_BRANCH)
-    text = res["content"] or ""
-    sha  = res["sha"]
-    if not text:
-        # seed vazio
-        db = {
-            "clientes": [],
-            "servicos": [],
-            "funcionarios": [],
-            "agendamentos": [],
-            "bloqueios": [],
-            "generated_at": dt.datetime.utcnow().isoformat() + "Z",
-        }
+def bulk_storage():
+    # instância avulsa (sem cache) para importar/exportar/sincronizar planilhas: elas leem
+    # todos os meses, e o snapshot compartilhado de get_storage() deve guardar só os em uso
+    return storage.from_config(st.secrets, session=gh_session() if STORAGE_BACKEND == "github" else None)
+
+def after_bulk_write():
+    # a escrita foi por outra instância: o snapshot compartilhado revalida agora
+    if DB_REFRESH_SECONDS > 0:
+        get_refresher().refresh()
     else:
-        db = json.loads(text)
-    return db, sha
+        get_storage().invalidate()
+
+@st.cache_resource(show_spinner=False)
+def get_write_queue():
+    # fila única do processo: agendamentos simultâneos de várias sessões viram um commit só
+    return WriteQueue(get_storage(), window=GROUP_COMMIT_MS / 1000)
+
+@st.cache_resource(show_spinner=False)
+def get_flusher():
+    # diário local + thread que o esvazia no backend (write-behind); reenvia o que sobrou
+    # de antes de um restart assim que o processo sobe
+    return Flusher(Journal(JOURNAL_PATH), get_write_queue(), checks={"check_slots": check_slots})
+
+def with_journal(snap):
+    # escritas confirmadas no diário e ainda não gravadas no backend entram por cima do snapshot
+    return get_flusher().journal.view(*snap) if JOURNAL_PATH else snap
+
+def _prebuild_model(db, version):
+    db, version = with_journal((db, version))
+    get_model(version, db)
+
+@st.cache_resource(show_spinner=False)
+def get_refresher():
+    # thread única do processo: revalida o DB e troca o snapshot compartilhado a cada mudança;
+    # o Model da versão nova já é montado ali, fora do rerun das sessões
+    return Refresher(get_storage(), interval=DB_REFRESH_SECONDS, on_change=_prebuild_model)
+
+def months_in_view():
+    # meses que a tela precisa: o atual, o próximo e os das datas escolhidas nos formulários
+    def meses_de(ini, fim):
+        return {month_of(d) for d in pd.date_range(ini, fim, freq="MS").union([pd.Timestamp(ini)])}
 
-def save_db(db: dict, old_sha: str | None, msg: str):
-    # invalida cache antes de escrever (evita race de leitura)
-    st.cache_data.clear()
-    return gh_put_file(GH_REPO, DB_PATH, GH_BRANCH, json.dumps(db, ensure_ascii=False, indent=2), old_sha, msg)
+    hoje = dt.date.today()
+    meses = {month_of(hoje), month_of(hoje + dt.timedelta(days=31))}
+    for k in ("d1", "d2"):
+        d = st.session_state.get(k)
+        if isinstance(d, dt.date):
+            meses.add(month_of(d))
+    ini = st.session_state.get("grade_ini")
+    if isinstance(ini, dt.date):
+        # período da grade da agenda (até 31 dias)
+        fim = ini + dt.timedelta(days=int(st.session_state.get("grade_dias", 7)) - 1)
+        meses.update({month_of(ini), month_of(fim)})
+    ref = st.session_state.get("dash_ref")
+    if isinstance(ref, dt.date):
+        # período do Dashboard (até um ano)
+        meses.update(meses_de(*period_range(ref, st.session_state.get("dash_periodo", "Dia"))))
+    ini = st.session_state.get("busca_ini")
+    if isinstance(ini, dt.date):
+        # janela da busca de horários livres (até 180 dias): dia fora do snapshot pareceria vazio
+        meses.update(meses_de(ini, ini + dt.timedelta(days=int(st.session_state.get("busca_dias", 30)) - 1)))
+    ini = st.session_state.get("serie_ini")
+    if isinstance(ini, dt.date):
+        # datas da série (até 52 ocorrências): a conferência de conflitos precisa de todos os meses
+        passo = 1 if st.session_state.get("serie_freq", "Toda semana") == "Toda semana" else 2
+        meses.update(month_of(ini + dt.timedelta(weeks=passo * i))
+                     for i in range(int(st.session_state.get("serie_vezes", 4))))
+    return sorted(meses)
+
+@perf.timed()
+def load_db(extra_months=()):
+    # Snapshot compartilhado. Com o refresher, ele já está revalidado: lê sem travar nem ir à
+    # rede; só busca no backend no primeiro acesso ou um mês ainda fora do snapshot.
+    # Sem refresher, revalida no máximo a cada DB_REVALIDATE_SECONDS com GET condicional.
+    # No layout mensal, só os meses em uso (e `extra_months`) são baixados e ficam no snapshot.
+    months = sorted(set(months_in_view()) | {m for m in extra_months if m})
+    if DB_REFRESH_SECONDS > 0:
+        get_refresher()
+        snap = get_storage().peek(months)
+        if snap is None:
+            snap = get_storage().load(max_age=float("inf"), months=months)
+    else:
+        snap = get_storage().load(max_age=DB_REVALIDATE_SECONDS, months=months)
+    return with_journal(snap)
+
+@st.cache_data(max_entries=2, show_spinner="Lendo arquivo morto...")
+def load_history(year: str, archived_at, db_sha):
+    # arquivos anuais só são lidos aqui, sob demanda; a chave muda a cada compactação/escrita.
+    # Instância avulsa: os meses do ano não entram no snapshot compartilhado
+    return archive.history(bulk_storage(), year)
 
 # =========================
 # Utilidades
 # =========================
+def new_id(prefix: str) -> str:
+    # microssegundos: escritas agrupadas no mesmo segundo não colidem
+    return f"{prefix}{time.time_ns() // 1000}"
+
 def now_iso():
     return dt.datetime.now(tz.tzlocal()).isoformat(timespec="seconds")
 
@@ -166,61 +220,29 @@ def check_pw(plain: str, stored: str) -> bool:
 try:
     DB, DB_SHA = load_db()
 except Exception as e:
-    st.error(f"❌ Falha ao carregar DB do GitHub: {e}")
+    st.error(f"❌ Falha ao carregar DB ({STORAGE_BACKEND}): {e}")
     st.stop()
 
-# Transformar listas do DB em DataFrames
-employees_df = pd.DataFrame(DB.get("funcionarios", []))
-services_df  = pd.DataFrame(DB.get("servicos", []))
-clients_df   = pd.DataFrame(DB.get("clientes", []))
-appts_df     = pd.DataFrame(DB.get("agendamentos", []))
-blocks_df    = pd.DataFrame(DB.get("bloqueios", []))
-
-# Normalizações
-def ensure_cols(df, cols_defaults: dict):
-    for k, v in cols_defaults.items():
-        if k not in df.columns:
-            df[k] = v
-    return df
-
-employees_df = ensure_cols(employees_df, {
-    "employee_id": "", "name": "", "role": "", "specialty": "", "active": True,
-    "default_start": "09:00", "default_end": "19:00", "username": "", "email": "",
-    "password_hash": "", "must_change_password": True
-})
-services_df = ensure_cols(services_df, {
-    "service_id": "", "name": "", "specialty": "", "active": True,
-    "default_duration": 60
-})
-appts_df = ensure_cols(appts_df, {
-    "appt_id": "", "date": "", "start_time": "", "duration_min": 60, "end_time": "",
-    "employee_id": "", "employee_name": "", "client_id": "", "client_name": "",
-    "client_phone": "", "service_id": "", "service_name": "", "source_sheet": "streamlit",
-    "source_row": "", "status": "booked", "created_at": "", "created_by": "",
-    "notes": "", "price": "", "promo_code": "", "final_price": ""
-})
-blocks_df = ensure_cols(blocks_df, {
-    "block_id": "", "date": "", "start_time": "", "end_time": "",
-    "employee_id": "", "employee_name": "", "reason": "", "created_at": "", "created_by": ""
-})
-
-# Colunas normalizadas
-for df in (services_df, employees_df):
-    for col in ("name", "specialty"):
-        df[col] = df[col].astype(str).str.strip()
-        df[f"{col}_norm"] = df[col].str.upper()
-
-if "active" in employees_df.columns:
-    employees_df["active_bool"] = employees_df["active"].apply(_to_bool)
-else:
-    employees_df["active_bool"] = True
-if "active" in services_df.columns:
-    services_df["active_bool"] = services_df["active"].apply(_to_bool)
-else:
-    services_df["active_bool"] = True
-
-def ativos(df):
-    return df[df["active_bool"] == True]
+# DataFrames tipados + índice de disponibilidade: um Model por versão do DB, compartilhado
+# entre sessões (somente leitura). Escritas atualizam o índice in-place, então sessões
+# ainda na versão anterior já enxergam o novo horário.
+@st.cache_resource(show_spinner=False)
+def last_model():
+    # o Model mais recente do processo: a versão seguinte herda dele os rollups dos dias sem mudança
+    return {"model": None}
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_model(db_sha, _db):
+    ultimo = last_model()
+    model = Model(_db, prev=ultimo["model"])
+    ultimo["model"] = model
+    return model
+
+M = get_model(DB_SHA, DB)
+employees_df, services_df, clients_df = M.employees, M.services, M.clients
+appts_df, blocks_df = M.appts, M.blocks
+AVAIL = M.avail
+CLIENTS = M.client_index
 
 def service_duration_min(svc_row: dict) -> int:
     for k in ("default_duration_min", "default_duration", "duration_min"):
@@ -234,35 +256,55 @@ def service_duration_min(svc_row: dict) -> int:
 def get_service_row(name_sel: str):
     if not name_sel:
         return None
-    df = services_df[services_df["name"].astype(str).str.strip().str.upper() == str(name_sel).strip().upper()]
-    if df.empty:
-        return None
-    return df.iloc[0].to_dict()
+    row = M.services_by_name.get(str(name_sel).strip().upper())
+    return dict(row) if row else None
+
+def services_of(specialty: str, only_active=False) -> list[str]:
+    rows = M.services_by_specialty.get(str(specialty).strip().upper(), [])
+    return list(dict.fromkeys(r["name"] for r in rows if r["name"] and (r["active_bool"] or not only_active)))
 
 # =========================
-# Escritas no DB (GitHub)
+# Escritas no DB
 # =========================
-def db_append_and_save(kind: str, row: dict, msg: str):
-    """kind: 'agendamentos' | 'bloqueios' | 'funcionarios' | 'clientes'"""
+# Escritas são operações pequenas (op log). Se outra sessão/processo gravar antes,
+# o backend relê o DB, roda `check` de novo e reaplica as ops — nada se perde.
+def db_commit(ops: list[dict], msg: str, check=None):
     global DB, DB_SHA
-    DB[kind].append(row)
-    res = save_db(DB, DB_SHA, msg)
-    # atualizar SHA local
-    DB_SHA = res.get("content", {}).get("sha", DB_SHA)
-    st.cache_data.clear()
+    with perf.span("db_commit"):
+        if JOURNAL_PATH:
+            # write-behind: confere no índice em memória da versão mais nova (snapshot + diário),
+            # grava no diário com fsync e confirma; o Flusher leva ao backend e confere de novo lá.
+            # O Model é montado (se ainda não existe) fora do lock do diário; sob o lock só entram
+            # as entradas que chegaram ao diário depois dele.
+            validate = None
+            if check is not None:
+                # os meses das próprias ops: conferir contra um mês fora do snapshot aprovaria tudo
+                db, version = load_db(month_of(op["row"].get("date")) for op in ops if op["op"] == "append")
+                avail = get_model(version, db).avail
+
+                def validate(pendentes):
+                    avail.check(ops, AvailabilityIndex.from_ops(pendentes))
+            get_flusher().journal.append(ops, msg, check.__name__ if check else None, validate)
+        elif GROUP_COMMIT_MS > 0:
+            get_write_queue().commit(ops, msg, check)
+        else:
+            get_storage().commit(ops, msg, check)
+    # o backend já avançou o snapshot: relê sem ir à rede
+    DB, DB_SHA = load_db()
+
+def db_append_and_save(kind: str, row: dict, msg: str, check=None):
+    """kind: 'agendamentos' | 'bloqueios' | 'funcionarios' | 'clientes'"""
+    db_commit([op_append(kind, row)], msg, check)
 
 def db_update_employee_password(username: str, new_hash: str, must_change=False):
     global DB, DB_SHA
-    for emp in DB["funcionarios"]:
-        if str(emp.get("username", "")).strip().lower() == username.strip().lower():
-            emp["password_hash"] = new_hash
-            emp["must_change_password"] = bool(must_change)
-            break
-    else:
+    changes = {"password_hash": new_hash, "must_change_password": bool(must_change)}
+    found, _ = get_storage().update(
+        "funcionarios", "username", username, changes, f"feat: update password for {username}"
+    )
+    if not found:
         return False, "Usuário não encontrado"
-    res = save_db(DB, DB_SHA, f"feat: update password for {username}")
-    DB_SHA = res.get("content", {}).get("sha", DB_SHA)
-    st.cache_data.clear()
+    DB, DB_SHA = load_db()
     return True, ""
 
 # =========================
@@ -276,15 +318,11 @@ def login_view():
         ok = st.form_submit_button("Entrar", type="primary")
 
     if ok:
-        if "username" not in employees_df.columns:
-            st.sidebar.error("Base de funcionários sem coluna 'username'.")
-            st.stop()
-        mask = employees_df["username"].astype(str).str.strip().str.lower() == str(u).strip().lower()
-        row = employees_df[mask]
-        if row.empty:
+        r = M.employees_by_username.get(str(u).strip().lower())
+        if r is None:
             st.sidebar.error("Usuário ou senha inválidos.")
             st.stop()
-        r = row.iloc[0].to_dict()
+        r = dict(r)
         stored = str(r.get("password_hash") or "").strip()
         must_change = _to_bool(r.get("must_change_password"))
 
@@ -356,6 +394,17 @@ if "auth" not in st.session_state:
     st.stop()
 
 auth = st.session_state["auth"]
+
+if DB_REFRESH_SECONDS > 0:
+    @st.fragment(run_every=DB_REFRESH_SECONDS)
+    def watch_db():
+        # roda sozinho a cada DB_REFRESH_SECONDS; se outra sessão/processo gravou, o refresher
+        # já trocou o snapshot: rerun da página para mostrar a versão nova
+        snap = get_storage().peek()
+        if snap is not None and with_journal(snap)[1] != DB_SHA:
+            st.rerun()
+
+    watch_db()
 st.sidebar.success(f"Olá, {auth['nome']} ({auth['perfil']})")
 if st.sidebar.button("Sair"):
     st.session_state.clear()
@@ -364,46 +413,24 @@ if st.sidebar.button("Sair"):
 # =========================
 # Regras de negócio
 # =========================
-def is_free(date, start_str, duration_min, employee_id, appts_df, blocks_df):
-    start_dt = dt.datetime.combine(date, parse_time(start_str))
-    end_dt = end_by_duration(start_dt, duration_min)
-
-    ap = appts_df[
-        (appts_df["employee_id"].astype(str) == str(employee_id)) &
-        (appts_df["date"] == date.strftime("%Y-%m-%d")) &
-        (appts_df["status"].astype(str).str.lower().isin(["booked","done"]))
-    ]
-    for _, r in ap.iterrows():
-        s = dt.datetime.combine(date, parse_time(r["start_time"]))
-        dur = int(r.get("duration_min") or 60)
-        e = end_by_duration(s, dur)
-        if (start_dt < e) and (end_dt > s):
-            return False
-
-    bl = blocks_df[
-        (blocks_df["employee_id"].astype(str) == str(employee_id)) &
-        (blocks_df["date"] == date.strftime("%Y-%m-%d"))
-    ]
-    for _, r in bl.iterrows():
-        s = dt.datetime.combine(date, parse_time(r["start_time"]))
-        e = dt.datetime.combine(date, parse_time(r["end_time"]))
-        if (start_dt < e) and (end_dt > s):
-            return False
-    return True
+@perf.timed()
+def is_free(date, start_str, duration_min, employee_id, index):
+    start = to_min(start_str)
+    return not index.overlaps(employee_id, date, start, start + int(duration_min))
 
-def book_appointment(date, time_str, duration_min, service_row, employee_row,
-                     cliente_nome, cliente_tel, created_by, price=None, promo_code=None,
-                     final_price=None, notes=""):
+def appointment_row(date, time_str, duration_min, service_row, employee_row,
+                    cliente_nome, cliente_tel, created_by, price=None, promo_code=None,
+                    final_price=None, notes="", client_id="") -> dict:
     end_dt = end_by_duration(dt.datetime.combine(date, parse_time(time_str)), duration_min)
-    row = {
-        "appt_id": f"A{int(dt.datetime.now().timestamp())}",
+    return {
+        "appt_id": new_id("A"),
         "date": date.strftime("%Y-%m-%d"),
         "start_time": time_str,
         "duration_min": int(duration_min),
         "end_time": end_dt.strftime("%H:%M"),
         "employee_id": employee_row["employee_id"],
         "employee_name": employee_row["name"],
-        "client_id": "",
+        "client_id": client_id,
         "client_name": cliente_nome,
         "client_phone": cliente_tel,
         "service_id": service_row.get("service_id",""),
@@ -418,11 +445,81 @@ def book_appointment(date, time_str, duration_min, service_row, employee_row,
         "promo_code": promo_code or "",
         "final_price": final_price or (price or "")
     }
-    db_append_and_save("agendamentos", row, f"feat: novo agendamento {row['appt_id']}")
+
+def client_ops(nome: str, tel: str) -> tuple[str, list[dict]]:
+    """client_id do cadastro (pelo telefone, depois pelo nome; criado se novo) e as ops
+    de cliente a gravar no mesmo commit do agendamento."""
+    nome, tel = str(nome or "").strip(), str(tel or "").strip()
+    if not nome and not phone_digits(tel):
+        return "", []
+    achado = CLIENTS.match(nome, tel)
+    if achado is None:
+        row = {"client_id": new_id("C"), "name": nome, "phone": tel, "notes": "",
+               "created_at": now_iso(), "updated_at": now_iso()}
+        return row["client_id"], [op_append("clientes", row)]
+    if phone_digits(tel) and not phone_digits(achado.get("phone")):
+        # como no code.gs: completa o telefone que faltava
+        return achado["client_id"], [op_update("clientes", "client_id", achado["client_id"],
+                                               {"phone": tel, "updated_at": now_iso()})]
+    return achado["client_id"], []
+
+def index_client_ops(ops: list[dict]):
+    for op in ops:
+        if op["op"] == "append":
+            CLIENTS.add(op["row"])
+        elif op["op"] == "update":
+            CLIENTS.update(op["value"], op["changes"])
+
+@perf.timed()
+def book_appointment(date, time_str, duration_min, service_row, employee_row,
+                     cliente_nome, cliente_tel, created_by, price=None, promo_code=None,
+                     final_price=None, notes=""):
+    client_id, cops = client_ops(cliente_nome, cliente_tel)
+    row = appointment_row(date, time_str, duration_min, service_row, employee_row, cliente_nome,
+                          cliente_tel, created_by, price, promo_code, final_price, notes, client_id)
+    # SlotTaken se o horário foi ocupado por outra pessoa no meio do caminho
+    db_commit(cops + [op_append("agendamentos", row)], f"feat: novo agendamento {row['appt_id']}", check=check_slots)
+    index_client_ops(cops)
+    AVAIL.add_appointment(row)
+    CLIENTS.add_appointment(row)
+    M.rollups.add_appointment(row)
+
+def plan_series(start, time_str, items, occurrences: int, every_weeks: int,
+                cliente_nome, cliente_tel, created_by, notes="") -> list[tuple[dt.date, list[dict], list[bool]]]:
+    """Uma série: `occurrences` datas a cada `every_weeks` semanas; em cada data os serviços
+    de `items` [(service_row, employee_row, duração)] em sequência a partir de `time_str`.
+    Devolve [(data, linhas, conflitos)] — todas as linhas conferidas numa passada só."""
+    serie = new_id("S")
+    plano = []
+    for i in range(occurrences):
+        data = start + dt.timedelta(weeks=every_weeks * i)
+        hora, linhas = dt.datetime.combine(data, parse_time(time_str)), []
+        for svc_row, emp_row, dur in items:
+            obs = f"Série {serie} ({i + 1}/{occurrences})" + (f" — {notes}" if notes else "")
+            linhas.append(appointment_row(data, hora.strftime("%H:%M"), dur, svc_row, emp_row,
+                                          cliente_nome, cliente_tel, created_by, notes=obs))
+            hora = end_by_duration(hora, dur)
+        plano.append((data, linhas))
+    with perf.span("series_check"):
+        flags = iter(AVAIL.conflicts([r for _, linhas in plano for r in linhas]))
+    return [(data, linhas, [next(flags) for _ in linhas]) for data, linhas in plano]
+
+@perf.timed()
+def book_series(rows: list[dict], msg: str):
+    # um commit só (uma entrada no diário; meses diferentes vão juntos num commit atômico);
+    # SlotTaken recusa a série inteira
+    client_id, cops = client_ops(rows[0]["client_name"], rows[0]["client_phone"])
+    rows = [{**r, "client_id": client_id} for r in rows]
+    db_commit(cops + [op_append("agendamentos", r) for r in rows], msg, check=check_slots)
+    index_client_ops(cops)
+    for row in rows:
+        AVAIL.add_appointment(row)
+        CLIENTS.add_appointment(row)
+        M.rollups.add_appointment(row)
 
 def block_period(date, start_str, end_str, employee_row, reason, created_by):
     row = {
-        "block_id": f"B{int(dt.datetime.now().timestamp())}",
+        "block_id": new_id("B"),
         "date": date.strftime("%Y-%m-%d"),
         "start_time": start_str,
         "end_time": end_str,
@@ -433,16 +530,181 @@ def block_period(date, start_str, end_str, employee_row, reason, created_by):
         "created_by": created_by
     }
     db_append_and_save("bloqueios", row, f"feat: novo bloqueio {row['block_id']}")
+    AVAIL.add_block(row)
+
+def use_slot(date: str, prof_row: dict, hora: str, dur: int, passo: int):
+    # callback da busca: preenche o formulário de agendamento antes do próximo rerun, só se o
+    # horário estiver entre as opções que o formulário vai oferecer (senão o selectbox quebra)
+    livres = free_slots(M.busy, pd.DataFrame([prof_row]), [date], dur, passo)
+    if hora not in set(livres["time"]):
+        st.session_state["busca_aviso"] = f"{hora} de {prof_row['name']} não está mais livre; busque de novo."
+        return
+    st.session_state.pop("busca_aviso", None)
+    st.session_state["d1"] = dt.date.fromisoformat(date)
+    st.session_state["prof1"] = prof_row["name"]
+    st.session_state["hora1"] = hora
+
+def fill_client(row: dict, keys: list[tuple[str, str]], sel_key: str):
+    # callback da busca de clientes: preenche nome/telefone dos formulários antes do rerun
+    for k_nome, k_tel in keys:
+        st.session_state[k_nome] = row.get("name", "")
+        st.session_state[k_tel] = row.get("phone", "")
+    st.session_state[sel_key] = row["client_id"]
+
+def client_search_view(key: str, keys: list[tuple[str, str]]):
+    # só para a equipe: busca por prefixo no cadastro (ClientIndex) e histórico do escolhido
+    q = st.text_input("🔎 Cliente cadastrado (nome ou telefone)", key=f"{key}_busca")
+    if len(q.strip()) >= 2:
+        with perf.span("client_search"):
+            achados = CLIENTS.search(q, limit=8)
+        if not achados:
+            st.caption("Nenhum cliente encontrado.")
+        cols = st.columns(4)
+        for i, c in enumerate(achados):
+            cols[i % 4].button(f"{c.get('name', '')} · {c.get('phone') or 'sem telefone'}",
+                               key=f"{key}_cli_{c['client_id']}", on_click=fill_client,
+                               args=(c, keys, f"{key}_sel"))
+    sel = CLIENTS.by_id.get(st.session_state.get(f"{key}_sel", ""))
+    if sel:
+        hist = CLIENTS.history(sel["client_id"])
+        with st.expander(f"Histórico de {sel.get('name', '')} ({len(hist)} atendimentos)"):
+            if hist:
+                cols_h = ["date", "start_time", "service_name", "employee_name", "status", "final_price"]
+                st.dataframe(pd.DataFrame(hist).reindex(columns=cols_h).fillna(""), hide_index=True,
+                             use_container_width=True)
+
+def search_slots_view(profs: list[dict], dur: int, passo: int):
+    # próximos horários livres entre todos os profissionais da especialidade (earliest_slots)
+    with st.expander("🔎 Próximos horários livres"):
+        s1, s2, s3, s4 = st.columns([1, 1, 2, 1])
+        with s1: ini = st.date_input("A partir de", dt.date.today(), key="busca_ini")
+        with s2: dias = st.number_input("Buscar em (dias)", min_value=1, max_value=180, value=30, key="busca_dias")
+        with s3: faixa = st.slider("Entre", value=(dt.time(7), dt.time(22)), min_value=dt.time(7),
+                                   max_value=dt.time(22), step=dt.timedelta(minutes=30), key="busca_faixa")
+        with s4: qtd = st.number_input("Quantos", min_value=1, max_value=20, value=5, key="busca_qtd")
+        if not profs:
+            st.caption("Nenhum profissional ativo nesta especialidade.")
+            return
+        agora = dt.datetime.now(tz.tzlocal())
+        with perf.span("earliest_slots"):
+            achados = earliest_slots(
+                M.busy, pd.DataFrame(profs), ini, dur, k=int(qtd), step_min=passo, days=int(dias),
+                within=(faixa[0].hour * 60 + faixa[0].minute, faixa[1].hour * 60 + faixa[1].minute),
+                not_before=(agora.date().isoformat(), agora.hour * 60 + agora.minute),
+            )
+        if achados.empty:
+            st.caption("Nenhum horário livre nessa janela.")
+        if st.session_state.get("busca_aviso"):
+            st.warning(st.session_state.pop("busca_aviso"))
+        por_id = {str(r["employee_id"]): r for r in profs}
+        nomes = {k: r["name"] for k, r in por_id.items()}
+        for i, r in enumerate(achados.itertuples()):
+            c1, c2 = st.columns([4, 1])
+            data = dt.date.fromisoformat(r.date)
+            c1.write(f"{data:%d/%m} ({'seg ter qua qui sex sáb dom'.split()[data.weekday()]}) às {r.time} — {nomes[r.employee_id]}")
+            c2.button("Usar", key=f"busca_usar_{i}", on_click=use_slot,
+                      args=(r.date, dict(por_id[r.employee_id]), r.time, dur, passo))
+
+# grade da agenda (todos os ativos) por versão do DB e período, compartilhada entre sessões
+# (somente leitura); cada tela só monta a tabela da sua página
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_agenda(db_sha, ini, dias, passo, _m):
+    return agenda.agenda_grid(_m.appts, _m.blocks, pd.DataFrame(_m.active_employees), ini, dias, passo)
+
+def agenda_view(profs: list[dict]):
+    with st.expander("Agenda da semana / do mês"):
+        c1, c2, c3 = st.columns(3)
+        ini = c1.date_input("A partir de", dt.date.today(), key="grade_ini")
+        dias = c2.selectbox("Período", [7, 31], key="grade_dias",
+                            format_func=lambda n: "Semana" if n == 7 else "Mês (31 dias)")
+        passo = c3.selectbox("Passo (min)", SLOT_STEPS, index=1, key="grade_passo")
+        grade = get_agenda(DB_SHA, ini, dias, passo, M)
+
+        ids = [r["employee_id"] for r in profs]
+        semanas = agenda.week_starts(ini, dias)
+        paginas = -(-len(ids) // agenda.PAGE_SIZE)
+        p1, p2 = st.columns(2)
+        sem = p1.selectbox("Semana", range(len(semanas)), key="grade_sem",
+                           format_func=lambda i: f"{semanas[i]:%d/%m} a "
+                                                 f"{min(semanas[i] + dt.timedelta(days=6), ini + dt.timedelta(days=dias - 1)):%d/%m}"
+                           ) if len(semanas) > 1 else 0
+        pag = p2.number_input(f"Profissionais: página (de {paginas})", 1, paginas, 1,
+                              key="grade_pag") if paginas > 1 else 1
+        fim = ini + dt.timedelta(days=dias)
+        datas = [d for d in (semanas[sem] + dt.timedelta(days=i) for i in range(7)) if d < fim]
+        pagina = ids[(pag - 1) * agenda.PAGE_SIZE:pag * agenda.PAGE_SIZE]
+        nomes = {r["employee_id"]: r["name"] for r in profs}
+        tabela = agenda.page_table(grade, pagina, datas, nomes)
+        if tabela.empty:
+            st.info("Nada para mostrar nesse período.")
+        else:
+            st.dataframe(tabela, use_container_width=True, height=min(700, 38 + 35 * len(tabela)))
+            estados = grade[grade["employee_id"].isin([str(i) for i in ids])]["state"].value_counts()
+            st.caption(f"No período: {estados.get(agenda.BUSY, 0)} horários ocupados, "
+                       f"{estados.get(agenda.FREE, 0)} livres e {estados.get(agenda.BLOCKED, 0)} bloqueados "
+                       f"(passo de {passo} min).")
+
+def series_view(profs: list[dict], usuario: str):
+    # agendamento recorrente/em lote: todas as datas conferidas de uma vez, um commit só
+    with st.expander("🔁 Agendamento recorrente / vários serviços"):
+        r1, r2, r3, r4 = st.columns(4)
+        with r1: ini = st.date_input("Primeira data", dt.date.today(), key="serie_ini")
+        with r2: hora = st.text_input("Horário (HH:MM)", "09:00", key="serie_hora")
+        with r3: freq = st.selectbox("Repetir", ["Toda semana", "A cada 2 semanas"], key="serie_freq")
+        with r4: vezes = st.number_input("Ocorrências", min_value=1, max_value=52, value=4, key="serie_vezes")
+        nomes_svc = list(dict.fromkeys(n for p in profs for n in services_of(p["specialty"], only_active=True)))
+        svcs = st.multiselect("Serviços (em sequência, na ordem escolhida)", nomes_svc, key="serie_svcs")
+        items = []
+        for nome in svcs:
+            svc_row = get_service_row(nome)
+            aptos = [p for p in profs if str(p["specialty"]).strip().upper() == str(svc_row["specialty"]).strip().upper()]
+            c1, c2 = st.columns([3, 1])
+            with c1: prof = st.selectbox(f"Profissional — {nome}", [p["name"] for p in aptos], key=f"serie_prof_{nome}")
+            with c2: dur = st.number_input("Duração (min)", min_value=15, max_value=240, step=15,
+                                           value=service_duration_min(svc_row), key=f"serie_dur_{nome}")
+            items.append((svc_row, dict(next(p for p in aptos if p["name"] == prof)), int(dur)))
+        cli = st.text_input("Nome do cliente", key="serie_cli")
+        tel = st.text_input("Telefone", key="serie_tel")
+        obs = st.text_input("Observações", key="serie_obs")
+        if not items:
+            st.caption("Escolha ao menos um serviço.")
+            return
+        try:
+            parse_time(hora)
+        except ValueError:
+            st.error("Horário inválido (use HH:MM).")
+            return
+        plano = plan_series(ini, hora, items, int(vezes), 1 if freq == "Toda semana" else 2, cli, tel, usuario, obs)
+        livres = [linhas for _, linhas, flags in plano if not any(flags)]
+        st.dataframe(pd.DataFrame([{
+            "data": f"{data:%d/%m/%Y} ({'seg ter qua qui sex sáb dom'.split()[data.weekday()]})",
+            "situação": "livre" if not any(flags) else "conflito: " + ", ".join(
+                f"{r['service_name']} com {r['employee_name']} às {r['start_time']}" for r, f in zip(linhas, flags) if f),
+        } for data, linhas, flags in plano]), hide_index=True, use_container_width=True)
+        if len(livres) < len(plano):
+            st.warning(f"{len(plano) - len(livres)} data(s) em conflito ficam de fora.")
+        if st.button(f"Agendar {len(livres)} data(s) livre(s)", type="primary", disabled=not livres, key="serie_ok"):
+            rows = [r for linhas in livres for r in linhas]
+            try:
+                book_series(rows, f"feat: agendamento recorrente, {len(rows)} agendamentos em {len(livres)} datas")
+            except SlotTaken as e:
+                st.error(f"Um horário acabou de ser ocupado ({e}); confira a série de novo.")
+            else:
+                st.success(f"{len(rows)} agendamento(s) criado(s).")
+                st.rerun()
 
 # =========================
 # UI principal
 # =========================
 st.title("Nessa Coiffeur — Agenda")
 
-# Botão de refresh manual (renova cache e relê JSON)
+# Botão de refresh manual (força revalidar o DB no backend)
 if st.button("🔄 Atualizar dados agora"):
-    st.cache_data.clear()
-    st.experimental_rerun()
+    if DB_REFRESH_SECONDS > 0:
+        get_refresher().refresh()
+    else:
+        get_storage().invalidate()
+    st.rerun()
 
 aba_agendar, aba_func, aba_admin, aba_dash = st.tabs(
     ["📅 Agendar (Cliente)", "🧑‍🔧 Funcionário", "🛠️ Admin", "📈 Dashboard"]
@@ -450,73 +712,79 @@ aba_agendar, aba_func, aba_admin, aba_dash = st.tabs(
 
 with aba_agendar:
     st.subheader("Agendar atendimento")
-    with st.form("form_agendar_cliente", clear_on_submit=False):
-        col1, col2, col3 = st.columns(3)
-
-        with col1:
-            data_sel = st.date_input("Data", dt.date.today())
-
-            esp_ops = sorted(services_df["specialty"].dropna().unique().tolist())
-            esp = st.selectbox("Especialidade", esp_ops)
-
-            svc_ops = services_df[
-                (services_df["specialty"].astype(str).str.strip().str.upper() == str(esp).strip().upper()) &
-                (services_df["active_bool"])
-            ]["name"].dropna().unique().tolist()
-            svc = st.selectbox("Serviço", svc_ops)
-
-        with col2:
-            profs = ativos(employees_df)
-            profs = profs[profs["specialty"].astype(str).str.strip().str.upper() == str(esp).strip().upper()]
-            prof_nome = st.selectbox("Profissional", profs["name"].tolist() if not profs.empty else [])
-            if not profs.empty:
-                prof_row = profs[profs["name"] == prof_nome].iloc[0].to_dict()
-                start_def = prof_row.get("default_start", "09:00")
-                end_def   = prof_row.get("default_end", "19:00")
-                slots = generate_slots(data_sel, start_def, end_def, step_min=60)
-                hora = st.selectbox("Horário", slots)
-            else:
-                prof_row, hora = None, None
+    col1, col2, col3 = st.columns(3)
+
+    # Seleções fora do form: cada mudança recalcula os horários livres na hora
+    with col1:
+        st.session_state.setdefault("d1", dt.date.today())   # a busca de horários também preenche
+        data_sel = st.date_input("Data", key="d1")
+
+        esp = st.selectbox("Especialidade", M.specialties)
 
-        with col3:
-            cli_nome = st.text_input("Seu nome")
-            cli_tel  = st.text_input("Telefone")
+        svc = st.selectbox("Serviço", services_of(esp, only_active=True))
+        svc_row = get_service_row(svc)
+        dur = service_duration_min(svc_row or {})
+
+    with col2:
+        profs = M.active_by_specialty.get(str(esp).strip().upper(), [])
+        prof_nome = st.selectbox("Profissional", [r["name"] for r in profs], key="prof1")
+        passo = st.selectbox("Intervalo entre horários (min)", SLOT_STEPS, index=SLOT_STEPS.index(SLOT_STEP_MIN))
+        if profs:
+            prof_row = dict(next(r for r in profs if r["name"] == prof_nome))
+            with perf.span("free_slots"):
+                livres = free_slots(M.busy, pd.DataFrame([prof_row]), [data_sel], dur, passo)
+            hora = st.selectbox("Horário", livres["time"].tolist(), key="hora1")
+            if livres.empty:
+                st.caption("Sem horários livres nesta data.")
+        else:
+            prof_row, hora = None, None
+
+    with col3:
+        if auth["perfil"] in ("func", "admin"):
+            client_search_view("ag", [("cli1", "tel1")])
+        with st.form("form_agendar_cliente", clear_on_submit=False):
+            cli_nome = st.text_input("Seu nome", key="cli1")
+            cli_tel  = st.text_input("Telefone", key="tel1")
             enviar = st.form_submit_button("Confirmar agendamento", type="primary")
 
-        if enviar:
-            if not (esp and svc and prof_row and hora and cli_nome):
-                st.error("Preencha todos os campos.")
+    search_slots_view(profs, dur, passo)
+
+    if enviar:
+        if not (esp and svc and prof_row and hora and cli_nome):
+            st.error("Preencha todos os campos.")
+        elif not svc_row:
+            st.error("Serviço não encontrado.")
+        elif not is_free(data_sel, hora, dur, prof_row["employee_id"], AVAIL):
+            # alguém pode ter reservado entre a montagem da lista e o envio
+            st.error("Esse horário está ocupado/bloqueado.")
+        else:
+            try:
+                book_appointment(
+                    data_sel, hora, dur, svc_row, prof_row,
+                    cliente_nome=cli_nome, cliente_tel=cli_tel, created_by=auth["usuario"]
+                )
+            except SlotTaken:
+                st.error("Esse horário acabou de ser ocupado. Escolha outro.")
             else:
-                svc_row = get_service_row(svc)
-                if not svc_row:
-                    st.error("Serviço não encontrado.")
-                else:
-                    dur = service_duration_min(svc_row)
-                    if not is_free(data_sel, hora, dur, prof_row["employee_id"], appts_df, blocks_df):
-                        st.error("Esse horário está ocupado/bloqueado.")
-                    else:
-                        book_appointment(
-                            data_sel, hora, dur, svc_row, prof_row,
-                            cliente_nome=cli_nome, cliente_tel=cli_tel, created_by=auth["usuario"]
-                        )
-                        st.success("✅ Agendamento confirmado!")
-                        st.cache_data.clear()
-                        st.experimental_rerun()
+                st.success("✅ Agendamento confirmado!")
+                st.rerun()
 
 with aba_func:
     st.subheader("Área do Funcionário")
     if auth["perfil"] not in ["func", "admin"]:
         st.info("Acesse com perfil de Funcionário para usar esta aba.")
     else:
-        minhas = ativos(employees_df)
+        minhas = M.active_employees
         if auth["perfil"] == "func":
-            minhas = minhas[minhas["name"].astype(str).str.upper() == auth["nome"].upper()]
-        if minhas.empty:
+            eu = M.employees_by_username.get(auth["usuario"].strip().lower())
+            minhas = [eu] if eu and eu["active_bool"] else []
+        if not minhas:
             st.warning("Nenhum profissional ativo encontrado.")
         else:
+            client_search_view("func", [("cli2", "tel2"), ("serie_cli", "serie_tel")])
             with st.form("form_func"):
-                nome2 = st.selectbox("Profissional", minhas["name"].tolist())
-                emp2  = minhas[minhas["name"] == nome2].iloc[0].to_dict()
+                nome2 = st.selectbox("Profissional", [r["name"] for r in minhas])
+                emp2  = dict(next(r for r in minhas if r["name"] == nome2))
                 data2 = st.date_input("Data", dt.date.today(), key="d2")
 
                 st.markdown("### Bloquear horário")
@@ -526,10 +794,7 @@ with aba_func:
                 with b3: motivo = st.text_input("Motivo", "Sem atendimento")
 
                 st.markdown("### Agendar com duração customizada (override)")
-                svc2_ops = services_df[
-                    services_df["specialty"].astype(str).str.strip().str.upper() == str(emp2["specialty"]).strip().upper()
-                ]["name"].dropna().unique().tolist()
-                svc2 = st.selectbox("Serviço", svc2_ops, key="svc2")
+                svc2 = st.selectbox("Serviço", services_of(emp2["specialty"]), key="svc2")
 
                 svc2_row = get_service_row(svc2) if svc2 else None
                 c1, c2, c3, c4 = st.columns(4)
@@ -551,49 +816,223 @@ with aba_func:
             if bt_block:
                 block_period(data2, ini_b, fim_b, emp2, motivo, auth["usuario"])
                 st.success("Período bloqueado.")
-                st.cache_data.clear()
-                st.experimental_rerun()
+                st.rerun()
 
             if bt_ag:
                 if not svc2_row:
                     st.error("Selecione um serviço válido.")
-                elif not is_free(data2, hora_livre, int(dur), emp2["employee_id"], appts_df, blocks_df):
+                elif not is_free(data2, hora_livre, int(dur), emp2["employee_id"], AVAIL):
                     st.error("Esse horário está ocupado/bloqueado.")
                 else:
-                    book_appointment(
-                        data2, hora_livre, int(dur), svc2_row, emp2,
-                        cliente_nome=cli2, cliente_tel=tel2, created_by=auth["usuario"],
-                        price=preco, promo_code=promo, final_price=preco, notes=obs2
-                    )
-                    st.success("Agendamento criado.")
-                    st.cache_data.clear()
-                    st.experimental_rerun()
+                    try:
+                        book_appointment(
+                            data2, hora_livre, int(dur), svc2_row, emp2,
+                            cliente_nome=cli2, cliente_tel=tel2, created_by=auth["usuario"],
+                            price=preco, promo_code=promo, final_price=preco, notes=obs2
+                        )
+                    except SlotTaken:
+                        st.error("Esse horário acabou de ser ocupado/bloqueado.")
+                    else:
+                        st.success("Agendamento criado.")
+                        st.rerun()
+
+            series_view(minhas, auth["usuario"])
+            agenda_view(minhas)
 
 with aba_admin:
     st.subheader("Administração")
     if auth["perfil"] != "admin":
         st.info("Acesso restrito.")
     else:
-        st.write("Cadastre/edite **serviços, funcionários e clientes** no arquivo JSON do repositório.")
+        st.write("Cadastre/edite **serviços, funcionários e clientes** no arquivo JSON do repositório "
+                 "ou em lote pelas planilhas abaixo.")
         st.caption("Dica: mantenha `default_duration` dos serviços (minutos).")
 
+        st.markdown("### Planilhas (CSV)")
+        st.caption("Mesmo layout de `planilha_modelo/` (appointments, clients, services, employees, blocks). "
+                   "Linhas com o mesmo id substituem as do DB; sem id, ganham um id estável.")
+        arqs = st.file_uploader("Importar CSV", type="csv", accept_multiple_files=True, key="csv_up")
+        p1, p2 = st.columns(2)
+        so_validar = p1.checkbox("Só validar", value=True, key="csv_dry")
+        ignorar = p2.checkbox("Gravar as linhas válidas mesmo com erros", key="csv_skip")
+        if st.button("Importar planilhas", disabled=not arqs):
+            fontes = {planilha.kind_of(a.name): a for a in arqs if planilha.kind_of(a.name)}
+            if not fontes:
+                st.error("Nenhum arquivo reconhecido (use os nomes de planilha_modelo/).")
+            else:
+                try:
+                    with st.spinner("Importando..."):
+                        st.session_state["csv_rep"] = planilha.import_csv(
+                            bulk_storage(), fontes, dry_run=so_validar, skip_invalid=ignorar, created_by=auth["usuario"])
+                except Exception as e:
+                    st.error(f"Falha ao importar: {e}")
+                else:
+                    if st.session_state["csv_rep"]["gravado"]:
+                        after_bulk_write()
+                        st.rerun()
+        rep = st.session_state.get("csv_rep")
+        if rep:
+            resumo = pd.DataFrame({k: rep[k] for k in ("linhas", "novos", "alterados", "iguais", "invalidos")})
+            st.dataframe(resumo.rename_axis("tipo"), use_container_width=True)
+            if rep["gravado"]:
+                st.success("Planilhas importadas num único commit.")
+            elif rep["total_erros"]:
+                st.warning(f"{rep['total_erros']} erros: nada foi gravado.")
+            elif any(rep["novos"].values()) or any(rep["alterados"].values()):
+                st.info("Nenhum erro. Desmarque “Só validar” para gravar.")
+            else:
+                st.info("Nada novo para gravar.")
+            if rep["erros"]:
+                st.dataframe(pd.DataFrame(rep["erros"]), hide_index=True, use_container_width=True)
+        if st.button("Preparar exportação"):
+            with st.spinner("Gerando planilhas..."):
+                buf = io.BytesIO()
+                with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+                    for nome, texto in planilha.export_csv(planilha.load_all(bulk_storage())).items():
+                        z.writestr(nome, texto)
+                st.session_state["csv_zip"] = buf.getvalue()
+        if st.session_state.get("csv_zip"):
+            st.download_button("Baixar planilhas (.zip)", st.session_state["csv_zip"], "planilhas.zip",
+                               "application/zip")
+
+        st.markdown("### Planilha do salão (Apps Script)")
+        st.caption("Agendamentos digitados nas abas mensais, registrados em lote na aba DB_AGENDAMENTOS. "
+                   "Cada célula de origem vira um agendamento; editada de novo, atualiza o mesmo.")
+        if not SHEET_CSV_URL:
+            st.info("Configure SHEET_CSV_URL (aba DB_AGENDAMENTOS publicada em CSV) para sincronizar.")
+        elif st.button("Sincronizar planilha"):
+            try:
+                with st.spinner("Sincronizando..."):
+                    st.session_state["sync_rep"] = sheet_sync.sync(bulk_storage(), SHEET_CSV_URL)
+            except Exception as e:
+                st.error(f"Falha ao sincronizar: {e}")
+            else:
+                if st.session_state["sync_rep"]["gravado"]:
+                    after_bulk_write()
+                    st.rerun()
+        rep = st.session_state.get("sync_rep")
+        if rep:
+            st.caption(f"Última sincronização: {rep['novos']['agendamentos']} novos, "
+                       f"{rep['alterados']['agendamentos']} alterados, {rep['iguais']['agendamentos']} iguais, "
+                       f"{rep['duplicatas']} duplicatas removidas, {rep['invalidos']['agendamentos']} com erro.")
+            if rep["erros"]:
+                st.dataframe(pd.DataFrame(rep["erros"]), hide_index=True, use_container_width=True)
+
+        st.markdown("### Desempenho")
+        if STORAGE_BACKEND == "github":
+            cota = github_api.rate_limit_status()
+            if cota["remaining"] is not None:
+                reset = dt.datetime.fromtimestamp(cota["reset_at"] or 0, tz.tzlocal()).strftime("%H:%M")
+                st.caption(f"Cota da API do GitHub: {cota['remaining']}/{cota['limit']} (renova às {reset})")
+            if cota["circuit_open"]:
+                st.warning("GitHub com falhas seguidas: escritas suspensas por alguns segundos.")
+        if DB_REFRESH_SECONDS > 0:
+            ref_st = get_refresher().status()
+            visto = dt.datetime.fromtimestamp(ref_st["checked_at"], tz.tzlocal()).strftime("%H:%M:%S") \
+                if ref_st["checked_at"] else "—"
+            st.caption(f"Atualização automática a cada {ref_st['interval']:g} s · última verificação {visto} · "
+                       f"{ref_st['changes']} versões novas · {ref_st['errors']} falhas")
+            if ref_st["last_error"]:
+                st.warning(f"Falha ao revalidar o DB: {ref_st['last_error']}")
+        met = perf.snapshot()
+        if met["spans"]:
+            # tempos do processo inteiro (todas as sessões); percentis das últimas medições
+            tempos = pd.DataFrame.from_dict(met["spans"], orient="index")
+            st.dataframe(tempos[["count", "p50_ms", "p95_ms", "p99_ms", "max_ms", "total_ms"]].rename_axis("trecho"),
+                         use_container_width=True)
+        ant = st.session_state.get("_perf_prev")
+        if ant is not None and ant.spans:
+            st.caption(f"Execução anterior desta sessão: {ant.total_ms:.0f} ms")
+            linha = sorted(ant.spans, key=lambda s: (s[1], -s[2]))
+            st.dataframe(pd.DataFrame([{"trecho": "· " * d + n, "início (ms)": round(ini, 1), "ms": round(ms, 1)}
+                                       for n, ini, ms, d in linha]), hide_index=True, use_container_width=True)
+        if met["counters"]:
+            st.dataframe(pd.DataFrame([{"contador": c["name"], **c["labels"], "valor": c["value"]}
+                                       for c in met["counters"]]).fillna(""), hide_index=True, use_container_width=True)
+        e1, e2, e3 = st.columns(3)
+        e1.download_button("Exportar JSON", json.dumps(met, ensure_ascii=False, indent=2),
+                           "metricas.json", "application/json")
+        e2.download_button("Exportar Prometheus", perf.prometheus_text(), "metricas.prom", "text/plain")
+        if e3.button("Zerar métricas"):
+            perf.reset()
+            st.rerun()
+
+        if JOURNAL_PATH:
+            st.markdown("### Diário de escritas")
+            fl = get_flusher().status()
+            ultima = f" · última às {fl['flushed_at'][11:]}" if fl["flushed_at"] else ""
+            st.caption(f"{fl['pending']} escritas aguardando o backend · {fl['flushed']} gravadas desde o início{ultima}")
+            if fl["pending"] and fl["last_error"]:
+                st.warning(f"Backend indisponível; as escritas pendentes serão reenviadas ({fl['last_error']}).")
+            for e in get_flusher().journal.failed():
+                # confirmada aqui, mas recusada pelo backend (ex.: horário gravado antes por outro processo)
+                f1, f2 = st.columns([5, 1])
+                f1.error(f"{e['msg']} — recusada pelo backend: {e['error']}")
+                if f2.button("Dispensar", key=f"diario_{e['seq']}"):
+                    get_flusher().journal.dismiss(e["seq"])
+                    st.rerun()
+
+        st.markdown("### Arquivo morto")
+        arq = DB.get("arquivo") or {}
+        if arq:
+            qtd = sum(c["total"] for c in arq.get("meses", {}).values())
+            st.caption(f"{qtd} agendamentos anteriores a {arq['ate']} estão nos arquivos anuais.")
+        dias = st.number_input("Arquivar agendamentos com mais de (dias)", min_value=30,
+                               value=max(30, ARCHIVE_AFTER_DAYS), step=30)
+        if st.button("Arquivar agendamentos antigos"):
+            try:
+                with st.spinner("Arquivando..."):
+                    rep = archive.compact(get_storage(), days=int(dias))
+            except Exception as e:
+                st.error(f"Falha ao arquivar: {e}")
+            else:
+                DB, DB_SHA = load_db()
+                st.success(f"{rep['movidos']['agendamentos']} agendamentos e "
+                           f"{rep['movidos']['bloqueios']} bloqueios anteriores a {rep['ate']} arquivados.")
+
 with aba_dash:
-    st.subheader("Resumo do dia")
-    hoje = dt.date.today().strftime("%Y-%m-%d")
-    day = appts_df[appts_df["date"] == hoje] if not appts_df.empty else pd.DataFrame([])
-    st.metric("Atendimentos hoje", len(day))
+    st.subheader("Resumo")
+    c1, c2 = st.columns(2)
+    with c1:
+        periodo = st.selectbox("Período", PERIODS, key="dash_periodo")
+    with c2:
+        ref = st.date_input("Referência", dt.date.today(), key="dash_ref")
+    ini, fim = period_range(ref, periodo)
+    # só soma os buckets do período (rollups.py): não varre os agendamentos
+    tot = M.rollups.totals(ini, fim)
+    ativos = employees_df[employees_df["active_bool"]]
+    cap = capacity_minutes(ativos, ini, fim)
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Atendimentos", tot["qtd"])
+    m2.metric("Horas agendadas", f"{tot['minutos'] / 60:.1f}")
+    m3.metric("Receita", f"R$ {tot['receita']:,.2f}")
+    m4.metric("Ocupação", f"{tot['minutos'] / cap.sum():.0%}" if cap.sum() else "—")
     colA, colB = st.columns(2)
     with colA:
-        por_prof = (
-            day.groupby("employee_id").size().reset_index(name="qtd")
-            if not day.empty else pd.DataFrame({"employee_id": [], "qtd": []})
-        )
+        por_prof = M.rollups.by_group(ini, fim, "por_profissional")
+        por_prof["ocupação"] = (por_prof["minutos"] / cap.reindex(por_prof.index)).round(2)
+        nomes = {k: r["name"] for k, r in M.employees_by_id.items()}
         st.write("Por profissional")
-        st.dataframe(por_prof, use_container_width=True)
+        st.dataframe(por_prof.rename(index=nomes).rename_axis("profissional"), use_container_width=True)
     with colB:
-        serv = (
-            day.groupby("service_name").size().reset_index(name="qtd").sort_values("qtd", ascending=False)
-            if not day.empty else pd.DataFrame({"service_name": [], "qtd": []})
-        )
-        st.write("Serviços do dia")
-        st.dataframe(serv, use_container_width=True)
+        st.write("Por serviço")
+        st.dataframe(M.rollups.by_group(ini, fim, "por_servico").rename_axis("serviço"), use_container_width=True)
+    if periodo in ("Semana", "Mês"):
+        st.bar_chart(M.rollups.by_day(ini, fim)["qtd"])
+    st.caption("Ocupação = minutos agendados ÷ expediente padrão (default_start–default_end) no período.")
+
+    st.subheader("Histórico")
+    anos = archive.archived_years(DB)
+    if not anos:
+        st.caption("Nenhum agendamento arquivado ainda.")
+    else:
+        ano = st.selectbox("Ano", anos[::-1], key="hist_ano")
+        # contadores guardados no DB: não lê o arquivo morto
+        meses = {m: c for m, c in DB["arquivo"]["meses"].items() if m.startswith(ano)}
+        resumo = pd.DataFrame.from_dict(meses, orient="index")[["total", "minutos", "receita"]]
+        st.dataframe(resumo.rename_axis("mês"), use_container_width=True)
+        if st.checkbox("Carregar atendimentos do ano", key="hist_det"):
+            hist = load_history(ano, DB["arquivo"].get("atualizado_em"), DB_SHA)
+            st.dataframe(pd.DataFrame(hist["agendamentos"]), use_container_width=True)
+
+RUN.finish()
@@ -10,146 +10,351 @@ const CFG = {
   COL_NAME_MA: 6, COL_SERV_MA: 7, // F/G
   COL_NAME_TI: 8, COL_SERV_TI: 9, // H/I
   COL_DATE_HELPER: 27, // AA = 27
+  COL_AUDIT: 28,       // AB = funcionário, para auditoria
+  FIRST_ROW: 5,
+  APPT_COLS: 21,       // colunas de DB_AGENDAMENTOS (= planilha_modelo/appointments.csv)
+  QUEUE_PREFIX: 'q:',  // edições pendentes em ScriptProperties: q:<aba>|<linha>|<funcionário>
+  BATCH_MAX: 300,      // edições por execução de flushQueue
+  CACHE_TTL: 21600,    // 6 h (máximo do CacheService)
+  CACHE_CHUNK: 90000,  // o CacheService aceita até 100 KB por chave
 };
+const MASTER_SHEETS = [CFG.DB_EMPLOYEES, CFG.DB_SERVICES, CFG.DB_CLIENTS];
+const DB_SHEETS = MASTER_SHEETS.concat([CFG.DB_APPTS, CFG.DB_BLOCKS]);
+const EMPLOYEE_COLS = [
+  [CFG.COL_NAME_LU, CFG.COL_SERV_LU, 'LUCIENE'],
+  [CFG.COL_NAME_MA, CFG.COL_SERV_MA, 'MARCELA'],
+  [CFG.COL_NAME_TI, CFG.COL_SERV_TI, 'TINA'],
+];
+const COLOR_PENDING = '#FFF8E1';
+const COLOR_DONE = '#E3FCEF';
+const COLOR_ERROR = '#FDE2E1';
+
+/*
+ * Fluxo:
+ *  - onEdit (gatilho simples) só enfileira a edição: uma chave por aba/linha/funcionária em
+ *    ScriptProperties (editar a mesma célula de novo não duplica) e pinta a célula de amarelo.
+ *    Edições nas abas de cadastro invalidam o cache das tabelas de consulta.
+ *  - flushQueue (gatilho de tempo, a cada minuto — rode installTriggers() uma vez) processa
+ *    as edições em lote: tabelas de consulta do cache (lidas da planilha só se expiraram ou
+ *    foram invalidadas), uma leitura por aba editada e uma por DB_AGENDAMENTOS, agendamentos
+ *    novos gravados num único setValues. Uma célula já registrada (mesma aba/linha/funcionária)
+ *    atualiza a linha existente em vez de acrescentar outra; esvaziada, vira `cancelled`.
+ *    Uma célula com erro (ex.: funcionário não cadastrado) fica vermelha, com o motivo na
+ *    nota, e sai da fila sem travar as demais.
+ *  - O app (sheet_sync.py) lê DB_AGENDAMENTOS e grava no DB num commit só.
+ */
 
 function onEdit(e) {
   try {
     const sh = e.range.getSheet();
     const sheetName = sh.getName();
-    if (['CLIENTES','SERVICOS','FUNCIONARIOS','DB_AGENDAMENTOS','BLOQUEIOS'].includes(sheetName)) return;
-    const row = e.range.getRow();
-    const col = e.range.getColumn();
-    if (row < 5) return;
-
-    let employeeName = null, serviceValue = null, nameValue = null;
-    if (col === CFG.COL_NAME_LU || col === CFG.COL_SERV_LU) {
-      employeeName = 'LUCIENE';
-      nameValue = sh.getRange(row, CFG.COL_NAME_LU).getDisplayValue().trim();
-      serviceValue = sh.getRange(row, CFG.COL_SERV_LU).getDisplayValue().trim();
-    } else if (col === CFG.COL_NAME_MA || col === CFG.COL_SERV_MA) {
-      employeeName = 'MARCELA';
-      nameValue = sh.getRange(row, CFG.COL_NAME_MA).getDisplayValue().trim();
-      serviceValue = sh.getRange(row, CFG.COL_SERV_MA).getDisplayValue().trim();
-    } else if (col === CFG.COL_NAME_TI || col === CFG.COL_SERV_TI) {
-      employeeName = 'TINA';
-      nameValue = sh.getRange(row, CFG.COL_NAME_TI).getDisplayValue().trim();
-      serviceValue = sh.getRange(row, CFG.COL_SERV_TI).getDisplayValue().trim();
-    } else {
+    if (MASTER_SHEETS.includes(sheetName)) {
+      invalidateLookup_(sheetName);
       return;
     }
-    if (!nameValue && !serviceValue) return;
-
-    const dateVal = sh.getRange(row, CFG.COL_DATE_HELPER).getValue();
-    if (!dateVal) return;
-    const hora = sh.getRange(row, CFG.COL_TIME).getDisplayValue().trim();
-
-    const ss = SpreadsheetApp.getActive();
-    const wbEmp = ss.getSheetByName(CFG.DB_EMPLOYEES);
-    const empVals = wbEmp.getDataRange().getValues();
-    const empHeader = empVals.shift();
-    const idxEmpName = empHeader.indexOf('name');
-    const idxEmpId = empHeader.indexOf('employee_id');
-    let empRow = empVals.find(r => String(r[idxEmpName]).toUpperCase() === employeeName);
-    if (!empRow) throw new Error('Funcionário não encontrado: ' + employeeName);
-    const employeeId = empRow[idxEmpId];
-
-    let serviceId = '', serviceName = '';
-    let defaultDur = 60;
-    if (serviceValue) {
-      const wbSvc = ss.getSheetByName(CFG.DB_SERVICES);
-      const svcVals = wbSvc.getDataRange().getValues();
-      const svcHeader = svcVals.shift();
-      const iName = svcHeader.indexOf('name');
-      const iId = svcHeader.indexOf('service_id');
-      const iDur = svcHeader.indexOf('default_duration_min');
-      const iAct = svcHeader.indexOf('active');
-      const match = svcVals.find(r => String(r[iName]).toUpperCase() === serviceValue.toUpperCase() && String(r[iAct]).toUpperCase() !== 'FALSE');
-      if (match) {
-        serviceId = match[iId];
-        serviceName = match[iName];
-        defaultDur = Number(match[iDur]) || 60;
-      } else {
-        serviceName = serviceValue; // aceitamos texto livre
-        defaultDur = 60;
-      }
-    }
+    if (DB_SHEETS.includes(sheetName)) return;
+    const r0 = Math.max(e.range.getRow(), CFG.FIRST_ROW), r1 = e.range.getLastRow();
+    const c0 = e.range.getColumn(), c1 = e.range.getLastColumn();
+    if (r1 < r0) return;
 
-    // cliente: Nome - Telefone | Nome / Telefone | Nome | Telefone
-    let clientName = nameValue, clientPhone = '';
-    [' - ', ' / ', ' | '].forEach(sep => {
-      if (clientName.includes(sep)) {
-        const parts = clientName.split(sep);
-        clientName = parts[0].trim();
-        clientPhone = parts.slice(1).join(sep).trim();
-      }
+    const queued = {};
+    const stamp = String(Date.now());
+    EMPLOYEE_COLS.forEach(([cName, cServ, employeeName]) => {
+      const hit = (cName >= c0 && cName <= c1) || (cServ >= c0 && cServ <= c1);
+      if (!hit) return;
+      for (let row = r0; row <= r1; row++) queued[queueKey_(sheetName, row, employeeName)] = stamp;
     });
+    if (!Object.keys(queued).length) return;
+    PropertiesService.getScriptProperties().setProperties(queued);
+    e.range.setBackground(COLOR_PENDING); // feedback: na fila
+  } catch (err) {
+    SpreadsheetApp.getActive().toast('Erro onEdit: ' + err.message, 'Agenda', 5);
+  }
+}
 
-    const wbCli = ss.getSheetByName(CFG.DB_CLIENTS);
-    const cliVals = wbCli.getDataRange().getValues();
-    const cliHeader = cliVals.shift();
-    const cId = cliHeader.indexOf('client_id');
-    const cName = cliHeader.indexOf('name');
-    const cPhone = cliHeader.indexOf('phone');
-    const cCreated = cliHeader.indexOf('created_at');
-    const cUpdated = cliHeader.indexOf('updated_at');
-    let cliRow = null;
-    if (clientPhone) {
-      const clean = clientPhone.replace(/\D/g,'');
-      cliRow = cliVals.find(r => String(r[cPhone]).replace(/\D/g,'') === clean);
-    }
-    if (!cliRow && clientName) {
-      cliRow = cliVals.find(r => String(r[cName]).toUpperCase() === clientName.toUpperCase());
-    }
-    let clientId = '';
-    if (!cliRow && clientName) {
-      clientId = 'C' + Date.now();
-      wbCli.appendRow([clientId, clientName, clientPhone, new Date(), new Date()]);
-    } else if (cliRow) {
-      clientId = cliRow[cId];
-      // Atualiza telefone se vazio
-      if (!cliRow[cPhone] && clientPhone) {
-        const idx = cliVals.indexOf(cliRow) + 2;
-        wbCli.getRange(idx, cPhone+1).setValue(clientPhone);
-        wbCli.getRange(idx, cUpdated+1).setValue(new Date());
+/** Cria o gatilho de tempo de flushQueue (rode uma vez pelo editor do Apps Script). */
+function installTriggers() {
+  ScriptApp.getProjectTriggers()
+    .filter(t => t.getHandlerFunction() === 'flushQueue')
+    .forEach(t => ScriptApp.deleteTrigger(t));
+  ScriptApp.newTrigger('flushQueue').timeBased().everyMinutes(1).create();
+}
+
+/***** Fila *****/
+function queueKey_(sheetName, row, employeeName) {
+  return CFG.QUEUE_PREFIX + [sheetName, row, employeeName].join('|');
+}
+
+function parseKey_(key) {
+  const parts = key.slice(CFG.QUEUE_PREFIX.length).split('|');
+  const employeeName = parts.pop();
+  const row = Number(parts.pop());
+  return { sheetName: parts.join('|'), row: row, employeeName: employeeName };
+}
+
+/***** Normalização (mesmas regras de clients.py) *****/
+function normName_(s) {
+  return String(s || '').normalize('NFD').replace(/[\u0300-\u036f]/g, '')
+    .toUpperCase().replace(/\s+/g, ' ').trim();
+}
+
+function digits_(s) {
+  return String(s || '').replace(/\D/g, '');
+}
+
+/***** Tabelas de consulta (cache) *****/
+function cachePut_(cache, key, obj) {
+  const text = JSON.stringify(obj);
+  const parts = {};
+  let n = 0;
+  for (let i = 0; i < text.length; i += CFG.CACHE_CHUNK) parts[key + ':' + n++] = text.slice(i, i + CFG.CACHE_CHUNK);
+  parts[key] = String(n);
+  cache.putAll(parts, CFG.CACHE_TTL);
+}
+
+function cacheGet_(cache, key) {
+  const n = Number(cache.get(key) || 0);
+  if (!n) return null;
+  const names = [];
+  for (let i = 0; i < n; i++) names.push(key + ':' + i);
+  const parts = cache.getAll(names);
+  if (names.some(k => parts[k] == null)) return null; // algum pedaço expirou
+  return JSON.parse(names.map(k => parts[k]).join(''));
+}
+
+function invalidateLookup_(sheetName) {
+  CacheService.getScriptCache().remove('lk:' + sheetName);
+}
+
+function header_(values) {
+  const h = {};
+  values[0].forEach((name, i) => h[String(name).trim()] = i);
+  return h;
+}
+
+function buildLookup_(ss, sheetName) {
+  const vals = ss.getSheetByName(sheetName).getDataRange().getValues();
+  const h = header_(vals);
+  const out = { header: vals[0], byName: {}, byPhone: {} };
+  for (let i = 1; i < vals.length; i++) {
+    const r = vals[i];
+    const key = normName_(r[h['name']]);
+    if (sheetName === CFG.DB_EMPLOYEES) {
+      if (key) out.byName[key] = r[h['employee_id']];
+    } else if (sheetName === CFG.DB_SERVICES) {
+      if (key && String(r[h['active']]).toUpperCase() !== 'FALSE' && !(key in out.byName)) {
+        out.byName[key] = [r[h['service_id']], r[h['name']], Number(r[h['default_duration_min']]) || 60];
       }
+    } else {
+      // cliente: [client_id, linha na planilha, telefone]
+      const c = [r[h['client_id']], i + 1, String(r[h['phone']] || '')];
+      const tel = digits_(c[2]);
+      if (tel && !(tel in out.byPhone)) out.byPhone[tel] = c;
+      if (key && !(key in out.byName)) out.byName[key] = c;
     }
+  }
+  return out;
+}
 
-    const start = new Date(dateVal);
-    const [hh, mm] = hora.split(':').map(n => parseInt(n,10));
-    start.setHours(hh); start.setMinutes(mm); start.setSeconds(0);
-    const end = new Date(start.getTime() + defaultDur*60000);
-    const endStr = Utilities.formatDate(end, Session.getScriptTimeZone(), 'HH:mm');
-
-    const wbAp = ss.getSheetByName(CFG.DB_APPTS);
-    const apptId = 'A' + Date.now();
-    wbAp.appendRow([
-      apptId,
-      Utilities.formatDate(start, Session.getScriptTimeZone(), 'yyyy-MM-dd'),
-      Utilities.formatDate(start, Session.getScriptTimeZone(), 'HH:mm'),
-      defaultDur,
-      endStr,
-      employeeId,
-      employeeName,
-      clientId,
-      clientName,
-      clientPhone,
-      serviceId,
-      serviceName,
-      sheetName,
-      row,
-      'booked',
-      new Date(),
-      Session.getActiveUser().getEmail() || 'sheet',
-      '',
-      '',
-      '',
-      ''
-    ]);
-
-    e.range.setBackground('#E3FCEF'); // feedback
-    sh.getRange(row, 28).setValue(employeeName); // AB: funcionário para auditoria
+function lookups_(ss) {
+  const cache = CacheService.getScriptCache();
+  const out = {};
+  MASTER_SHEETS.forEach(name => {
+    let lk = cacheGet_(cache, 'lk:' + name);
+    if (!lk) {
+      lk = buildLookup_(ss, name);
+      cachePut_(cache, 'lk:' + name, lk);
+    }
+    out[name] = lk;
+  });
+  return out;
+}
 
+/***** Lote *****/
+function flushQueue() {
+  const lock = LockService.getScriptLock();
+  if (!lock.tryLock(5000)) return; // outra execução já está processando
+  try {
+    const props = PropertiesService.getScriptProperties();
+    const all = props.getProperties();
+    const keys = Object.keys(all).filter(k => k.indexOf(CFG.QUEUE_PREFIX) === 0).slice(0, CFG.BATCH_MAX);
+    if (!keys.length) return;
+    processBatch_(keys.map(parseKey_));
+    // edições feitas durante o lote (carimbo novo) ficam para a próxima execução
+    const now = props.getProperties();
+    keys.filter(k => now[k] === all[k]).forEach(k => props.deleteProperty(k));
   } catch (err) {
-    SpreadsheetApp.getActive().toast('Erro onEdit: ' + err.message, 'Agenda', 5);
+    console.error('flushQueue: ' + err.message);
+  } finally {
+    lock.releaseLock();
+  }
+}
+
+function processBatch_(items) {
+  const ss = SpreadsheetApp.getActive();
+  const tz = Session.getScriptTimeZone();
+  const user = Session.getActiveUser().getEmail() || 'sheet';
+  const lk = lookups_(ss);
+  const emp = lk[CFG.DB_EMPLOYEES], svc = lk[CFG.DB_SERVICES], cli = lk[CFG.DB_CLIENTS];
+
+  // agendamentos já registrados: aba|linha|funcionária -> [linha em DB_AGENDAMENTOS, appt_id]
+  const apSh = ss.getSheetByName(CFG.DB_APPTS);
+  const apLast = apSh.getLastRow();
+  const apVals = apLast > 1 ? apSh.getRange(2, 1, apLast - 1, CFG.APPT_COLS).getValues() : [];
+  const known = {};
+  apVals.forEach((r, i) => known[[r[12], r[13], normName_(r[6])].join('|')] = [i + 2, r[0]]);
+
+  const bySheet = {};
+  items.forEach(it => (bySheet[it.sheetName] = bySheet[it.sheetName] || []).push(it));
+
+  const appends = [], updates = [], cancels = [], newClients = [], phoneFixes = [];
+  const done = {}, audit = {}, cleared = {}, failed = {};
+  let seq = 0;
+  Object.keys(bySheet).forEach(sheetName => {
+    const sh = ss.getSheetByName(sheetName);
+    if (!sh) return;
+    const rows = bySheet[sheetName].map(it => it.row);
+    const r0 = Math.min.apply(null, rows), r1 = Math.max.apply(null, rows);
+    // uma leitura por aba: das linhas editadas, colunas A..AA
+    const range = sh.getRange(r0, 1, r1 - r0 + 1, CFG.COL_DATE_HELPER);
+    const shown = range.getDisplayValues();
+    const raw = range.getValues();
+
+    bySheet[sheetName].forEach(it => {
+      const cols = EMPLOYEE_COLS.find(c => c[2] === it.employeeName);
+      if (!cols) return;
+      const a1 = sh.getRange(it.row, cols[0], 1, 2).getA1Notation();
+      // um erro numa célula não trava o lote: a célula fica vermelha, com o motivo na nota
+      try {
+        const i = it.row - r0;
+        const nameValue = shown[i][cols[0] - 1].trim();
+        const serviceValue = shown[i][cols[1] - 1].trim();
+        const key = [sheetName, it.row, normName_(it.employeeName)].join('|');
+        const prev = known[key];
+        if (!nameValue && !serviceValue) {
+          if (prev) cancels.push(prev[0]); // célula esvaziada: cancela o que foi registrado
+          (cleared[sheetName] = cleared[sheetName] || []).push(a1);
+          return;
+        }
+        const dateVal = raw[i][CFG.COL_DATE_HELPER - 1];
+        const hora = shown[i][CFG.COL_TIME - 1].trim();
+        if (!dateVal || !/^\d{1,2}:\d{2}/.test(hora)) throw new Error('Linha sem data (coluna AA) ou hora (coluna C) válida');
+
+        const employeeId = emp.byName[normName_(it.employeeName)];
+        if (employeeId == null || employeeId === '') throw new Error('Funcionário não encontrado: ' + it.employeeName);
+
+        let serviceId = '', serviceName = '', defaultDur = 60;
+        if (serviceValue) {
+          const match = svc.byName[normName_(serviceValue)];
+          if (match) [serviceId, serviceName, defaultDur] = match;
+          else serviceName = serviceValue; // aceitamos texto livre
+        }
+
+        // cliente: Nome - Telefone | Nome / Telefone | Nome | Telefone
+        let clientName = nameValue, clientPhone = '';
+        [' - ', ' / ', ' | '].forEach(sep => {
+          if (clientName.includes(sep)) {
+            const parts = clientName.split(sep);
+            clientName = parts[0].trim();
+            clientPhone = parts.slice(1).join(sep).trim();
+          }
+        });
+        let c = (digits_(clientPhone) && cli.byPhone[digits_(clientPhone)]) || (clientName && cli.byName[normName_(clientName)]);
+        if (!c && clientName) {
+          c = ['C' + Date.now() + (seq++), null, clientPhone];
+          newClients.push([c[0], clientName, clientPhone]);
+          if (digits_(clientPhone)) cli.byPhone[digits_(clientPhone)] = c;
+          cli.byName[normName_(clientName)] = c;
+        } else if (c && !digits_(c[2]) && digits_(clientPhone)) {
+          c[2] = clientPhone;  // atualiza telefone se vazio
+          if (c[1]) phoneFixes.push([c[1], clientPhone]);
+          cli.byPhone[digits_(clientPhone)] = c;
+        }
+
+        const start = new Date(dateVal);
+        const [hh, mm] = hora.split(':').map(n => parseInt(n, 10));
+        start.setHours(hh); start.setMinutes(mm); start.setSeconds(0);
+        const end = new Date(start.getTime() + defaultDur * 60000);
+        const values = [
+          prev ? prev[1] : 'A' + Date.now() + (seq++),
+          Utilities.formatDate(start, tz, 'yyyy-MM-dd'),
+          Utilities.formatDate(start, tz, 'HH:mm'),
+          defaultDur,
+          Utilities.formatDate(end, tz, 'HH:mm'),
+          employeeId,
+          it.employeeName,
+          c ? c[0] : '',
+          clientName,
+          clientPhone,
+          serviceId,
+          serviceName,
+          sheetName,
+          it.row,
+          'booked',
+          new Date(),
+          user,
+          '',
+          '',
+          '',
+          ''
+        ];
+        if (prev) updates.push([prev[0], values]);
+        else appends.push(values);
+        (done[sheetName] = done[sheetName] || []).push(a1);
+        ((audit[sheetName] = audit[sheetName] || {})[it.employeeName] = audit[sheetName][it.employeeName] || [])
+          .push(sh.getRange(it.row, CFG.COL_AUDIT).getA1Notation());
+      } catch (err) {
+        (failed[sheetName] = failed[sheetName] || []).push([a1, err.message]);
+      }
+    });
+  });
+
+  // gravações em lote
+  if (appends.length) apSh.getRange(apSh.getLastRow() + 1, 1, appends.length, CFG.APPT_COLS).setValues(appends);
+  updates.forEach(([row, values]) => apSh.getRange(row, 1, 1, CFG.APPT_COLS).setValues([values]));
+  if (cancels.length) apSh.getRangeList(cancels.map(r => 'O' + r)).setValue('cancelled'); // O = status
+  if (newClients.length || phoneFixes.length) {
+    const cliSh = ss.getSheetByName(CFG.DB_CLIENTS);
+    const h = {};
+    cli.header.forEach((name, i) => h[String(name).trim()] = i);
+    if (newClients.length) {
+      const now = new Date();
+      const rows = newClients.map(([id, name, phone]) => {
+        const r = cli.header.map(() => '');
+        r[h['client_id']] = id; r[h['name']] = name; r[h['phone']] = phone;
+        if ('created_at' in h) r[h['created_at']] = now;
+        if ('updated_at' in h) r[h['updated_at']] = now;
+        return r;
+      });
+      cliSh.getRange(cliSh.getLastRow() + 1, 1, rows.length, cli.header.length).setValues(rows);
+    }
+    phoneFixes.forEach(([row, phone]) => {
+      cliSh.getRange(row, h['phone'] + 1).setValue(phone);
+      if ('updated_at' in h) cliSh.getRange(row, h['updated_at'] + 1).setValue(new Date());
+    });
+    invalidateLookup_(CFG.DB_CLIENTS); // linhas novas: relê na próxima vez
+  }
+  Object.keys(done).forEach(sheetName => {
+    const sh = ss.getSheetByName(sheetName);
+    const list = sh.getRangeList(done[sheetName]);
+    list.setBackground(COLOR_DONE); // feedback
+    list.clearNote();               // erro de uma tentativa anterior, já resolvido
+    Object.keys(audit[sheetName]).forEach(name => sh.getRangeList(audit[sheetName][name]).setValue(name));
+  });
+  Object.keys(cleared).forEach(sheetName => {
+    // célula esvaziada: sai o amarelo (e o verde/vermelho de antes)
+    const list = ss.getSheetByName(sheetName).getRangeList(cleared[sheetName]);
+    list.setBackground(null);
+    list.clearNote();
+  });
+  let nErrors = 0;
+  Object.keys(failed).forEach(sheetName => {
+    const sh = ss.getSheetByName(sheetName);
+    failed[sheetName].forEach(([a1, msg]) => sh.getRange(a1).setBackground(COLOR_ERROR).setNote('Não registrado: ' + msg));
+    nErrors += failed[sheetName].length;
+  });
+  if (nErrors) {
+    // as células com erro saem da fila: uma nova edição nelas as enfileira de novo
+    SpreadsheetApp.getActive().toast(nErrors + ' célula(s) não registrada(s): veja as notas em vermelho.', 'Agenda', 10);
   }
 }
@@ -0,0 +1,134 @@
+# archive.py — Nessa Coiffeur — Arquivo morto: agendamentos antigos fora do DB "quente"
+#
+# Agendamentos e bloqueios com data anterior a (hoje - N dias) saem do DB e vão para
+# arquivos anuais comprimidos (`db/arquivo/agendamentos-2025.json.gz`). O DB guarda só
+# contadores por mês em `arquivo` (buckets de rollups.py), então abrir o app custa o mesmo com 1 ou 10 anos de
+# histórico. Os arquivos anuais só são lidos para histórico/relatórios (`history`).
+#
+# A compactação é idempotente: grava primeiro o arquivo anual (mesclado, sem duplicar
+# ids) e só depois remove as linhas do DB. Se parar no meio, basta rodar de novo.
+#
+# Linha de comando (lê .streamlit/secrets.toml):
+#   python archive.py --days 90 [--dry-run]
+import argparse
+import datetime as dt
+import gzip
+import json
+import tomllib
+
+from rollups import summarize
+from storage import PARTITIONED_KINDS, filter_rows, from_config, month_of, op_remove, op_set
+
+DEFAULT_DAYS = 90
+ID_KEYS = {"agendamentos": "appt_id", "bloqueios": "block_id"}
+
+
+def archive_name(kind: str, year) -> str:
+    return f"{kind}-{year}.json.gz"
+
+
+def pack(rows: list[dict]) -> bytes:
+    # mtime=0: mesmo conteúdo, mesmos bytes (e o mesmo sha no git)
+    return gzip.compress(json.dumps(rows, ensure_ascii=False).encode("utf-8"), mtime=0)
+
+
+def unpack(data: bytes | None) -> list[dict]:
+    return json.loads(gzip.decompress(data).decode("utf-8")) if data else []
+
+
+def _id(kind, row) -> str:
+    return str(row.get(ID_KEYS[kind], "") or "").strip()
+
+
+def compact(storage, days: int = DEFAULT_DAYS, today: dt.date | None = None, dry_run: bool = False) -> dict:
+    """Move agendamentos/bloqueios com data < hoje - `days` para os arquivos anuais.
+
+    Retorna {"ate", "movidos": {kind: n}, "arquivos": [nomes gravados]}.
+    """
+    cutoff = ((today or dt.date.today()) - dt.timedelta(days=int(days))).isoformat()
+    months = storage.stored_months()
+    if months is not None:
+        # backend particionado: carrega só os meses que podem ter linhas antigas, a partir
+        # do corte anterior (os de antes já foram esvaziados)
+        db, _ = storage.load()
+        since = (db.get("arquivo") or {}).get("ate", "")[:7]
+        months = [m for m in months if since <= m <= cutoff[:7]]
+    db, _ = storage.load(months=months)
+
+    report = {"ate": cutoff, "movidos": {}, "arquivos": []}
+    ops, summary = [], dict((db.get("arquivo") or {}).get("meses", {}))
+    for kind in PARTITIONED_KINDS:
+        old = [r for r in db.get(kind, []) if month_of(r.get("date")) and str(r["date"])[:10] < cutoff and _id(kind, r)]
+        report["movidos"][kind] = len(old)
+        if not old or dry_run:
+            continue
+        by_year = {}
+        for r in old:
+            by_year.setdefault(str(r["date"])[:4], []).append(r)
+        for year, rows in sorted(by_year.items()):
+            name = archive_name(kind, year)
+            merged = {_id(kind, r): r for r in unpack(storage.read_archive(name))}
+            merged.update((_id(kind, r), r) for r in rows)
+            merged = sorted(merged.values(), key=lambda r: (str(r.get("date", "")), str(r.get("start_time", ""))))
+            storage.write_archive(name, pack(merged), f"chore: arquivo morto {name}")
+            report["arquivos"].append(name)
+            if kind == "agendamentos":
+                # recalcula o ano inteiro a partir do arquivo: rodar de novo não conta em dobro
+                summary = {m: c for m, c in summary.items() if not m.startswith(year)}
+                summary.update(summarize(merged, by="month"))
+        ops.append(op_remove(kind, ID_KEYS[kind], [_id(kind, r) for r in old]))
+
+    if ops:
+        ops.append(op_set("arquivo", {
+            "ate": cutoff,
+            "atualizado_em": dt.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "meses": dict(sorted(summary.items())),
+        }))
+        storage.commit(ops, f"chore: arquiva agendamentos anteriores a {cutoff}")
+    if months:
+        # meses inteiros antes do corte não voltam para a memória
+        storage.release_months([m for m in months if m < cutoff[:7]])
+    return report
+
+
+def archived_years(db: dict) -> list[str]:
+    return sorted({m[:4] for m in (db.get("arquivo") or {}).get("meses", {})})
+
+
+def history(storage, year) -> dict:
+    """Agendamentos/bloqueios de um ano inteiro: arquivo morto + o que ainda está no DB.
+
+    Só aqui os arquivos anuais são lidos. Em backends particionados só os meses ainda não
+    arquivados são carregados, mas ficam no snapshot de `storage`: no app, passe uma
+    instância avulsa, não a compartilhada.
+    """
+    year = str(year)
+    db, _ = storage.load()
+    ate = (db.get("arquivo") or {}).get("ate", "")[:7]
+    stored = storage.stored_months()
+    if stored is not None:
+        db, _ = storage.load(months=[m for m in stored if m[:4] == year and m >= ate])
+    out = {}
+    for kind in PARTITIONED_KINDS:
+        rows = {_id(kind, r): r for r in unpack(storage.read_archive(archive_name(kind, year)))}
+        for r in db.get(kind, []):
+            if str(r.get("date", ""))[:4] == year:
+                rows[_id(kind, r) or id(r)] = r
+        out[kind] = filter_rows(rows.values())
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Move agendamentos antigos para o arquivo morto.")
+    ap.add_argument("--days", type=int, default=DEFAULT_DAYS, help="idade mínima em dias (padrão: %(default)s)")
+    ap.add_argument("--secrets", default=".streamlit/secrets.toml")
+    ap.add_argument("--dry-run", action="store_true", help="só conta, não grava")
+    args = ap.parse_args(argv)
+    with open(args.secrets, "rb") as f:
+        cfg = tomllib.load(f)
+    rep = compact(from_config(cfg), days=args.days, dry_run=args.dry_run)
+    print(json.dumps(rep, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
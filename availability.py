@@ -0,0 +1,320 @@
+# availability.py — Nessa Coiffeur — Índice de disponibilidade por profissional/dia
+#
+# Para cada (employee_id, "YYYY-MM-DD") guardamos os intervalos ocupados em minutos
+# desde 00:00 (agendamentos booked/done + bloqueios), ordenados pelo início, junto
+# com o máximo acumulado dos fins. Uma consulta de sobreposição vira um bisect.
+import datetime as dt
+import threading
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import pandas as pd
+
+BUSY_STATUSES = ("booked", "done")
+SLOT_STEPS = (15, 30, 60)
+_DAY_SPAN = 1 << 16  # separa grupos na chave composta (grupo, minuto)
+
+
+def to_min(hhmm) -> int:
+    h, m = map(int, str(hhmm).strip().split(":"))
+    return h * 60 + m
+
+
+def _date_key(date) -> str:
+    return date if isinstance(date, str) else date.strftime("%Y-%m-%d")
+
+
+class SlotTaken(Exception):
+    """O horário de um agendamento já está ocupado/bloqueado no estado atual do DB."""
+
+    def __init__(self, row: dict):
+        self.row = row
+        who = row.get("employee_name") or row.get("employee_id", "")
+        super().__init__(f"{row.get('date', '')} {row.get('start_time', '')} ({who}) ocupado/bloqueado")
+
+
+class _DaySlots:
+    """Intervalos de um (profissional, dia). O estado é uma tupla trocada numa atribuição só
+    (copy-on-write): `overlaps` roda sem lock nas threads das sessões enquanto `add` escreve."""
+
+    __slots__ = ("state",)
+
+    def __init__(self):
+        # (inícios ordenados, fins alinhados com os inícios, max(fins[0..i]))
+        self.state = ((), (), ())
+
+    def add(self, s: int, e: int):
+        starts, ends, max_end = self.state
+        j = bisect_right(starts, s)
+        starts = starts[:j] + (s,) + starts[j:]
+        ends = ends[:j] + (e,) + ends[j:]
+        run = max_end[j - 1] if j else e
+        tail = []
+        for k in range(j, len(ends)):
+            run = max(run, ends[k])
+            tail.append(run)
+        self.state = (starts, ends, max_end[:j] + tuple(tail))
+
+    def overlaps(self, s: int, e: int) -> bool:
+        starts, _, max_end = self.state   # uma leitura: listas sempre consistentes entre si
+        # intervalos com início < e são os de índice < i; basta o maior fim entre eles
+        i = bisect_left(starts, e)
+        return i > 0 and max_end[i - 1] > s
+
+
+class AvailabilityIndex:
+    """Intervalos ocupados por (employee_id, data), com consulta de conflito em O(log n)."""
+
+    def __init__(self):
+        self._days: dict[tuple[str, str], _DaySlots] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, appointments, blocks):
+        idx = cls()
+        for r in appointments:
+            idx.add_appointment(r)
+        for r in blocks:
+            idx.add_block(r)
+        return idx
+
+    @classmethod
+    def from_ops(cls, ops):
+        """Só os agendamentos/bloqueios acrescentados por `ops` (ex.: entradas do diário)."""
+        idx = cls()
+        for op in ops:
+            if op.get("op") == "append" and op.get("kind") == "agendamentos":
+                idx.add_appointment(op["row"])
+            elif op.get("op") == "append" and op.get("kind") == "bloqueios":
+                idx.add_block(op["row"])
+        return idx
+
+    def add(self, employee_id, date, start_min: int, end_min: int):
+        key = (str(employee_id), _date_key(date))
+        with self._lock:
+            day = self._days.get(key)
+            if day is None:
+                day = self._days[key] = _DaySlots()
+            day.add(int(start_min), int(end_min))
+
+    def add_appointment(self, row: dict) -> bool:
+        """Indexa um agendamento; ignora cancelados e linhas com horário inválido."""
+        if str(row.get("status", "booked")).strip().lower() not in BUSY_STATUSES:
+            return False
+        try:
+            s = to_min(row["start_time"])
+            dur = int(row.get("duration_min") or 60)
+        except (KeyError, TypeError, ValueError):
+            return False
+        self.add(row.get("employee_id", ""), str(row.get("date", "")), s, s + dur)
+        return True
+
+    def add_block(self, row: dict) -> bool:
+        try:
+            s, e = to_min(row["start_time"]), to_min(row["end_time"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        self.add(row.get("employee_id", ""), str(row.get("date", "")), s, e)
+        return True
+
+    def overlaps(self, employee_id, date, start_min: int, end_min: int) -> bool:
+        day = self._days.get((str(employee_id), _date_key(date)))
+        return day is not None and day.overlaps(int(start_min), int(end_min))
+
+    def busy(self, employee_id, date) -> list[tuple[int, int]]:
+        day = self._days.get((str(employee_id), _date_key(date)))
+        if day is None:
+            return []
+        starts, ends, _ = day.state
+        return list(zip(starts, ends))
+
+    def conflicts(self, rows) -> list[bool]:
+        """Para cada agendamento de `rows` (em ordem), se conflita com o índice ou com as linhas
+        anteriores aceitas — checagem de um lote inteiro numa passada, sem parar no primeiro."""
+        extra, out = AvailabilityIndex(), []
+        for row in rows:
+            emp, date, s = row.get("employee_id", ""), str(row.get("date", "")), to_min(row["start_time"])
+            e = s + int(row.get("duration_min") or 60)
+            clash = self.overlaps(emp, date, s, e) or extra.overlaps(emp, date, s, e)
+            if not clash:
+                extra.add(emp, date, s, e)
+            out.append(clash)
+        return out
+
+    def check(self, ops, extra: "AvailabilityIndex | None" = None):
+        """Mesma regra de `check_slots`, contra este índice em memória (sem varrer linhas).
+
+        `extra`: ocupados que ainda não estão neste índice (ex.: `from_ops` do diário); as
+        ops aceitas entram nele.
+        """
+        extra = extra if extra is not None else AvailabilityIndex()
+        for op in ops:
+            if op.get("op") != "append" or op.get("kind") not in ("agendamentos", "bloqueios"):
+                continue
+            row = op["row"]
+            if op["kind"] == "bloqueios":
+                extra.add_block(row)
+                continue
+            if str(row.get("status", "booked")).strip().lower() in BUSY_STATUSES:
+                emp, date, s = row.get("employee_id", ""), str(row.get("date", "")), to_min(row["start_time"])
+                e = s + int(row.get("duration_min") or 60)
+                if self.overlaps(emp, date, s, e) or extra.overlaps(emp, date, s, e):
+                    raise SlotTaken(row)
+            extra.add_appointment(row)
+
+
+def check_slots(query, ops):
+    """`check` de Storage.commit: recusa (SlotTaken) agendamentos das `ops` em conflito.
+
+    Confere contra o DB via `query(kind, date, employee_id)` e contra as próprias ops
+    anteriores do lote (bloqueios e agendamentos), só para os (profissional, dia) tocados.
+    """
+    idx, loaded = AvailabilityIndex(), set()
+    for op in ops:
+        if op.get("op") != "append" or op.get("kind") not in ("agendamentos", "bloqueios"):
+            continue
+        row = op["row"]
+        emp, date = str(row.get("employee_id", "")), str(row.get("date", ""))
+        if (emp, date) not in loaded:
+            for r in query("agendamentos", date, emp):
+                idx.add_appointment(r)
+            for r in query("bloqueios", date, emp):
+                idx.add_block(r)
+            loaded.add((emp, date))
+        if op["kind"] == "bloqueios":
+            idx.add_block(row)
+            continue
+        if str(row.get("status", "booked")).strip().lower() in BUSY_STATUSES:
+            s = to_min(row["start_time"])
+            if idx.overlaps(emp, date, s, s + int(row.get("duration_min") or 60)):
+                raise SlotTaken(row)
+        idx.add_appointment(row)
+
+
+# =========================
+# Horários livres em lote (vetorizado)
+# =========================
+def hhmm_to_min_col(col: pd.Series) -> pd.Series:
+    parts = col.astype(str).str.strip().str.split(":", n=1, expand=True)
+    if parts.shape[1] < 2:
+        return pd.Series(np.nan, index=col.index)
+    return pd.to_numeric(parts[0], errors="coerce") * 60 + pd.to_numeric(parts[1], errors="coerce")
+
+
+def busy_frame(appts_df: pd.DataFrame, blocks_df: pd.DataFrame, dates=None) -> pd.DataFrame:
+    """Intervalos ocupados (employee_id, date, start_min, end_min) de agendamentos booked/done e bloqueios."""
+    if dates is not None:
+        keys = [_date_key(d) for d in dates]
+        appts_df = appts_df[appts_df["date"].astype(str).isin(keys)] if not appts_df.empty else appts_df
+        blocks_df = blocks_df[blocks_df["date"].astype(str).isin(keys)] if not blocks_df.empty else blocks_df
+    frames = []
+    if not appts_df.empty:
+        ap = appts_df[appts_df["status"].astype(str).str.strip().str.lower().isin(BUSY_STATUSES)]
+        s = hhmm_to_min_col(ap["start_time"])
+        dur = pd.to_numeric(ap["duration_min"], errors="coerce").fillna(0)
+        dur = dur.where(dur != 0, 60)
+        frames.append(pd.DataFrame({
+            "employee_id": ap["employee_id"].astype(str), "date": ap["date"].astype(str),
+            "start_min": s, "end_min": s + dur,
+        }))
+    if not blocks_df.empty:
+        frames.append(pd.DataFrame({
+            "employee_id": blocks_df["employee_id"].astype(str), "date": blocks_df["date"].astype(str),
+            "start_min": hhmm_to_min_col(blocks_df["start_time"]), "end_min": hhmm_to_min_col(blocks_df["end_time"]),
+        }))
+    cols = ["employee_id", "date", "start_min", "end_min"]
+    if not frames:
+        return pd.DataFrame(columns=cols)
+    busy = pd.concat(frames, ignore_index=True).dropna(subset=["start_min", "end_min"])
+    busy = busy.astype({"start_min": "int64", "end_min": "int64"})
+    return busy[cols].reset_index(drop=True)
+
+
+def free_slots(busy: pd.DataFrame, employees: pd.DataFrame, dates, duration_min: int,
+               step_min: int = 60, within: tuple[int, int] | None = None) -> pd.DataFrame:
+    """Todos os inícios livres para `duration_min`, por profissional e data, numa passada só.
+
+    `employees` precisa de employee_id/default_start/default_end; o atendimento tem de caber
+    inteiro no expediente. Os inícios partem de default_start em passos de `step`; `within` =
+    (início, fim) em minutos, se dado, só descarta os que não cabem nessa faixa. Retorna
+    employee_id, date, start_min e time (HH:MM), ordenado.
+    """
+    out_cols = ["employee_id", "date", "start_min", "time"]
+    dates = [_date_key(d) for d in dates]
+    dur, step = int(duration_min), int(step_min)
+    if employees.empty or not dates or dur <= 0 or step <= 0:
+        return pd.DataFrame(columns=out_cols)
+
+    # candidatos: expediente de cada profissional x data, em passos de `step`
+    emp = pd.DataFrame({
+        "employee_id": employees["employee_id"].astype(str).to_numpy(),
+        "day_start": hhmm_to_min_col(employees["default_start"].fillna("09:00")).fillna(9 * 60).to_numpy(),
+        "day_end": hhmm_to_min_col(employees["default_end"].fillna("19:00")).fillna(19 * 60).to_numpy(),
+    })
+    grid = emp.merge(pd.DataFrame({"date": dates}), how="cross")
+    n = ((grid["day_end"] - dur - grid["day_start"]) // step + 1).clip(lower=0).astype("int64").to_numpy()
+    if n.sum() == 0:
+        return pd.DataFrame(columns=out_cols)
+    rows = np.repeat(np.arange(len(grid)), n)
+    offsets = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    cand = grid.iloc[rows][["employee_id", "date"]].reset_index(drop=True)
+    cand["start_min"] = grid["day_start"].to_numpy()[rows].astype("int64") + offsets * step
+    if within is not None:
+        # a grade continua partindo do expediente (a mesma do formulário); `within` só filtra
+        cs = cand["start_min"]
+        cand = cand[(cs >= within[0]) & (cs + dur <= within[1])].reset_index(drop=True)
+
+    # conflito: existe ocupado com início < fim do candidato e fim > início do candidato.
+    # Com os ocupados ordenados por (grupo, início) e o máximo acumulado dos fins por grupo,
+    # cada candidato resolve com um searchsorted.
+    busy = busy[busy["date"].isin(dates)]
+    busy = busy[busy["employee_id"].astype(str).isin(emp["employee_id"])]
+    keys = pd.concat([cand["employee_id"] + "|" + cand["date"],
+                      busy["employee_id"].astype(str) + "|" + busy["date"].astype(str)], ignore_index=True)
+    codes, _ = pd.factorize(keys)
+    cg, bg = codes[:len(cand)].astype("int64"), codes[len(cand):].astype("int64")
+    bs = busy["start_min"].to_numpy("int64")
+    be = busy["end_min"].to_numpy("int64")
+    order = np.lexsort((bs, bg))
+    bg, bs, be = bg[order], bs[order], be[order]
+    run_max = pd.Series(be).groupby(bg).cummax().to_numpy("int64") if len(be) else be
+    cs = cand["start_min"].to_numpy("int64")
+    pos = np.searchsorted(bg * _DAY_SPAN + bs, cg * _DAY_SPAN + cs + dur, side="left") - 1
+    safe = np.clip(pos, 0, None)
+    clash = (pos >= 0) & (bg[safe] == cg) & (run_max[safe] > cs) if len(bg) else np.zeros(len(cs), bool)
+
+    free = cand[~clash].copy()
+    # astype(str) (e não map(format)): com tudo ocupado, o vazio continua somando como texto
+    free["time"] = ((free["start_min"] // 60).astype(str).str.zfill(2) + ":"
+                    + (free["start_min"] % 60).astype(str).str.zfill(2))
+    return free.sort_values(["date", "start_min", "employee_id"])[out_cols].reset_index(drop=True)
+
+
+def earliest_slots(busy: pd.DataFrame, employees: pd.DataFrame, start, duration_min: int, k: int = 5,
+                   step_min: int = 60, days: int = 60, within: tuple[int, int] | None = None,
+                   not_before: tuple[str, int] | None = None) -> pd.DataFrame:
+    """Os `k` primeiros horários livres entre todos os `employees`, a partir da data `start`.
+
+    Procura em até `days` dias, em blocos que dobram de tamanho (1, 2, 4... dias), cada um
+    resolvido por `free_slots`; para no primeiro bloco que completa `k`. `not_before` =
+    (data 'YYYY-MM-DD', minuto) descarta inícios já passados (ex.: hoje, antes de agora).
+    Mesmas colunas de `free_slots`, na ordem data, horário, profissional.
+    """
+    out_cols = ["employee_id", "date", "start_min", "time"]
+    start = dt.date.fromisoformat(_date_key(start))
+    window = [_date_key(start + dt.timedelta(days=d)) for d in range(max(0, int(days)))]
+    if employees.empty or not window or k <= 0:
+        return pd.DataFrame(columns=out_cols)
+    # ocupados da janela e dos profissionais pedidos, filtrados uma vez só
+    ids = employees["employee_id"].astype(str)
+    busy = busy[busy["date"].isin(window) & busy["employee_id"].astype(str).isin(ids)]
+    found, pos, chunk, total = [], 0, 1, 0
+    while pos < len(window) and total < k:
+        free = free_slots(busy, employees, window[pos:pos + chunk], duration_min, step_min, within)
+        if not_before is not None and not free.empty:
+            day, minute = not_before
+            free = free[(free["date"] > day) | ((free["date"] == day) & (free["start_min"] >= minute))]
+        found.append(free.head(k - total))
+        total += len(found[-1])
+        pos, chunk = pos + chunk, chunk * 2
+    return pd.concat(found, ignore_index=True)[out_cols] if found else pd.DataFrame(columns=out_cols)
@@ -0,0 +1,4 @@
+# bench — Nessa Coiffeur — Benchmarks (gerador de dados, GitHub falso e suíte)
+#
+#   python -m bench.run --appointments 50000 --out resultados.json
+#   python -m bench.run --appointments 50000 --compare resultados.json
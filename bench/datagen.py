@@ -0,0 +1,138 @@
+# bench/datagen.py — Gerador de DBs sintéticos a partir de planilha_modelo/*.csv
+#
+# As colunas de cada tipo vêm dos cabeçalhos das planilhas modelo; serviços e
+# funcionários de exemplo vêm das próprias planilhas e são completados com
+# profissionais sintéticos. Agendamentos não se sobrepõem por profissional/dia.
+#
+#   python -m bench.datagen --appointments 100000 --employees 12 --out /tmp/db.json
+import argparse
+import csv
+import datetime as dt
+import json
+import os
+import random
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "planilha_modelo")
+SHEETS = {"clientes": "clients", "servicos": "services", "funcionarios": "employees",
+          "agendamentos": "appointments", "bloqueios": "blocks"}
+FIRST = ["ANA", "MARIA", "JULIA", "BEATRIZ", "CARLA", "PAULA", "FERNANDA", "LUCIA", "RENATA", "SOFIA", "CAMILA", "LARISSA"]
+LAST = ["SILVA", "SOUZA", "COSTA", "SANTOS", "OLIVEIRA", "PEREIRA", "LIMA", "ALMEIDA", "RIBEIRO", "GOMES"]
+
+
+def read_sheet(name: str, model_dir: str = MODEL_DIR) -> tuple[list[str], list[dict]]:
+    with open(os.path.join(model_dir, f"{name}.csv"), encoding="utf-8", newline="") as f:
+        r = csv.DictReader(f)
+        return list(r.fieldnames or []), list(r)
+
+
+def _hhmm(m: int) -> str:
+    return f"{m // 60:02d}:{m % 60:02d}"
+
+
+def generate(appointments: int = 10_000, employees: int = 6, clients: int = 2_000, end: dt.date | None = None,
+             per_day: tuple[int, int] = (3, 8), seed: int = 0, model_dir: str = MODEL_DIR) -> dict:
+    """DB no formato de db/db.json com `appointments` agendamentos terminando em `end` (padrão: hoje + 30)."""
+    rng = random.Random(seed)
+    cols = {kind: read_sheet(sheet, model_dir)[0] for kind, sheet in SHEETS.items()}
+    end = end or dt.date.today() + dt.timedelta(days=30)
+    today = dt.date.today().isoformat()
+
+    services = []
+    for r in read_sheet("services", model_dir)[1]:
+        row = {c: r.get(c, "") for c in cols["servicos"]}
+        row.update(active=str(r.get("active", "")).upper() != "FALSE",
+                   default_duration=int(r.get("default_duration_min") or 60),
+                   base_price=r.get("base_price") or str(rng.choice([40, 60, 80, 120, 180])))
+        services.append(row)
+    specialties = sorted({s["specialty"] for s in services})
+
+    staff = [dict(r) for r in read_sheet("employees", model_dir)[1]]
+    while len(staff) < employees:
+        i = len(staff) + 1
+        staff.append({"employee_id": str(i), "name": f"{rng.choice(FIRST)} {i}", "role": "func",
+                      "specialty": specialties[i % len(specialties)], "active": "TRUE",
+                      "default_start": "09:00", "default_end": "19:00"})
+    funcionarios = []
+    for r in staff[:employees]:
+        row = {c: r.get(c, "") for c in cols["funcionarios"]}
+        row.update(active=True, username=f"func{row['employee_id']}", email="", password_hash="",
+                   must_change_password=True)
+        funcionarios.append(row)
+
+    clientes = [{c: "" for c in cols["clientes"]} | {
+        "client_id": f"C{i}", "name": f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+        "phone": f"(11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+        "created_at": today, "updated_at": today,
+    } for i in range(clients)]
+
+    by_spec = {s: [v for v in services if v["specialty"] == s] for s in specialties}
+    agenda, bloqueios = [], []
+    n_days = max(1, -(-appointments // max(1, len(funcionarios) * sum(per_day) // 2)))
+    day = end - dt.timedelta(days=n_days - 1)
+    seq = 0
+    while len(agenda) < appointments:
+        date = day.isoformat()
+        for emp in funcionarios:
+            t, fim = 9 * 60, 19 * 60
+            opts = by_spec.get(emp["specialty"]) or services
+            if rng.random() < 0.05:
+                bloqueios.append({c: "" for c in cols["bloqueios"]} | {
+                    "block_id": f"B{len(bloqueios)}", "date": date, "start_time": "12:00", "end_time": "13:00",
+                    "employee_id": emp["employee_id"], "employee_name": emp["name"], "reason": "Almoço",
+                    "created_at": date, "created_by": "bench"})
+            for _ in range(rng.randint(*per_day)):
+                svc = rng.choice(opts)
+                dur = int(svc["default_duration"])
+                t += rng.choice((0, 0, 30, 60))
+                if t + dur > fim or len(agenda) >= appointments:
+                    break
+                cli = rng.choice(clientes) if clientes else {"client_id": "", "name": "", "phone": ""}
+                status = "booked" if date >= today else rng.choices(("done", "cancelled"), (92, 8))[0]
+                price = svc["base_price"]
+                seq += 1
+                agenda.append({c: "" for c in cols["agendamentos"]} | {
+                    "appt_id": f"A{seq}", "date": date, "start_time": _hhmm(t), "duration_min": dur,
+                    "end_time": _hhmm(t + dur), "employee_id": emp["employee_id"], "employee_name": emp["name"],
+                    "client_id": cli["client_id"], "client_name": cli["name"], "client_phone": cli["phone"],
+                    "service_id": svc["service_id"], "service_name": svc["name"], "source_sheet": "bench",
+                    "status": status, "created_at": date, "created_by": "bench", "price": price,
+                    "final_price": price,
+                })
+                t += dur
+        day += dt.timedelta(days=1)
+
+    return {"clientes": clientes, "servicos": services, "funcionarios": funcionarios,
+            "agendamentos": agenda, "bloqueios": bloqueios,
+            "generated_at": dt.datetime.utcnow().isoformat(timespec="seconds") + "Z"}
+
+
+def split_by_month(db: dict) -> tuple[dict, dict[str, list]]:
+    """(mestre sem agendamentos/bloqueios, {'agendamentos/2026-10': linhas, ...}) — layout mensal."""
+    master = {k: v for k, v in db.items() if k not in ("agendamentos", "bloqueios")}
+    master.update(agendamentos=[], bloqueios=[])
+    parts = {}
+    for kind in ("agendamentos", "bloqueios"):
+        for r in db[kind]:
+            parts.setdefault(f"{kind}/{r['date'][:7]}", []).append(r)
+    return master, parts
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Gera um DB sintético a partir de planilha_modelo/.")
+    ap.add_argument("--appointments", type=int, default=10_000)
+    ap.add_argument("--employees", type=int, default=6)
+    ap.add_argument("--clients", type=int, default=2_000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="-")
+    args = ap.parse_args(argv)
+    db = generate(args.appointments, args.employees, args.clients, seed=args.seed)
+    text = json.dumps(db, ensure_ascii=False, indent=2)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
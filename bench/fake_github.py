@@ -0,0 +1,256 @@
+# bench/fake_github.py — Stand-in local da API do GitHub (Contents API e Git Data API)
+#
+# Atende GET/PUT em /repos/{owner}/{repo}/contents/{path} (com ETag/304, 404, 409 por
+# sha desatualizado e listagem de pastas) e o mínimo da Git Data API usado por
+# storage.py (ref com ETag, commits, trees, blobs, update da ref só fast-forward), com
+# latência e falhas injetáveis:
+#   - latency: segundos somados a cada resposta
+#   - p409: chance de um PUT válido responder 409 (como se outro processo gravasse antes)
+#   - p429: chance de qualquer chamada responder 429 com Retry-After
+# Como no GitHub, o sha de um arquivo é o sha do blob git e cada PUT vira um commit na branch.
+#
+#   python -m bench.fake_github --port 8765 --seed db/db.json --latency-ms 40 --p429 0.02
+#   (no app: GH_API_BASE = "http://127.0.0.1:8765")
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+class FakeGitHub:
+    def __init__(self, latency: float = 0.0, p409: float = 0.0, p429: float = 0.0,
+                 retry_after: float = 0.0, seed: int = 0):
+        self.files: dict[str, tuple[bytes, str]] = {}   # caminho -> (bytes, sha) no head da branch
+        self.blobs: dict[str, bytes] = {}
+        self.trees: dict[str, dict[str, str]] = {}       # sha -> {caminho: sha do blob}
+        self.commits: dict[str, tuple[str, list[str]]] = {}   # sha -> (tree, pais)
+        self.head: str | None = None
+        self.latency, self.p409, self.p429, self.retry_after = latency, p409, p429, retry_after
+        self.stats: dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.write_lock = threading.Lock()   # PUT e update da ref: conferir e gravar sem corrida
+        self._srv = None
+
+    # --- arquivos ---
+    def put(self, path: str, content: bytes | str):
+        """Grava `path` direto na branch (um commit novo), como um PUT da Contents API."""
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        self.files[path] = (data, self.blob(data))
+        tree = self.tree({p: sha for p, (_, sha) in self.files.items()})
+        self.head = self.commit(tree, [self.head] if self.head else [])
+
+    def blob(self, data: bytes) -> str:
+        sha = hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+        self.blobs[sha] = data
+        return sha
+
+    def tree(self, entries: dict[str, str]) -> str:
+        sha = hashlib.sha1(json.dumps(sorted(entries.items())).encode()).hexdigest()
+        self.trees[sha] = dict(entries)
+        return sha
+
+    def commit(self, tree: str, parents: list[str], message: str = "") -> str:
+        sha = hashlib.sha1(json.dumps([tree, parents, message, len(self.commits)]).encode()).hexdigest()
+        self.commits[sha] = (tree, list(parents))
+        return sha
+
+    def descends(self, commit: str, ancestor: str | None) -> bool:
+        todo = [commit]
+        while todo:
+            c = todo.pop()
+            if c == ancestor:
+                return True
+            todo.extend(self.commits.get(c, ("", []))[1])
+        return ancestor is None
+
+    def move_head(self, commit: str):
+        self.head = commit
+        tree = self.trees[self.commits[commit][0]]
+        self.files = {p: (self.blobs[sha], sha) for p, sha in tree.items()}
+
+    def count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + n
+
+    def roll(self, p: float) -> bool:
+        with self._lock:
+            return p > 0 and self._rng.random() < p
+
+    # --- servidor ---
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        fake = self
+
+        class Handler(_Handler):
+            gh = fake
+
+        self._srv = ThreadingHTTPServer((host, port), Handler)
+        self._srv.daemon_threads = True
+        threading.Thread(target=self._srv.serve_forever, name="fake-github", daemon=True).start()
+        return f"http://{host}:{self._srv.server_port}"
+
+    def stop(self):
+        if self._srv:
+            self._srv.shutdown()
+            self._srv.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    gh: FakeGitHub
+    protocol_version = "HTTP/1.1"   # keep-alive, como o GitHub
+
+    def log_message(self, *a):
+        pass
+
+    def _send(self, code: int, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.gh.count(f"{self.command} {code}")
+        self.gh.count("bytes_out", len(data))
+        self.send_response(code)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _path(self) -> str | None:
+        parts = urlsplit(self.path).path.split("/contents/", 1)
+        return parts[1] if len(parts) == 2 else None
+
+    def _git(self) -> str | None:
+        """'ref/heads/main', 'trees/<sha>'... para rotas da Git Data API."""
+        parts = urlsplit(self.path).path.split("/git/", 1)
+        return parts[1] if len(parts) == 2 else None
+
+    def _body(self) -> dict:
+        return json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+
+    def _send_raw(self, data: bytes):
+        self.gh.count(f"{self.command} 200")
+        self.gh.count("bytes_out", len(data))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _git_get(self, route: str):
+        kind, _, arg = route.partition("/")
+        if kind == "ref" and self.gh.head:
+            etag = f'"{self.gh.head}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, None, {"ETag": etag})
+            return self._send(200, {"object": {"sha": self.gh.head, "type": "commit"}}, {"ETag": etag})
+        if kind == "commits" and arg in self.gh.commits:
+            return self._send(200, {"sha": arg, "tree": {"sha": self.gh.commits[arg][0]}})
+        if kind == "trees" and arg in self.gh.trees:
+            return self._send(200, {"sha": arg, "truncated": False, "tree": [
+                {"path": p, "type": "blob", "sha": b} for p, b in self.gh.trees[arg].items()]})
+        if kind == "blobs" and arg in self.gh.blobs:
+            return self._send_raw(self.gh.blobs[arg])
+        return self._send(404, {"message": "Not Found"})
+
+    def _prelude(self) -> bool:
+        """Latência e 429 injetados; False se a resposta já foi enviada."""
+        if self.gh.latency:
+            time.sleep(self.gh.latency)
+        if self.gh.roll(self.gh.p429):
+            self._send(429, {"message": "secondary rate limit"}, {"Retry-After": str(self.gh.retry_after)})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._prelude():
+            return
+        if self._git() is not None:
+            return self._git_get(self._git())
+        path = self._path()
+        if path is None:
+            return self._send(404, {"message": "Not Found"})
+        if path not in self.gh.files:
+            prefix = path.rstrip("/") + "/"
+            kids = sorted(k[len(prefix):] for k in self.gh.files if k.startswith(prefix) and "/" not in k[len(prefix):])
+            if kids:
+                return self._send(200, [{"name": k, "path": prefix + k, "type": "file"} for k in kids])
+            return self._send(404, {"message": "Not Found"})
+        content, sha = self.gh.files[path]
+        etag = f'"{sha}"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, None, {"ETag": etag})
+        self._send(200, {"sha": sha, "path": path, "encoding": "base64",
+                         "content": base64.b64encode(content).decode()}, {"ETag": etag})
+
+    def do_PUT(self):
+        body = self._body()
+        if not self._prelude():
+            return
+        path = self._path()
+        with self.gh.write_lock:
+            cur = self.gh.files.get(path)
+            if (cur and body.get("sha") != cur[1]) or (not cur and body.get("sha")) or self.gh.roll(self.gh.p409):
+                return self._send(409, {"message": f"{path} does not match {body.get('sha')}"})
+            self.gh.put(path, base64.b64decode(body["content"]))
+            sha, commit = self.gh.files[path][1], self.gh.head
+        self.gh.count("bytes_in", len(body["content"]))
+        parents = [{"sha": p} for p in self.gh.commits[commit][1]]
+        self._send(200, {"content": {"sha": sha, "path": path}, "commit": {"sha": commit, "parents": parents}})
+
+    def do_POST(self):
+        body = self._body()
+        if not self._prelude():
+            return
+        kind = self._git()
+        if kind == "blobs":
+            return self._send(201, {"sha": self.gh.blob(base64.b64decode(body["content"]))})
+        if kind == "trees":
+            entries = dict(self.gh.trees.get(body.get("base_tree"), {}))
+            for e in body.get("tree", []):
+                entries[e["path"]] = e["sha"] if e.get("sha") else self.gh.blob(e["content"].encode("utf-8"))
+            self.gh.count("bytes_in", sum(len(e.get("content", "")) for e in body.get("tree", [])))
+            return self._send(201, {"sha": self.gh.tree(entries)})
+        if kind == "commits":
+            return self._send(201, {"sha": self.gh.commit(body["tree"], body.get("parents", []), body.get("message", ""))})
+        return self._send(404, {"message": "Not Found"})
+
+    def do_PATCH(self):
+        body = self._body()
+        if not self._prelude():
+            return
+        if not (self._git() or "").startswith("refs/heads/"):
+            return self._send(404, {"message": "Not Found"})
+        with self.gh.write_lock:
+            if body["sha"] not in self.gh.commits or not (body.get("force") or self.gh.descends(body["sha"], self.gh.head)) \
+                    or self.gh.roll(self.gh.p409):
+                return self._send(422, {"message": "Update is not a fast forward"})
+            self.gh.move_head(body["sha"])
+        self._send(200, {"object": {"sha": body["sha"], "type": "commit"}})
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="API do GitHub falsa (Contents + Git Data), para benchmarks e testes locais.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--seed", help="JSON servido como db/db.json")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--p409", type=float, default=0.0)
+    ap.add_argument("--p429", type=float, default=0.0)
+    ap.add_argument("--retry-after", type=float, default=1.0)
+    args = ap.parse_args(argv)
+    gh = FakeGitHub(args.latency_ms / 1000, args.p409, args.p429, args.retry_after)
+    if args.seed:
+        with open(args.seed, "rb") as f:
+            gh.put("db/db.json", f.read())
+    print(f"GH_API_BASE = \"{gh.start(args.host, args.port)}\"", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        gh.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# bench/run.py — Suíte de benchmarks dos caminhos quentes do app
+#
+# Gera um DB sintético (bench/datagen.py), serve-o pelo GitHub falso (bench/fake_github.py)
+# ou por um SQLite temporário e mede, por backend:
+#   load_cold / load_warm  — load_db sem cache / revalidação com 304
+#   model                  — preparação dos DataFrames (Model)
+#   model_next_version     — Model da versão seguinte (+1 agendamento) a partir do anterior
+#   is_free                — consultas de conflito no índice de disponibilidade
+#   free_slots_day / _week — lista de horários (1 profissional/dia; todos/semana)
+#   earliest_slots         — 5 primeiros horários livres entre todos (busca da aba Agendar)
+#   client_search          — busca de clientes por prefixo (nome/telefone) no ClientIndex
+#   agenda_week / _month   — grade da agenda de todos os ativos (7 / 31 dias, passo de 30 min)
+#   commit                 — um agendamento gravado (op log + check_slots)
+#   save                   — DB inteiro regravado (backends que suportam)
+#   dashboard_<período>    — agregações do Dashboard via rollups
+# A saída é JSON (ms por caso: min/mediana/p95/média/máx) para comparar versões.
+#
+#   python -m bench.run --appointments 50000 --latency-ms 30 --out antes.json
+#   python -m bench.run --appointments 50000 --latency-ms 30 --compare antes.json
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import github_api
+from agenda import agenda_grid
+from availability import SLOT_STEPS, check_slots, earliest_slots, free_slots, to_min
+from bench.datagen import generate, split_by_month
+from bench.fake_github import FakeGitHub
+from model import Model
+from rollups import PERIODS, period_range
+from storage import GitHubJSONStorage, GitHubPartitionedStorage, SQLiteStorage, month_of, op_append
+
+BACKENDS = ("github", "github-monthly", "sqlite")
+
+
+def _stats(samples: list[float]) -> dict:
+    ms = sorted(x * 1000 for x in samples)
+    p95 = ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))]
+    return {"n": len(ms), "min": round(ms[0], 3), "median": round(statistics.median(ms), 3),
+            "p95": round(p95, 3), "mean": round(statistics.fmean(ms), 3), "max": round(ms[-1], 3)}
+
+
+def timeit(fn, repeat: int) -> list[float]:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# =========================
+# Backends
+# =========================
+def _seed_github(fake: FakeGitHub, db: dict, monthly: bool):
+    fake.files.clear()
+    if not monthly:
+        fake.put("db/db.json", json.dumps(db, ensure_ascii=False, indent=2))
+        return
+    master, parts = split_by_month(db)
+    fake.put("db/db.json", json.dumps(master, ensure_ascii=False, indent=2))
+    for name, rows in parts.items():
+        fake.put(f"db/{name}.json", json.dumps(rows, ensure_ascii=False, indent=2))
+
+
+def make_factory(backend: str, db: dict, fake: FakeGitHub | None, tmp: str):
+    """Função que cria um storage novo (sem cache) já semeado com `db`."""
+    if backend == "sqlite":
+        path = os.path.join(tmp, "bench.sqlite3")
+        SQLiteStorage(path).save(db, None, "bench: seed")
+        return lambda: SQLiteStorage(path)
+    _seed_github(fake, db, monthly=backend == "github-monthly")
+    if backend == "github-monthly":
+        return lambda: GitHubPartitionedStorage("bench/nessa", "db/db.json", "main")
+    return lambda: GitHubJSONStorage("bench/nessa", "db/db.json", "main")
+
+
+def view_months(today: dt.date) -> list[str]:
+    return sorted({month_of(today), month_of(today + dt.timedelta(days=31))})
+
+
+# =========================
+# Casos
+# =========================
+def run_backend(backend: str, db: dict, fake, tmp: str, repeat: int, queries: int, rng) -> dict:
+    factory = make_factory(backend, db, fake, tmp)
+    today, months = dt.date.today(), view_months(dt.date.today())
+    res = {}
+
+    def cold():
+        github_api._ETAGS.clear()   # sem ETag: download completo
+        factory().load(months=months)
+
+    res["load_cold"] = timeit(cold, repeat)
+    storage = factory()
+    snap, _ = storage.load(months=months)
+    res["load_warm"] = timeit(lambda: storage.load(max_age=0, months=months), repeat)
+
+    res["model"] = timeit(lambda: Model(snap), repeat)
+    m = Model(snap)
+    # versão seguinte com um agendamento a mais: os rollups herdam os dias sem mudança
+    nxt = {**snap, "agendamentos": snap["agendamentos"] + [
+        {"appt_id": "BENCHNEXT", "date": today.isoformat(), "start_time": "08:00", "duration_min": 30,
+         "employee_id": "bench", "status": "booked"}]}
+    res["model_next_version"] = timeit(lambda: Model(nxt, prev=m), repeat)
+    emps = [r for r in m.active_employees]
+    days = [today + dt.timedelta(days=d) for d in range(14)]
+    probes = [(rng.choice(emps)["employee_id"], rng.choice(days), f"{rng.randint(9, 17):02d}:{rng.choice((0, 30)):02d}")
+              for _ in range(queries)]
+
+    def is_free_batch():
+        for emp, day, hhmm in probes:
+            s = to_min(hhmm)
+            m.avail.overlaps(emp, day, s, s + 60)
+
+    res["is_free"] = [t / queries for t in timeit(is_free_batch, repeat)]
+    one = pd.DataFrame([emps[0]])
+    res["free_slots_day"] = timeit(lambda: free_slots(m.busy, one, [today], 60, SLOT_STEPS[0]), repeat)
+    week = [today + dt.timedelta(days=d) for d in range(7)]
+    res["free_slots_week"] = timeit(lambda: free_slots(m.busy, pd.DataFrame(emps), week, 60, SLOT_STEPS[0]), repeat)
+    res["earliest_slots"] = timeit(lambda: earliest_slots(m.busy, pd.DataFrame(emps), today, 60, k=5,
+                                                          step_min=SLOT_STEPS[0], days=60), repeat)
+
+    for case, n in (("agenda_week", 7), ("agenda_month", 31)):
+        res[case] = timeit(lambda n=n: agenda_grid(m.appts, m.blocks, pd.DataFrame(emps), today, n, 30), repeat)
+
+    names = [str(r.get("name", "")) for r in snap.get("clientes", [])] or ["ANA"]
+    prefixes = [rng.choice(names)[:rng.randint(2, 5)] for _ in range(queries)]
+
+    def client_search_batch():
+        for q in prefixes:
+            m.client_index.search(q, limit=8)
+
+    res["client_search"] = [t / queries for t in timeit(client_search_batch, repeat)]
+
+    for period in PERIODS:
+        ini, fim = period_range(today, period)
+
+        def dash(ini=ini, fim=fim):
+            m.rollups.totals(ini, fim)
+            m.rollups.by_group(ini, fim, "por_profissional")
+            m.rollups.by_group(ini, fim, "por_servico")
+
+        res[f"dashboard_{period.lower()}"] = timeit(dash, repeat)
+
+    seq = iter(range(10**9))
+
+    def commit():
+        i = next(seq)
+        row = {"appt_id": f"BENCH{i}", "date": today.isoformat(), "start_time": "08:00", "duration_min": 30,
+               "employee_id": f"bench-{i}", "status": "booked"}
+        storage.commit([op_append("agendamentos", row)], f"bench: commit {i}", check_slots)
+
+    res["commit"] = timeit(commit, repeat)
+    if backend != "github-monthly":
+        res["save"] = timeit(lambda: storage.save(snap, storage.load()[1], "bench: save"), repeat)
+    return {case: _stats(samples) for case, samples in res.items()}
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    lines = [f"{'backend':16} {'caso':22} {'antes':>10} {'agora':>10} {'razão':>7}"]
+    for backend, cases in new["results"].items():
+        for case, st in cases.items():
+            prev = old.get("results", {}).get(backend, {}).get(case)
+            if prev:
+                ratio = st["median"] / prev["median"] if prev["median"] else float("inf")
+                lines.append(f"{backend:16} {case:22} {prev['median']:10.3f} {st['median']:10.3f} {ratio:7.2f}")
+    return lines
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks do app (ms por operação, saída JSON).")
+    ap.add_argument("--appointments", type=int, default=20_000, help="até 500 mil")
+    ap.add_argument("--employees", type=int, default=10)
+    ap.add_argument("--clients", type=int, default=5_000)
+    ap.add_argument("--backends", default=",".join(BACKENDS))
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--queries", type=int, default=2_000, help="consultas por rodada de is_free")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--p409", type=float, default=0.0)
+    ap.add_argument("--p429", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="grava o JSON neste arquivo (padrão: stdout)")
+    ap.add_argument("--compare", help="JSON de uma rodada anterior: imprime a razão das medianas")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    db = generate(args.appointments, args.employees, args.clients, seed=args.seed)
+    gen_s = time.perf_counter() - t0
+
+    fake = FakeGitHub(args.latency_ms / 1000, args.p409, args.p429, retry_after=0, seed=args.seed)
+    github_api.configure("bench-token", api_base=fake.start(), session=github_api.new_session())
+    rng, tmp = random.Random(args.seed), tempfile.mkdtemp(prefix="nessa-bench-")
+    results = {}
+    try:
+        for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+            if backend not in BACKENDS:
+                ap.error(f"backend desconhecido: {backend}")
+            print(f"[bench] {backend}...", file=sys.stderr, flush=True)
+            results[backend] = run_backend(backend, db, fake, tmp, args.repeat, args.queries, rng)
+    finally:
+        fake.stop()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    out = {
+        "meta": {"git": _git_rev(), "python": platform.python_version(), "pandas": pd.__version__,
+                 "platform": platform.platform(), "at": dt.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                 "generate_s": round(gen_s, 3)},
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare")} | {
+            "rows": {k: len(v) for k, v in db.items() if isinstance(v, list)}},
+        "unit": "ms",
+        "results": results,
+        "server": fake.stats,
+    }
+    text = json.dumps(out, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print("\n".join(compare(json.load(f), out)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
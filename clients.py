@@ -0,0 +1,145 @@
+# clients.py — Nessa Coiffeur — Cadastro de clientes indexado em memória
+#
+# Mesmas regras do apps_script/code.gs para achar um cliente: primeiro pelo telefone só
+# com dígitos, depois pelo nome em caixa alta (aqui também sem acentos). Por versão do DB
+# o Model monta:
+#   - hashes: id -> cliente, dígitos do telefone -> id, nome normalizado -> id
+#   - prefixos: lista ordenada de (chave, id) com o nome normalizado a partir de cada
+#     palavra ("MARIA DA SILVA", "DA SILVA", "SILVA") e o telefone; uma busca é um bisect
+#   - histórico: agendamentos por cliente (os antigos sem client_id entram pelo
+#     telefone/nome), agrupados uma vez na primeira consulta da versão
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+
+_NON_DIGITS = re.compile(r"\D")
+_MIN_PHONE_DIGITS = 8   # menos que isso não identifica ninguém (ex.: "0", "123")
+
+
+def phone_digits(phone) -> str:
+    return _NON_DIGITS.sub("", str(phone or ""))
+
+
+def name_key(name) -> str:
+    """Nome normalizado: caixa alta (como no code.gs), espaços colapsados e sem acentos
+    ("José  da Silva" e "jose da silva" são a mesma pessoa)."""
+    key = " ".join(str(name or "").upper().split())
+    if key.isascii():
+        return key
+    return unicodedata.normalize("NFKD", key).encode("ascii", "ignore").decode("ascii")
+
+
+class ClientIndex:
+    """Clientes de uma versão do DB, com busca por prefixo e histórico de agendamentos."""
+
+    def __init__(self):
+        self.by_id: dict[str, dict] = {}
+        self.by_phone: dict[str, str] = {}
+        self.by_name: dict[str, str] = {}
+        self._prefix: list[tuple[str, str]] = []     # (chave, client_id), ordenada
+        self._history: dict[str, list[dict]] | None = None   # montado na primeira consulta
+        self._appts: list[dict] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, clients, appointments):
+        idx = cls()
+        prefix = []
+        for r in clients:
+            prefix += idx._index(r)
+        idx._prefix = sorted(prefix)
+        idx._appts = list(appointments)
+        return idx
+
+    def _index(self, row: dict) -> list[tuple[str, str]]:
+        cid = str(row.get("client_id", "") or "").strip()
+        if not cid:
+            return []
+        self.by_id[cid] = row
+        tel, nome = phone_digits(row.get("phone")), name_key(row.get("name"))
+        if len(tel) >= _MIN_PHONE_DIGITS:
+            self.by_phone.setdefault(tel, cid)
+        if nome:
+            self.by_name.setdefault(nome, cid)
+        return self._keys(cid, nome, tel)
+
+    @staticmethod
+    def _keys(cid: str, nome: str, tel: str) -> list[tuple[str, str]]:
+        keys = [(tel, cid)] if tel else []
+        while nome:
+            keys.append((nome, cid))
+            nome = nome.partition(" ")[2]
+        return keys
+
+    def add(self, row: dict):
+        """Indexa um cliente novo (ex.: criado ao agendar nesta sessão)."""
+        with self._lock:
+            for key in self._index(row):
+                insort(self._prefix, key)
+
+    def update(self, client_id: str, changes: dict):
+        with self._lock:
+            row = self.by_id.get(client_id)
+            if row is None:
+                return
+            old = set(self._keys(client_id, name_key(row.get("name")), phone_digits(row.get("phone"))))
+            for key in self._index({**row, **changes}):
+                if key not in old:
+                    insort(self._prefix, key)
+
+    # --- consultas ---
+    def match(self, name, phone) -> dict | None:
+        """Cliente já cadastrado: pelo telefone (dígitos) e, se não achar, pelo nome."""
+        tel = phone_digits(phone)
+        cid = self.by_phone.get(tel) if len(tel) >= _MIN_PHONE_DIGITS else None
+        if cid is None and name_key(name):
+            cid = self.by_name.get(name_key(name))
+        return self.by_id.get(cid) if cid else None
+
+    def search(self, query, limit: int = 10) -> list[dict]:
+        """Clientes cujo nome (a partir de qualquer palavra) ou telefone começa com `query`."""
+        # só dígitos e pontuação: telefone; com letras: nome
+        q = name_key(query) if any(c.isalpha() for c in str(query)) else phone_digits(query)
+        if not q:
+            return []
+        out, seen = [], set()
+        with self._lock:
+            i = bisect_left(self._prefix, (q, ""))
+            while i < len(self._prefix) and len(out) < limit:
+                key, cid = self._prefix[i]
+                if not key.startswith(q):
+                    break
+                if cid not in seen:
+                    seen.add(cid)
+                    out.append(self.by_id[cid])
+                i += 1
+        return out
+
+    # --- histórico ---
+    def _file(self, row: dict):
+        cid = str(row.get("client_id", "") or "").strip()
+        if cid not in self.by_id:
+            found = self.match(row.get("client_name"), row.get("client_phone"))
+            cid = found["client_id"] if found else None
+        if cid:
+            self._history.setdefault(cid, []).append(row)
+
+    def add_appointment(self, row: dict):
+        with self._lock:
+            if self._history is None:
+                self._appts.append(row)
+            else:
+                self._file(row)
+
+    def history(self, client_id: str) -> list[dict]:
+        """Agendamentos do cliente, do mais recente ao mais antigo. A primeira consulta da
+        versão agrupa os agendamentos por cliente (uma passada); as demais são um lookup."""
+        with self._lock:
+            if self._history is None:
+                self._history = {}
+                for r in self._appts:
+                    self._file(r)
+                self._appts = []
+            rows = list(self._history.get(str(client_id), []))
+        return sorted(rows, key=lambda r: (str(r.get("date", "")), str(r.get("start_time", ""))), reverse=True)
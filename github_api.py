@@ -0,0 +1,395 @@
+# github_api.py — Nessa Coiffeur — Cliente da API do GitHub (Contents API e Git Data API)
+import base64
+import hashlib
+import random
+import threading
+import time
+from functools import wraps
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import perf
+
+API_BASE = "https://api.github.com"
+GH_TOKEN = ""
+TIMEOUT = (5, 30)          # (conexão, leitura) em segundos
+
+# Política de retry
+RETRY_ATTEMPTS = 5
+BACKOFF_BASE = 0.5         # s; teto exponencial = BACKOFF_BASE * 2**tentativa
+BACKOFF_CAP = 8.0
+MAX_RATE_WAIT = 60.0       # não espera um reset de cota mais longo que isso: falha logo
+LOW_QUOTA = 50             # abaixo disso, espaça as chamadas até o reset
+MAX_PACE = 5.0
+
+_SESSION: requests.Session | None = None
+
+# ETag da última resposta de cada arquivo/ref: {(repo, path, ref): {"etag", "sha"}}. Só o
+# ETag e o sha: o conteúdo fica com quem o leu (o snapshot do storage), não no processo.
+_ETAGS: dict[tuple[str, str, str], dict] = {}
+_ETAGS_LOCK = threading.Lock()
+
+
+def new_session(pool_maxsize: int = 10) -> requests.Session:
+    """Session keep-alive com pool de conexões (um handshake TLS por conexão, não por chamada)."""
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_maxsize, max_retries=0)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def configure(token: str, api_base: str | None = None, session: requests.Session | None = None):
+    """Define o token, a URL base e a Session usados por todas as chamadas."""
+    global GH_TOKEN, API_BASE, _SESSION
+    GH_TOKEN = token or ""
+    if api_base:
+        API_BASE = api_base.rstrip("/")
+    if session is not None:
+        _SESSION = session
+
+
+def _session() -> requests.Session:
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = new_session()
+    return _SESSION
+
+
+# =========================
+# Cota e circuit breaker
+# =========================
+class CircuitOpenError(requests.RequestException):
+    """Falhas seguidas demais: chamadas ao GitHub suspensas até o fim do cooldown."""
+
+
+class RateLimit:
+    """Último estado de cota informado pelos headers X-RateLimit-* do GitHub."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None   # epoch (s)
+
+    def update(self, headers):
+        try:
+            with self._lock:
+                if "X-RateLimit-Remaining" in headers:
+                    self.remaining = int(headers["X-RateLimit-Remaining"])
+                if "X-RateLimit-Limit" in headers:
+                    self.limit = int(headers["X-RateLimit-Limit"])
+                if "X-RateLimit-Reset" in headers:
+                    self.reset_at = int(headers["X-RateLimit-Reset"])
+        except (TypeError, ValueError):
+            pass
+
+    def pace(self) -> float:
+        """Espera sugerida antes da próxima chamada: reparte o que sobra da cota até o reset."""
+        with self._lock:
+            if self.remaining is None or self.reset_at is None or self.remaining >= LOW_QUOTA:
+                return 0.0
+            left = self.reset_at - time.time()
+            if left <= 0:
+                return 0.0
+            return min(MAX_PACE, left / max(self.remaining, 1))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"limit": self.limit, "remaining": self.remaining, "reset_at": self.reset_at}
+
+
+class CircuitBreaker:
+    """Abre após `threshold` falhas transitórias seguidas; libera uma tentativa após `cooldown` s."""
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+
+    def before(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.cooldown:
+                raise CircuitOpenError("GitHub indisponível; nova tentativa em instantes")
+            self._opened_at = None            # meio-aberto: deixa passar uma tentativa
+            self._failures = self.threshold - 1
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+
+RATE = RateLimit()
+BREAKER = CircuitBreaker()
+perf.gauge("github_rate_limit_remaining", lambda: RATE.remaining)
+perf.gauge("github_rate_limit_limit", lambda: RATE.limit)
+perf.gauge("github_rate_limit_reset_at", lambda: RATE.reset_at)
+perf.gauge("github_circuit_open", lambda: int(BREAKER.is_open))
+
+
+def rate_limit_status() -> dict:
+    """Cota restante do token ({"limit", "remaining", "reset_at"}) e estado do circuit breaker."""
+    return {**RATE.snapshot(), "circuit_open": BREAKER.is_open}
+
+
+# =========================
+# Helpers GitHub API
+# =========================
+def gh_headers():
+    return {
+        "Authorization": f"Bearer {GH_TOKEN}",
+        "Accept": "application/vnd.github+json",
+    }
+
+def _request(method: str, url: str, headers=None, **kw) -> requests.Response:
+    with perf.span("gh_http"):
+        r = _session().request(method, url, headers=headers or gh_headers(), timeout=TIMEOUT, **kw)
+    RATE.update(r.headers)
+    perf.count("gh_requests", method=method, status=r.status_code)
+    return r
+
+def _jitter(attempt: int) -> float:
+    # "full jitter": espalha as novas tentativas de várias sessões
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def _retry_delay(resp: requests.Response, attempt: int) -> float | None:
+    """Quanto esperar antes de repetir a chamada, ou None se o erro não é transitório."""
+    status = resp.status_code
+    retry_after = resp.headers.get("Retry-After")
+    if retry_after and status in (403, 429, 503):
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    if status in (403, 429) and resp.headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            return max(0.0, int(resp.headers["X-RateLimit-Reset"]) - time.time()) + 1
+        except (KeyError, ValueError):
+            return _jitter(attempt)
+    if status == 429 or 500 <= status < 600:
+        return _jitter(attempt)
+    if status == 403 and "rate limit" in (resp.text or "").lower():
+        # limite secundário sem Retry-After
+        return _jitter(attempt) + 1
+    return None
+
+def with_backoff(func):
+    @wraps(func)
+    def _wrap(*a, **kw):
+        for attempt in range(RETRY_ATTEMPTS):
+            BREAKER.before()
+            pause = RATE.pace()
+            if pause:
+                perf.count("gh_pace_wait_seconds", pause)
+                time.sleep(pause)
+            try:
+                out = func(*a, **kw)
+            except requests.HTTPError as e:
+                delay = _retry_delay(e.response, attempt) if e.response is not None else None
+                if delay is None:
+                    # erro do cliente (404/409/422...): o GitHub respondeu, não é falha de serviço
+                    BREAKER.success()
+                    raise
+                BREAKER.failure()
+                if delay > MAX_RATE_WAIT or attempt == RETRY_ATTEMPTS - 1:
+                    perf.count("gh_retries_exhausted", call=func.__name__)
+                    raise
+                perf.count("gh_retries", call=func.__name__, reason=e.response.status_code)
+                perf.count("gh_retry_wait_seconds", delay)
+                time.sleep(delay)
+                continue
+            except (requests.ConnectionError, requests.Timeout) as e:
+                BREAKER.failure()
+                if attempt == RETRY_ATTEMPTS - 1:
+                    perf.count("gh_retries_exhausted", call=func.__name__)
+                    raise
+                delay = _jitter(attempt)
+                perf.count("gh_retries", call=func.__name__, reason=type(e).__name__)
+                perf.count("gh_retry_wait_seconds", delay)
+                time.sleep(delay)
+                continue
+            BREAKER.success()
+            return out
+    return _wrap
+
+@perf.timed()
+@with_backoff
+def gh_get_file(repo: str, path: str, ref: str, binary: bool = False, have_sha: str | None = None):
+    # GET /repos/{owner}/{repo}/contents/{path}?ref=branch
+    # GET condicional: quem já tem o arquivo na versão `have_sha` manda o ETag dela; um 304
+    # não baixa nada nem consome cota e volta com content=None (o chamador usa o que tem)
+    url = f"{API_BASE}/repos/{repo}/contents/{path}"
+    key = (repo, path, ref)
+    with _ETAGS_LOCK:
+        cached = _ETAGS.get(key)
+    headers = gh_headers()
+    if have_sha and cached and cached.get("etag") and cached["sha"] == have_sha:
+        headers["If-None-Match"] = cached["etag"]
+    r = _request("GET", url, headers=headers, params={"ref": ref})
+    if r.status_code == 304 and "If-None-Match" in headers:
+        return {"sha": have_sha, "content": None, "not_modified": True}
+    if r.status_code == 404:
+        # arquivo pode não existir (primeiro deploy)
+        with _ETAGS_LOCK:
+            _ETAGS.pop(key, None)
+        return {"sha": None, "content": None, "not_modified": False}
+    r.raise_for_status()
+    data = r.json()
+    # content vem em base64; `binary` devolve os bytes sem decodificar (ex. .json.gz)
+    raw = base64.b64decode(data.get("content", "") or "")
+    decoded = raw if binary else raw.decode("utf-8")
+    with _ETAGS_LOCK:
+        _ETAGS[key] = {"etag": r.headers.get("ETag"), "sha": data.get("sha")}
+    return {"sha": data.get("sha"), "content": decoded, "not_modified": False}
+
+@perf.timed()
+@with_backoff
+def gh_put_file(repo: str, path: str, ref: str, content_str: str | bytes, sha: str | None, message: str):
+    # PUT /repos/{owner}/{repo}/contents/{path}
+    url = f"{API_BASE}/repos/{repo}/contents/{path}"
+    data = content_str if isinstance(content_str, bytes) else content_str.encode("utf-8")
+    payload = {
+        "message": message,
+        "content": base64.b64encode(data).decode("utf-8"),
+        "branch": ref,
+    }
+    if sha:
+        payload["sha"] = sha
+    r = _request("PUT", url, json=payload)
+    r.raise_for_status()
+    # o ETag guardado é o da versão anterior: não serve mais para GET condicional
+    with _ETAGS_LOCK:
+        _ETAGS.pop((repo, path, ref), None)
+    return r.json()
+
+@with_backoff
+def gh_list_dir(repo: str, path: str, ref: str) -> list[str]:
+    # GET /repos/{owner}/{repo}/contents/{dir} -> nomes dos arquivos ([] se a pasta não existe)
+    r = _request("GET", f"{API_BASE}/repos/{repo}/contents/{path}", params={"ref": ref})
+    if r.status_code == 404:
+        return []
+    r.raise_for_status()
+    return [e["name"] for e in r.json() if e.get("type") == "file"]
+
+
+# =========================
+# Git Data API (refs / commits / trees / blobs)
+# =========================
+# Sem o limite de 1 MB da Contents API e sem base64: blobs são lidos crus e
+# vários arquivos vão num único commit, publicado por um update de ref fast-forward.
+def git_blob_sha(content_str: str | bytes) -> str:
+    """Sha que o git atribui a um blob com esse conteúdo (igual ao do GitHub)."""
+    data = content_str if isinstance(content_str, bytes) else content_str.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+@with_backoff
+def gh_get_ref(repo: str, branch: str) -> str | None:
+    # GET /repos/{owner}/{repo}/git/ref/heads/{branch} — condicional: sem commit novo, 304
+    url = f"{API_BASE}/repos/{repo}/git/ref/heads/{branch}"
+    key = (repo, f"refs/heads/{branch}", "")
+    with _ETAGS_LOCK:
+        cached = _ETAGS.get(key)
+    headers = gh_headers()
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    r = _request("GET", url, headers=headers)
+    if r.status_code == 304 and cached:
+        return cached["sha"]
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    sha = r.json()["object"]["sha"]
+    with _ETAGS_LOCK:
+        _ETAGS[key] = {"etag": r.headers.get("ETag"), "sha": sha}
+    return sha
+
+@with_backoff
+def gh_get_commit_tree(repo: str, commit_sha: str) -> str:
+    # GET /repos/{owner}/{repo}/git/commits/{sha} -> sha da tree
+    r = _request("GET", f"{API_BASE}/repos/{repo}/git/commits/{commit_sha}")
+    r.raise_for_status()
+    return r.json()["tree"]["sha"]
+
+@with_backoff
+def gh_get_tree(repo: str, tree_sha: str) -> dict[str, str]:
+    # GET /repos/{owner}/{repo}/git/trees/{sha}?recursive=1 -> {caminho: sha do blob}
+    r = _request("GET", f"{API_BASE}/repos/{repo}/git/trees/{tree_sha}", params={"recursive": "1"})
+    r.raise_for_status()
+    return {e["path"]: e["sha"] for e in r.json().get("tree", []) if e.get("type") == "blob"}
+
+@with_backoff
+def gh_get_blob(repo: str, blob_sha: str, binary: bool = False) -> str | bytes:
+    # GET /repos/{owner}/{repo}/git/blobs/{sha} com media type raw: bytes do arquivo, sem base64
+    headers = {**gh_headers(), "Accept": "application/vnd.github.raw+json"}
+    r = _request("GET", f"{API_BASE}/repos/{repo}/git/blobs/{blob_sha}", headers=headers)
+    r.raise_for_status()
+    return r.content if binary else r.content.decode("utf-8")
+
+@with_backoff
+def gh_create_blob(repo: str, data: bytes) -> str:
+    # POST /repos/{owner}/{repo}/git/blobs — só para binários (texto vai inline na tree)
+    payload = {"content": base64.b64encode(data).decode("ascii"), "encoding": "base64"}
+    r = _request("POST", f"{API_BASE}/repos/{repo}/git/blobs", json=payload)
+    r.raise_for_status()
+    return r.json()["sha"]
+
+@with_backoff
+def gh_create_tree(repo: str, base_tree: str | None, files: dict[str, str], blobs: dict[str, str] | None = None) -> str:
+    # POST /repos/{owner}/{repo}/git/trees — texto vai inline (o GitHub cria os blobs);
+    # `blobs` ({caminho: sha}) aponta para blobs já criados
+    entries = [{"path": p, "mode": "100644", "type": "blob", "content": c} for p, c in files.items()]
+    entries += [{"path": p, "mode": "100644", "type": "blob", "sha": b} for p, b in (blobs or {}).items()]
+    payload = {"tree": entries}
+    if base_tree:
+        payload["base_tree"] = base_tree
+    r = _request("POST", f"{API_BASE}/repos/{repo}/git/trees", json=payload)
+    r.raise_for_status()
+    return r.json()["sha"]
+
+@with_backoff
+def gh_create_commit(repo: str, message: str, tree_sha: str, parents: list[str]) -> str:
+    # POST /repos/{owner}/{repo}/git/commits
+    payload = {"message": message, "tree": tree_sha, "parents": parents}
+    r = _request("POST", f"{API_BASE}/repos/{repo}/git/commits", json=payload)
+    r.raise_for_status()
+    return r.json()["sha"]
+
+@with_backoff
+def gh_update_ref(repo: str, branch: str, commit_sha: str):
+    # PATCH /repos/{owner}/{repo}/git/refs/heads/{branch} — sem force: 422 se não for fast-forward
+    r = _request("PATCH", f"{API_BASE}/repos/{repo}/git/refs/heads/{branch}",
+                 json={"sha": commit_sha, "force": False})
+    r.raise_for_status()
+    return r.json()
+
+def gh_commit_files(repo: str, branch: str, parent: str, base_tree: str,
+                    files: dict[str, str | bytes], message: str) -> dict:
+    """Grava `files` ({caminho: texto ou bytes}) num único commit sobre `parent`.
+
+    Atômico: ou a ref avança para o novo commit com todos os arquivos, ou nada muda.
+    Se a branch andou desde `parent`, o update da ref falha com 422 (HTTPError).
+    Retorna {"commit", "tree", "blobs": {caminho: sha}}.
+    """
+    text = {p: c for p, c in files.items() if isinstance(c, str)}
+    binary = {p: gh_create_blob(repo, c) for p, c in files.items() if isinstance(c, bytes)}
+    tree = gh_create_tree(repo, base_tree, text, binary)
+    commit = gh_create_commit(repo, message, tree, [parent])
+    gh_update_ref(repo, branch, commit)
+    return {"commit": commit, "tree": tree, "blobs": {**{p: git_blob_sha(c) for p, c in text.items()}, **binary}}
@@ -0,0 +1,257 @@
+# journal.py — Nessa Coiffeur — Diário local de escritas (write-behind)
+#
+# Um agendamento é confirmado quando a sua escrita está no diário (JSON lines, fsync
+# a cada entrada) — não quando o GitHub responde. O `Flusher` (uma thread por processo)
+# leva as entradas pendentes ao backend pela WriteQueue, em ordem, com a checagem de
+# conflito rodando de novo contra o estado real do backend; se o GitHub estiver lento,
+# sem cota ou fora, as entradas esperam e são reenviadas (também depois de um restart).
+#
+# Formato: uma linha por entrada {"seq", "at", "msg", "check", "ops"} e linhas de estado
+# {"seq", "done"} / {"seq", "failed"} / {"seq", "dismissed"}. O arquivo é reescrito
+# (compactado) ao abrir e sempre que não sobra nada pendente.
+import datetime as dt
+import json
+import os
+import threading
+
+import perf
+from availability import SlotTaken
+from storage import RowNotFound, apply_ops
+
+ID_KEYS = {"agendamentos": "appt_id", "bloqueios": "block_id", "clientes": "client_id",
+           "funcionarios": "employee_id"}
+COMPACT_AFTER = 200   # linhas mortas (entradas gravadas) antes de reescrever o arquivo
+# Recusas definitivas (regra de negócio): a entrada vai para "falhas" em vez de ser
+# reenviada. Todo o resto (inclusive ValueError/JSONDecodeError de uma resposta ruim do
+# backend) é tratado como transitório e reenviado com backoff.
+PERMANENT_ERRORS = (SlotTaken, RowNotFound)
+
+
+def _row_id(op: dict) -> str:
+    key = ID_KEYS.get(op.get("kind"))
+    return str(op["row"].get(key, "") or "").strip() if key and op.get("op") == "append" else ""
+
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Journal:
+    """Entradas (ops `append`/`update`) ainda não gravadas no backend, persistidas em `path`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._pending: dict[int, dict] = {}   # seq -> entrada, em ordem
+        self._failed: dict[int, dict] = {}    # seq -> entrada + "error"
+        self._next = 1
+        self._dead = 0
+        self._gen = 0                         # muda a cada entrada nova/gravada/recusada
+        self._view = (None, None)             # ((version, gen), (db, version)) da última sobreposição
+        self.wake = threading.Event()         # avisa o Flusher de entradas novas
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._replay()
+        self._compact()
+        self._f = open(path, "a", encoding="utf-8")
+
+    # --- arquivo ---
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    seq = int(rec["seq"])
+                except (ValueError, KeyError, TypeError):
+                    continue   # linha cortada por uma queda no meio da escrita
+                self._next = max(self._next, seq + 1)
+                if "ops" in rec:
+                    self._pending[seq] = rec
+                elif "done" in rec:
+                    self._pending.pop(seq, None)
+                elif "failed" in rec and seq in self._pending:
+                    self._failed[seq] = {**self._pending.pop(seq), "error": rec["failed"]}
+                elif "dismissed" in rec:
+                    self._failed.pop(seq, None)
+
+    def _compact(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for e in self._failed.values():
+                f.write(json.dumps({k: v for k, v in e.items() if k != "error"}, ensure_ascii=False) + "\n")
+                f.write(json.dumps({"seq": e["seq"], "failed": e["error"]}, ensure_ascii=False) + "\n")
+            for e in self._pending.values():
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        _fsync_dir(self.path)
+        self._dead = 0
+
+    def _write(self, rec: dict):
+        self._f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def _settle(self):
+        self._dead += 1
+        if not self._pending or self._dead >= COMPACT_AFTER:
+            self._f.close()
+            self._compact()
+            self._f = open(self.path, "a", encoding="utf-8")
+
+    # --- interface ---
+    def append(self, ops: list[dict], msg: str, check: str | None = None, validate=None) -> dict:
+        """Grava a entrada (fsync) e a devolve. `validate(pendentes)` roda antes, sob o mesmo
+        lock, com as ops das entradas ainda pendentes: duas confirmações nunca se cruzam entre
+        a checagem e a gravação. Deve ser barata (ex.: um índice já montado + as pendentes);
+        nada de montar o Model aqui, ou todas as confirmações do processo esperam por ele."""
+        # append e update podem ser reaplicados sem efeito duplo (appends já gravados são
+        # reconhecidos pelo id; update grava os mesmos valores de novo)
+        if any(op.get("op") not in ("append", "update") for op in ops):
+            raise ValueError("o diário só aceita operações append/update")
+        with self._lock:
+            if validate:
+                validate([op for e in self._pending.values() for op in e["ops"]])
+            with perf.span("journal_append"):
+                entry = {"seq": self._next, "at": dt.datetime.now().isoformat(timespec="seconds"),
+                         "msg": msg, "check": check, "ops": ops}
+                self._write(entry)
+            self._pending[entry["seq"]] = entry
+            self._next += 1
+            self._gen += 1
+        self.wake.set()
+        return entry
+
+    def pending(self) -> list[dict]:
+        with self._lock:
+            return list(self._pending.values())
+
+    def failed(self) -> list[dict]:
+        with self._lock:
+            return list(self._failed.values())
+
+    def mark_done(self, seq: int, version=None):
+        with self._lock:
+            if self._pending.pop(seq, None) is None:
+                return
+            self._gen += 1
+            self._write({"seq": seq, "done": version})
+            self._settle()
+
+    def mark_failed(self, seq: int, error: str):
+        with self._lock:
+            e = self._pending.pop(seq, None)
+            if e is None:
+                return
+            self._failed[seq] = {**e, "error": error}
+            self._gen += 1
+            self._write({"seq": seq, "failed": error})
+            self._settle()
+
+    def dismiss(self, seq: int):
+        """Tira uma falha da lista (depois de resolvida à mão)."""
+        with self._lock:
+            if self._failed.pop(seq, None) is not None:
+                self._write({"seq": seq, "dismissed": True})
+
+    def view(self, db: dict, version):
+        """(db, versão) com as entradas pendentes por cima; linhas que o backend já tem
+        (gravadas mas ainda não marcadas) não entram duas vezes."""
+        with self._lock:
+            if not self._pending:
+                return db, version
+            key = (version, self._gen)
+            if self._view[0] == key:
+                return self._view[1]
+            ops = [op for e in self._pending.values() for op in e["ops"]]
+            present = {}
+            for kind in {op["kind"] for op in ops if _row_id(op)}:
+                idk = ID_KEYS[kind]
+                present[kind] = {str(r.get(idk, "") or "").strip() for r in db.get(kind, [])}
+            ops = [op for op in ops if not (_row_id(op) and _row_id(op) in present.get(op["kind"], ()))]
+            out = (apply_ops(db, ops) if ops else db, f"{version}+j{key[1]}")
+            self._view = (key, out)
+            return out
+
+
+def _stored(storage, op: dict) -> bool:
+    """True se a linha do append já está no backend (entrada gravada antes de uma queda)."""
+    rid = _row_id(op)
+    if not rid:
+        return False
+    row, idk = op["row"], ID_KEYS[op["kind"]]
+    rows = storage.query(op["kind"], row.get("date") or None, row.get("employee_id") or None) \
+        if op["kind"] in ("agendamentos", "bloqueios") else storage.query(op["kind"])
+    return any(str(r.get(idk, "") or "").strip() == rid for r in rows)
+
+
+class Flusher:
+    """Thread que leva as entradas do diário ao backend via `writer` (WriteQueue)."""
+
+    def __init__(self, journal: Journal, writer, checks: dict | None = None,
+                 retry: float = 1.0, max_backoff: float = 60.0):
+        self.journal = journal
+        self.writer = writer
+        self.checks = checks or {}      # nome salvo na entrada -> função check de Storage.commit
+        self.retry = retry
+        self.max_backoff = max_backoff
+        self.flushed = 0
+        self.last_error = None
+        self.flushed_at = None
+        self._thread = threading.Thread(target=self._run, name="journal-flusher", daemon=True)
+        self._thread.start()
+
+    def flush(self) -> bool:
+        """Envia tudo o que está pendente; False se o backend falhou (as entradas ficam)."""
+        futures, ok = [], True
+        try:
+            for e in self.journal.pending():
+                ops = [op for op in e["ops"] if not _stored(self.writer.storage, op)]
+                if not ops:
+                    self.journal.mark_done(e["seq"])
+                    continue
+                futures.append((e, self.writer.submit(ops, e["msg"], self.checks.get(e["check"]))))
+        except Exception as ex:   # backend fora ao conferir o que já estava gravado
+            ok, self.last_error = False, f"{type(ex).__name__}: {ex}"
+        for e, fut in futures:
+            try:
+                version = fut.result()   # a WriteQueue sempre resolve (resultado ou exceção)
+            except PERMANENT_ERRORS as ex:
+                perf.count("journal_rejected")
+                self.journal.mark_failed(e["seq"], f"{type(ex).__name__}: {ex}")
+            except Exception as ex:
+                ok, self.last_error = False, f"{type(ex).__name__}: {ex}"
+            else:
+                self.flushed += 1
+                self.flushed_at = dt.datetime.now().isoformat(timespec="seconds")
+                perf.count("journal_flushed")
+                self.journal.mark_done(e["seq"], version)
+        return ok
+
+    def status(self) -> dict:
+        return {"pending": len(self.journal.pending()), "failed": len(self.journal.failed()),
+                "flushed": self.flushed, "flushed_at": self.flushed_at, "last_error": self.last_error}
+
+    def _run(self):
+        delay = 0.0   # ao iniciar, reenvia o que sobrou de antes do restart
+        while True:
+            if self.journal.wake.wait(delay):
+                self.journal.wake.clear()
+            if self.flush():
+                self.last_error = None
+                delay = 0.0 if self.journal.pending() else None
+            else:
+                perf.count("journal_flush_errors")
+                delay = min(self.max_backoff, max(delay or 0.0, self.retry) * 2)
@@ -0,0 +1,165 @@
+# model.py — Nessa Coiffeur — Modelo preparado: DataFrames tipados por versão do DB
+#
+# Monta uma vez, a partir das listas do DB, os DataFrames usados pela UI (colunas
+# garantidas, normalizações e tipos reais). O app guarda um Model por sha em
+# st.cache_resource, então ele é compartilhado entre sessões: trate como somente leitura.
+import pandas as pd
+
+import perf
+from availability import AvailabilityIndex, busy_frame, hhmm_to_min_col
+from clients import ClientIndex
+from rollups import Rollups
+
+TRUE_VALUES = ("true", "1", "sim", "yes")
+
+EMPLOYEE_COLS = {
+    "employee_id": "", "name": "", "role": "", "specialty": "", "active": True,
+    "default_start": "09:00", "default_end": "19:00", "username": "", "email": "",
+    "password_hash": "", "must_change_password": True
+}
+SERVICE_COLS = {
+    "service_id": "", "name": "", "specialty": "", "active": True,
+    "default_duration": 60
+}
+APPT_COLS = {
+    "appt_id": "", "date": "", "start_time": "", "duration_min": 60, "end_time": "",
+    "employee_id": "", "employee_name": "", "client_id": "", "client_name": "",
+    "client_phone": "", "service_id": "", "service_name": "", "source_sheet": "streamlit",
+    "source_row": "", "status": "booked", "created_at": "", "created_by": "",
+    "notes": "", "price": "", "promo_code": "", "final_price": ""
+}
+BLOCK_COLS = {
+    "block_id": "", "date": "", "start_time": "", "end_time": "",
+    "employee_id": "", "employee_name": "", "reason": "", "created_at": "", "created_by": ""
+}
+
+
+def ensure_cols(df, cols_defaults: dict):
+    for k, v in cols_defaults.items():
+        if k not in df.columns:
+            df[k] = v
+    return df
+
+
+def bool_col(col: pd.Series) -> pd.Series:
+    return col.astype(str).str.strip().str.lower().isin(TRUE_VALUES)
+
+
+def date_col(col: pd.Series) -> pd.Series:
+    """'YYYY-MM-DD' -> datetime64 (NaT se inválida)."""
+    return pd.to_datetime(col.astype(str).str.strip(), format="%Y-%m-%d", errors="coerce")
+
+
+def _category(col: pd.Series) -> pd.Series:
+    return col.fillna("").astype(str).astype("category")
+
+
+def _key(v, lower=False) -> str:
+    k = str(v if v is not None else "").strip()
+    return k.lower() if lower else k
+
+
+def _first_by(rows, col, lower=False) -> dict:
+    """{chave: primeira linha com essa chave} — mesma semântica de `df[mask].iloc[0]`."""
+    out = {}
+    for r in rows:
+        k = _key(r.get(col), lower)
+        if k:
+            out.setdefault(k, r)
+    return out
+
+
+def _group_by(rows, col) -> dict:
+    out = {}
+    for r in rows:
+        out.setdefault(_key(r.get(col)), []).append(r)
+    return out
+
+
+def _prepare_people(df: pd.DataFrame, defaults: dict) -> pd.DataFrame:
+    df = ensure_cols(df, defaults)
+    for col in ("name", "specialty"):
+        df[col] = df[col].astype(str).str.strip()
+        df[f"{col}_norm"] = df[col].str.upper()
+    df["active_bool"] = bool_col(df["active"])
+    return df
+
+
+def _prepare_appts(df: pd.DataFrame) -> pd.DataFrame:
+    df = ensure_cols(df, APPT_COLS)
+    df["date"] = date_col(df["date"])
+    dur = pd.to_numeric(df["duration_min"], errors="coerce").fillna(0).astype("int64")
+    df["duration_min"] = dur.where(dur != 0, 60)
+    start = hhmm_to_min_col(df["start_time"])
+    df["start_dt"] = df["date"] + pd.to_timedelta(start, unit="m")
+    df["end_dt"] = df["start_dt"] + pd.to_timedelta(df["duration_min"], unit="m")
+    df["status"] = df["status"].fillna("booked").astype(str).str.strip().str.lower().astype("category")
+    for col in ("employee_id", "employee_name", "service_id", "service_name"):
+        df[col] = _category(df[col])
+    return df
+
+
+def _prepare_blocks(df: pd.DataFrame) -> pd.DataFrame:
+    df = ensure_cols(df, BLOCK_COLS)
+    df["date"] = date_col(df["date"])
+    df["start_dt"] = df["date"] + pd.to_timedelta(hhmm_to_min_col(df["start_time"]), unit="m")
+    df["end_dt"] = df["date"] + pd.to_timedelta(hhmm_to_min_col(df["end_time"]), unit="m")
+    for col in ("employee_id", "employee_name"):
+        df[col] = _category(df[col])
+    return df
+
+
+class Model:
+    """DataFrames derivados de um snapshot do DB.
+
+    - employees / services: colunas garantidas, `*_norm` em caixa alta e `active_bool`
+    - appts: `date` datetime64, `start_dt`/`end_dt`, `duration_min` int64, categorias
+      em employee_id/employee_name/service_id/service_name/status (minúsculo)
+    - blocks: `date` datetime64, `start_dt`/`end_dt`, employee_id categórico
+    - busy: intervalos ocupados (employee_id, date 'YYYY-MM-DD', start_min, end_min)
+    - avail: AvailabilityIndex da mesma versão
+    - client_index: ClientIndex (clientes por telefone/nome, busca por prefixo, histórico)
+    - rollups: contadores por dia (e meses do arquivo morto) para o Dashboard; com `prev`
+      (o Model da versão anterior), só os dias que mudaram são recalculados
+    - índices hash (dict) para buscas O(1) na UI: serviços por nome normalizado/id/especialidade,
+      funcionários por username (minúsculo)/id e ativos por especialidade
+    """
+
+    @perf.timed("model_build")
+    def __init__(self, db: dict, prev: "Model | None" = None):
+        with perf.span("model_dataframes"):
+            employees = pd.DataFrame(db.get("funcionarios", []))
+            services = pd.DataFrame(db.get("servicos", []))
+            appts = pd.DataFrame(db.get("agendamentos", []))
+            blocks = pd.DataFrame(db.get("bloqueios", []))
+
+            self.employees = _prepare_people(employees, EMPLOYEE_COLS)
+            self.employees["employee_id"] = self.employees["employee_id"].astype(str)
+            self.services = _prepare_people(services, SERVICE_COLS)
+            self.clients = pd.DataFrame(db.get("clientes", []))
+
+            # intervalos a partir das colunas em texto, antes da conversão de tipos
+            self.busy = busy_frame(ensure_cols(appts.copy(), APPT_COLS), ensure_cols(blocks.copy(), BLOCK_COLS))
+            self.busy["employee_id"] = self.busy["employee_id"].astype("category")
+            self.busy["date"] = self.busy["date"].astype("category")
+            self.appts = _prepare_appts(appts)
+            self.blocks = _prepare_blocks(blocks)
+        with perf.span("model_avail_index"):
+            self.avail = AvailabilityIndex.build(db.get("agendamentos", []), db.get("bloqueios", []))
+        with perf.span("model_clients"):
+            self.client_index = ClientIndex.build(db.get("clientes", []), db.get("agendamentos", []))
+        with perf.span("model_rollups"):
+            self.rollups = Rollups.from_frame(self.appts, (db.get("arquivo") or {}).get("meses"),
+                                              prev=prev.rollups if prev is not None else None)
+
+        # Índices hash: linhas como dicts, chaves já normalizadas
+        svc_rows = self.services.to_dict("records")
+        emp_rows = self.employees.to_dict("records")
+        self.services_by_name = _first_by(svc_rows, "name_norm")
+        self.services_by_id = _first_by(svc_rows, "service_id")
+        self.services_by_specialty = _group_by(svc_rows, "specialty_norm")
+        self.specialties = sorted({r["specialty"] for r in svc_rows})
+        self.employees_by_username = _first_by(emp_rows, "username", lower=True)
+        self.employees_by_id = _first_by(emp_rows, "employee_id")
+        self.active_employees = [r for r in emp_rows if r["active_bool"]]
+        self.active_by_specialty = _group_by(self.active_employees, "specialty_norm")
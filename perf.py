@@ -0,0 +1,209 @@
+# perf.py — Nessa Coiffeur — Instrumentação leve dos caminhos quentes
+#
+# Spans (duração de um trecho), contadores e gauges, por processo:
+#   - cada span entra numa janela das últimas SAMPLES medições (p50/p90/p95/p99) e no
+#     total acumulado (contagem/soma), como um summary do Prometheus
+#   - dentro de um `Run` (um rerun do Streamlit) os spans também ficam na linha do tempo
+#     daquela execução, com aninhamento; spans de outras threads só entram no agregado
+#   - gauges são lidos na hora da exportação (ex.: cota restante da API do GitHub)
+# Exporta em JSON (`snapshot`) e no formato texto do Prometheus (`prometheus_text`).
+import contextvars
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+SAMPLES = 1024        # medições por span guardadas para os percentis
+RUNS_KEPT = 50        # execuções recentes guardadas
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+PREFIX = "nessa_"
+
+_lock = threading.Lock()
+_spans: dict[str, dict] = {}                     # nome -> {"window", "count", "sum", "max"}
+_counters: dict[tuple, float] = {}               # (nome, (("rótulo", "valor"), ...)) -> valor
+_gauges: dict[str, object] = {}                  # nome -> função sem argumentos
+_runs: deque = deque(maxlen=RUNS_KEPT)
+_run: contextvars.ContextVar = contextvars.ContextVar("perf_run", default=None)
+
+
+class Run:
+    """Linha do tempo de uma execução: [(nome, início_ms, duração_ms, profundidade)]."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.started_at = time.time()
+        self.t0 = time.perf_counter()
+        self.spans: list[tuple[str, float, float, int]] = []
+        self.depth = 0
+        self.total_ms = None
+
+    def finish(self, idle: bool = False):
+        """Fecha a execução (idempotente). `idle`: termina no fim do último span, não agora."""
+        if self.total_ms is not None:
+            return
+        if idle:
+            self.total_ms = max((s + d for _, s, d, _ in self.spans), default=0.0)
+        else:
+            self.total_ms = (time.perf_counter() - self.t0) * 1000
+        if _run.get() is self:
+            _run.set(None)
+        with _lock:
+            _runs.append(self)
+
+    def as_dict(self) -> dict:
+        return {"label": self.label, "started_at": self.started_at, "total_ms": self.total_ms,
+                "spans": [{"name": n, "start_ms": round(s, 3), "ms": round(d, 3), "depth": dp}
+                          for n, s, d, dp in self.spans]}
+
+
+def start_run(label: str = "") -> Run:
+    """Abre a execução corrente nesta thread/contexto: os spans seguintes entram nela."""
+    run = Run(label)
+    _run.set(run)
+    return run
+
+
+def recent_runs() -> list[Run]:
+    with _lock:
+        return list(_runs)
+
+
+# =========================
+# Registro
+# =========================
+def observe(name: str, seconds: float):
+    with _lock:
+        s = _spans.get(name)
+        if s is None:
+            s = _spans[name] = {"window": deque(maxlen=SAMPLES), "count": 0, "sum": 0.0, "max": 0.0}
+        s["window"].append(seconds)
+        s["count"] += 1
+        s["sum"] += seconds
+        s["max"] = max(s["max"], seconds)
+
+
+@contextmanager
+def span(name: str):
+    run = _run.get()
+    if run is not None:
+        run.depth += 1
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        observe(name, end - t)
+        if run is not None:
+            run.depth -= 1
+            run.spans.append((name, (t - run.t0) * 1000, (end - t) * 1000, run.depth))
+
+
+def timed(name: str | None = None):
+    """Decorador: cada chamada vira um span (`name` padrão: nome da função)."""
+    def deco(func):
+        label = name or func.__name__
+
+        @wraps(func)
+        def _wrap(*a, **kw):
+            with span(label):
+                return func(*a, **kw)
+        return _wrap
+    return deco
+
+
+def count(name: str, n: float = 1, **labels):
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+def gauge(name: str, func):
+    """Registra `func()` como gauge (None = sem valor ainda)."""
+    _gauges[name] = func
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _runs.clear()
+
+
+# =========================
+# Exportação
+# =========================
+def _quantile(sorted_vals: list[float], q: float) -> float:
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))]
+
+
+def _gauge_values() -> dict:
+    out = {}
+    for name, func in list(_gauges.items()):
+        try:
+            v = func()
+        except Exception:
+            v = None
+        if v is not None:
+            out[name] = v
+    return out
+
+
+def snapshot() -> dict:
+    """Estado atual em JSON: spans em ms (percentis da janela, total acumulado), contadores e gauges."""
+    with _lock:
+        spans = {k: (sorted(v["window"]), v["count"], v["sum"], v["max"]) for k, v in _spans.items()}
+        counters = dict(_counters)
+        runs = list(_runs)
+    out_spans = {}
+    for name, (win, n, total, mx) in sorted(spans.items()):
+        row = {"count": n, "total_ms": round(total * 1000, 3), "mean_ms": round(total / n * 1000, 3),
+               "max_ms": round(mx * 1000, 3)}
+        row.update({f"p{int(q * 100)}_ms": round(_quantile(win, q) * 1000, 3) for q in QUANTILES})
+        out_spans[name] = row
+    return {
+        "at": time.time(),
+        "spans": out_spans,
+        "counters": [{"name": n, "labels": dict(lb), "value": v} for (n, lb), v in sorted(counters.items())],
+        "gauges": _gauge_values(),
+        "runs": [r.as_dict() for r in runs[-10:]],
+    }
+
+
+def _metric(name: str) -> str:
+    return PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    esc = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, esc)) + "}"
+
+
+def prometheus_text() -> str:
+    """Formato texto de exposição do Prometheus (spans como summary em segundos)."""
+    with _lock:
+        spans = {k: (sorted(v["window"]), v["count"], v["sum"]) for k, v in _spans.items()}
+        counters = dict(_counters)
+    lines = []
+    if spans:
+        m = _metric("span_seconds")
+        lines += [f"# HELP {m} Duração dos trechos instrumentados.", f"# TYPE {m} summary"]
+        for name, (win, n, total) in sorted(spans.items()):
+            for q in QUANTILES:
+                lines.append(f"{m}{_labels([('span', name), ('quantile', q)])} {_quantile(win, q):.6f}")
+            lines.append(f"{m}_sum{_labels([('span', name)])} {total:.6f}")
+            lines.append(f"{m}_count{_labels([('span', name)])} {n}")
+    by_name: dict[str, list] = {}
+    for (name, lb), v in sorted(counters.items()):
+        by_name.setdefault(name, []).append((lb, v))
+    for name, series in by_name.items():
+        m = _metric(name) + "_total"
+        lines.append(f"# TYPE {m} counter")
+        lines += [f"{m}{_labels(lb)} {v:g}" for lb, v in series]
+    for name, v in sorted(_gauge_values().items()):
+        m = _metric(name)
+        lines += [f"# TYPE {m} gauge", f"{m} {float(v):g}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,475 @@
+# planilha.py — Nessa Coiffeur — Importação/exportação em lote das planilhas (planilha_modelo/*.csv)
+#
+# Importar: cada CSV é lido em blocos de CHUNK_ROWS linhas (separador `,` ou `;`, UTF-8
+# com ou sem BOM) e validado com pandas, coluna a coluna: datas (AAAA-MM-DD ou DD/MM/AAAA),
+# horários, números, ids repetidos, profissional desconhecido e agendamentos sobrepostos
+# por profissional/dia (entre si, com bloqueios e com o que já está no DB). As linhas
+# válidas entram no DB num único commit: ids novos viram `append`; ids que já existem são
+# trocados (remove + append) mantendo os campos que a planilha não tem (ex.: senha).
+# Linhas sem id ganham um id estável (hash do conteúdo): importar o mesmo arquivo de novo
+# não duplica nada.
+#
+# Exportar: o DB de volta no layout dos modelos (um CSV por tipo).
+#
+# Linha de comando (lê .streamlit/secrets.toml):
+#   python planilha.py importar planilha_antiga/ [--dry-run] [--ignorar-erros]
+#   python planilha.py exportar saida/
+import argparse
+import csv
+import datetime as dt
+import hashlib
+import io
+import json
+import os
+import tomllib
+
+import numpy as np
+import pandas as pd
+
+import perf
+from availability import BUSY_STATUSES, hhmm_to_min_col
+from storage import from_config, op_append, op_remove
+
+CHUNK_ROWS = 10_000
+MAX_ERRORS = 500   # erros listados no relatório (a contagem é sempre completa)
+
+# tipo do DB -> arquivo do modelo e colunas, na ordem de planilha_modelo/
+FILES = {
+    "funcionarios": "employees.csv",
+    "servicos": "services.csv",
+    "clientes": "clients.csv",
+    "bloqueios": "blocks.csv",
+    "agendamentos": "appointments.csv",
+}
+COLUMNS = {
+    "funcionarios": ["employee_id", "name", "role", "specialty", "active", "default_start", "default_end"],
+    "servicos": ["service_id", "name", "specialty", "default_duration_min", "base_price", "active"],
+    "clientes": ["client_id", "name", "phone", "notes", "created_at", "updated_at"],
+    "bloqueios": ["block_id", "date", "start_time", "end_time", "employee_id", "employee_name", "reason",
+                  "created_at", "created_by"],
+    "agendamentos": ["appt_id", "date", "start_time", "duration_min", "end_time", "employee_id", "employee_name",
+                     "client_id", "client_name", "client_phone", "service_id", "service_name", "source_sheet",
+                     "source_row", "status", "created_at", "created_by", "notes", "price", "promo_code",
+                     "final_price"],
+}
+ID_KEYS = {"funcionarios": "employee_id", "servicos": "service_id", "clientes": "client_id",
+           "bloqueios": "block_id", "agendamentos": "appt_id"}
+ID_PREFIX = {"funcionarios": "E", "servicos": "S", "clientes": "C", "bloqueios": "B", "agendamentos": "A"}
+REQUIRED = {
+    "funcionarios": ["name"],
+    "servicos": ["name", "specialty"],
+    "clientes": ["name"],
+    "bloqueios": ["date", "start_time", "end_time"],
+    "agendamentos": ["date", "start_time"],
+}   # + employee_id ou employee_name (conferido em _fill_refs)
+# campo da planilha -> campo do DB, quando diferem
+RENAME = {"servicos": {"default_duration_min": "default_duration"}}
+
+_TRUE = {"true", "1", "sim", "s", "yes", "verdadeiro", "x"}
+_FALSE = {"false", "0", "nao", "não", "n", "no", "falso"}
+_TIME_RE = r"^(\d{1,2})[:h](\d{2})(?::\d{2})?$"
+
+
+def kind_of(filename: str) -> str | None:
+    """'appointments.csv' ou 'agendamentos.csv' -> 'agendamentos'."""
+    base = os.path.splitext(os.path.basename(filename))[0].strip().lower()
+    for kind, name in FILES.items():
+        if base in (kind, os.path.splitext(name)[0]):
+            return kind
+    return None
+
+
+# =========================
+# Leitura
+# =========================
+def _text(src) -> io.TextIOBase:
+    if isinstance(src, (str, os.PathLike)):
+        return open(src, encoding="utf-8-sig", newline="")
+    if hasattr(src, "read") and isinstance(src.read(0), bytes):
+        return io.TextIOWrapper(src, encoding="utf-8-sig", newline="")
+    return src
+
+
+def read_chunks(src, chunk_rows: int = CHUNK_ROWS):
+    """DataFrames (tudo texto, sem NaN) de até `chunk_rows` linhas; índice = nº da linha no arquivo.
+
+    `src` também pode ser um DataFrame já lido (ex.: sheet_sync), com o índice preservado.
+    """
+    if isinstance(src, pd.DataFrame):
+        for i in range(0, len(src), chunk_rows):
+            yield src.iloc[i:i + chunk_rows].copy()
+        return
+    f = _text(src)
+    try:
+        head = f.readline()
+        sep = ";" if head.count(";") > head.count(",") else ","
+        cols = [c.strip().lower() for c in next(csv.reader([head], delimiter=sep))] if head.strip() else []
+        if not cols:
+            return
+        reader = pd.read_csv(f, sep=sep, names=cols, header=None, dtype=str, keep_default_na=False,
+                             chunksize=chunk_rows, skip_blank_lines=True)
+        line = 2
+        for chunk in reader:
+            chunk.index = pd.RangeIndex(line, line + len(chunk))
+            line += len(chunk)
+            yield chunk
+    finally:
+        if isinstance(src, (str, os.PathLike)):
+            f.close()
+        elif f is not src:
+            f.detach()   # não fecha o arquivo de quem chamou (ex.: upload do Streamlit)
+
+
+# =========================
+# Validação (vetorizada)
+# =========================
+def _date(col: pd.Series) -> pd.Series:
+    """AAAA-MM-DD ou DD/MM/AAAA -> 'AAAA-MM-DD' ('' se inválida)."""
+    iso = pd.to_datetime(col, format="%Y-%m-%d", errors="coerce")
+    br = pd.to_datetime(col, format="%d/%m/%Y", errors="coerce")
+    return iso.fillna(br).dt.strftime("%Y-%m-%d").fillna("")
+
+
+def _time(col: pd.Series) -> pd.Series:
+    """'9:00', '09:00', '09h00', '09:00:00' -> 'HH:MM' ('' se inválido)."""
+    parts = col.str.extract(_TIME_RE)
+    h, m = pd.to_numeric(parts[0], errors="coerce"), pd.to_numeric(parts[1], errors="coerce")
+    ok = (h < 24) & (m < 60)
+    return _hhmm((h * 60 + m).where(ok, 0)).where(ok, "")
+
+
+def _hhmm(minutes: pd.Series) -> pd.Series:
+    minutes = minutes.astype("int64")
+    return (minutes // 60).astype(str).str.zfill(2) + ":" + (minutes % 60).astype(str).str.zfill(2)
+
+
+def _bool(col: pd.Series, default: bool) -> pd.Series:
+    low = col.str.lower()
+    return pd.Series(np.where(low.isin(_TRUE), True, np.where(low.isin(_FALSE), False, default)),
+                     index=col.index, dtype=bool)
+
+
+def _stable_ids(df: pd.DataFrame, kind: str) -> pd.Series:
+    cols = [c for c in COLUMNS[kind] if c != ID_KEYS[kind]]
+    joined = df[cols[0]].astype(str).str.cat([df[c].astype(str) for c in cols[1:]], sep="\x1f")
+    return ID_PREFIX[kind] + joined.map(lambda s: hashlib.sha1(s.encode("utf-8")).hexdigest()[:12].upper())
+
+
+class _Errors:
+    def __init__(self, kind: str):
+        self.file, self.items, self.total = FILES[kind], [], 0
+
+    def add(self, mask: pd.Series, msg: str, col: str | None = None):
+        bad = mask[mask].index
+        self.total += len(bad)
+        for line in bad[:max(0, MAX_ERRORS - len(self.items))]:
+            self.items.append({"arquivo": self.file, "linha": int(line), "coluna": col or "", "erro": msg})
+
+
+def _normalize(kind: str, df: pd.DataFrame, err: _Errors) -> pd.Series:
+    """Normaliza `df` no lugar (formatos do DB); devolve a máscara das linhas inválidas."""
+    for c in COLUMNS[kind]:
+        df[c] = df[c].str.strip() if c in df.columns else ""
+    bad = pd.Series(False, index=df.index)
+    for c in REQUIRED[kind]:
+        miss = df[c] == ""
+        err.add(miss, "campo obrigatório vazio", c)
+        bad |= miss
+    if "date" in df.columns and kind in ("agendamentos", "bloqueios"):
+        fixed = _date(df["date"])
+        wrong = (df["date"] != "") & (fixed == "")
+        err.add(wrong, "data inválida (use AAAA-MM-DD ou DD/MM/AAAA)", "date")
+        df["date"], bad = fixed, bad | wrong
+    for c in ("start_time", "end_time", "default_start", "default_end"):
+        if c in COLUMNS[kind]:
+            fixed = _time(df[c])
+            wrong = (df[c] != "") & (fixed == "")
+            err.add(wrong, "horário inválido (use HH:MM)", c)
+            df[c], bad = fixed, bad | wrong
+
+    if kind == "funcionarios":
+        df["default_start"] = df["default_start"].replace("", "09:00")
+        df["default_end"] = df["default_end"].replace("", "19:00")
+        df["role"] = df["role"].replace("", "func").str.lower()
+        df["active"] = _bool(df["active"], True)
+    elif kind == "servicos":
+        dur = pd.to_numeric(df["default_duration_min"].replace("", "60"), errors="coerce")
+        wrong = dur.isna() | (dur <= 0)
+        err.add(wrong, "duração inválida", "default_duration_min")
+        df["default_duration_min"], bad = dur.fillna(60).astype("int64"), bad | wrong
+        df["active"] = _bool(df["active"], True)
+    elif kind == "bloqueios":
+        wrong = (df["start_time"] != "") & (df["end_time"] != "") & \
+            (hhmm_to_min_col(df["end_time"]) <= hhmm_to_min_col(df["start_time"]))
+        err.add(wrong, "fim antes do início", "end_time")
+        bad |= wrong
+    elif kind == "agendamentos":
+        s, e = hhmm_to_min_col(df["start_time"]), hhmm_to_min_col(df["end_time"])
+        dur = pd.to_numeric(df["duration_min"], errors="coerce")
+        # sem duração: fim - início; sem os dois: 60 min
+        dur = dur.fillna(e - s).fillna(60)
+        wrong = (dur <= 0) | (df["duration_min"].ne("") & pd.to_numeric(df["duration_min"], errors="coerce").isna())
+        err.add(wrong, "duração inválida", "duration_min")
+        bad |= wrong
+        dur = dur.where(dur > 0, 60).astype("int64")
+        end = (s + dur).fillna(0).astype("int64")
+        df["duration_min"] = dur
+        df["end_time"] = _hhmm(end).where(df["start_time"] != "", "")
+        df["status"] = df["status"].str.lower().replace("", "booked")
+        df["source_sheet"] = df["source_sheet"].replace("", "importacao")
+    return bad
+
+
+def _fill_refs(kind: str, df: pd.DataFrame, employees: dict, services: dict, err: _Errors) -> pd.Series:
+    """Completa employee_id/service_id pelo nome (e vice-versa); profissional desconhecido é erro."""
+    if kind not in ("agendamentos", "bloqueios"):
+        return pd.Series(False, index=df.index)
+    by_name = {str(r.get("name", "")).strip().upper(): k for k, r in employees.items()}
+    no_id = df["employee_id"] == ""
+    df.loc[no_id, "employee_id"] = df.loc[no_id, "employee_name"].str.upper().map(by_name).fillna("")
+    unknown = ~df["employee_id"].isin(employees.keys())
+    err.add(unknown & ~no_id, "profissional desconhecido", "employee_id")
+    err.add(unknown & no_id, "profissional desconhecido (sem employee_id e nome não encontrado)", "employee_name")
+    names = df["employee_id"].map({k: r.get("name", "") for k, r in employees.items()}).fillna("")
+    df["employee_name"] = df["employee_name"].where(df["employee_name"] != "", names)
+    if kind == "agendamentos":
+        svc_by_name = {str(r.get("name", "")).strip().upper(): k for k, r in services.items()}
+        no_svc = df["service_id"] == ""
+        df.loc[no_svc, "service_id"] = df.loc[no_svc, "service_name"].str.upper().map(svc_by_name).fillna("")
+        svc_names = df["service_id"].map({k: r.get("name", "") for k, r in services.items()}).fillna("")
+        df["service_name"] = df["service_name"].where(df["service_name"] != "", svc_names)
+    return unknown
+
+
+def _overlaps(appts: pd.DataFrame, blocks: pd.DataFrame, existing: dict) -> pd.Series:
+    """Agendamentos importados (booked/done) que se sobrepõem a outro agendamento ou bloqueio
+    do mesmo profissional/dia — importados ou já no DB. Índice = o de `appts`."""
+    frames = []
+
+    def add(df, src, end=None):
+        if df.empty:
+            return
+        s = hhmm_to_min_col(df["start_time"])
+        e = hhmm_to_min_col(df["end_time"]) if end is None else s + end
+        frames.append(pd.DataFrame({"emp": df["employee_id"].astype(str).to_numpy(),
+                                    "date": df["date"].astype(str).to_numpy(),
+                                    "s": s.to_numpy(), "e": e.to_numpy(), "src": src}))
+
+    busy = appts[appts["status"].isin(BUSY_STATUSES)]
+    add(busy, busy.index.to_numpy())
+    add(blocks, -1)
+    old_a = pd.DataFrame(existing.get("agendamentos", []))
+    if not old_a.empty:
+        old_a = old_a.reindex(columns=["employee_id", "date", "start_time", "duration_min", "status"]).fillna("")
+        old_a = old_a[old_a["status"].astype(str).str.strip().str.lower().replace("", "booked").isin(BUSY_STATUSES)]
+        dur = pd.to_numeric(old_a["duration_min"], errors="coerce").fillna(0)
+        add(old_a, -1, end=dur.where(dur != 0, 60))
+    old_b = pd.DataFrame(existing.get("bloqueios", []))
+    if not old_b.empty:
+        add(old_b.reindex(columns=["employee_id", "date", "start_time", "end_time"]).fillna(""), -1)
+    if not frames:
+        return pd.Series(False, index=appts.index)
+    iv = pd.concat(frames, ignore_index=True).dropna(subset=["s", "e"])
+    iv = iv[iv["date"].isin(set(busy["date"]))]
+    iv = iv.sort_values(["emp", "date", "s", "e"], kind="mergesort")
+    code = pd.factorize(iv["emp"] + "|" + iv["date"])[0]
+    # sobrepõe um anterior: início < maior fim dos anteriores; um seguinte: fim > próximo início
+    prev_end = iv["e"].groupby(code).cummax().groupby(code).shift()
+    next_start = iv["s"].groupby(code).shift(-1)
+    clash = (iv["s"] < prev_end) | (iv["e"] > next_start)
+    hit = iv.loc[clash & (iv["src"] >= 0), "src"]
+    return pd.Series(appts.index.isin(hit.to_numpy()), index=appts.index)
+
+
+def _records(df: pd.DataFrame, cols: list[str]) -> list[dict]:
+    # como to_dict("records"), com tipos nativos, sem converter célula a célula
+    return [dict(zip(cols, vals)) for vals in zip(*(df[c].tolist() for c in cols))]
+
+
+def _existing(db: dict, kind: str, replaced: set) -> list[dict]:
+    key = ID_KEYS[kind]
+    return [r for r in db.get(kind, []) if str(r.get(key, "") or "").strip() not in replaced]
+
+
+# =========================
+# Importação
+# =========================
+def plan_import(db: dict, sources: dict, created_by: str = "importacao") -> tuple[list[dict], dict]:
+    """Valida `sources` {kind: arquivo/buffer} contra `db` e monta as ops do commit.
+
+    Retorna (ops, relatório); as linhas com erro ficam fora das ops.
+    """
+    stamp = {"created_at": dt.datetime.now().isoformat(timespec="seconds"), "created_by": created_by}
+    report = {"linhas": {}, "novos": {}, "alterados": {}, "iguais": {}, "invalidos": {}, "erros": [], "total_erros": 0}
+    frames, errs = {}, {}
+    for kind in FILES:
+        if kind not in sources:
+            continue
+        err, parts = _Errors(kind), []
+        with perf.span("import_read"):
+            for chunk in read_chunks(sources[kind]):
+                # checagens por linha, bloco a bloco
+                chunk["_bad"] = _normalize(kind, chunk, err)
+                parts.append(chunk)
+        df = pd.concat(parts) if parts else pd.DataFrame(columns=COLUMNS[kind] + ["_bad"], dtype=object)
+        report["linhas"][kind] = len(df)
+        key = ID_KEYS[kind]
+        no_id = df[key] == ""
+        if no_id.any():
+            df.loc[no_id, key] = _stable_ids(df[no_id].astype(str), kind)
+        dup = df[key].duplicated(keep=False) & ~no_id
+        err.add(dup, "id repetido no arquivo", key)
+        df["_bad"] = df["_bad"].astype(bool) | dup
+        df = df[~df[key].duplicated(keep="first")]   # linhas idênticas sem id: uma só
+        frames[kind], errs[kind] = df, err
+
+    def merged_ids(kind):
+        key = ID_KEYS[kind]
+        out = {str(r.get(key, "") or "").strip(): r for r in db.get(kind, [])}
+        if kind in frames:
+            ok = frames[kind][~frames[kind]["_bad"]]
+            out.update((r[key], r) for r in _records(ok, COLUMNS[kind]))
+        return out
+
+    employees, services = merged_ids("funcionarios"), merged_ids("servicos")
+    for kind in ("bloqueios", "agendamentos"):
+        if kind in frames:
+            df = frames[kind]
+            df["_bad"] |= _fill_refs(kind, df, employees, services, errs[kind])
+    if "agendamentos" in frames:
+        with perf.span("import_overlaps"):
+            ap = frames["agendamentos"]
+            blocks = frames.get("bloqueios", pd.DataFrame(columns=COLUMNS["bloqueios"] + ["_bad"]))
+            blocks = blocks[~blocks["_bad"]]
+            ok = ap[~ap["_bad"]]
+            replaced = {k: set(frames[k][ID_KEYS[k]]) for k in ("agendamentos", "bloqueios") if k in frames}
+            existing = {k: _existing(db, k, replaced.get(k, set())) for k in ("agendamentos", "bloqueios")}
+            clash = _overlaps(ok, blocks, existing).reindex(ap.index, fill_value=False)
+            errs["agendamentos"].add(clash, "horário sobreposto a outro agendamento/bloqueio do profissional",
+                                     "start_time")
+            ap["_bad"] |= clash
+
+    ops = []
+    for kind, df in frames.items():
+        key, err = ID_KEYS[kind], errs[kind]
+        report["erros"] += err.items
+        report["total_erros"] += err.total
+        report["invalidos"][kind] = int(df["_bad"].sum())
+        ok = df[~df["_bad"]].drop(columns="_bad")
+        ok = ok.rename(columns=RENAME.get(kind, {}))
+        cols = [RENAME.get(kind, {}).get(c, c) for c in COLUMNS[kind]]
+        old = {str(r.get(key, "") or "").strip(): r for r in db.get(kind, [])}
+        new, changed, same = [], [], 0
+        for row in _records(ok, cols):
+            prev = old.get(row[key])
+            for c in stamp:
+                if c in row and not row[c]:
+                    row[c] = (prev or {}).get(c) or stamp[c]
+            if prev is None:
+                new.append(row)
+                continue
+            # campo vazio que a linha do DB nem tem não conta como alteração
+            merged = {**prev, **{k: v for k, v in row.items() if k in prev or v != ""}}
+            if merged == prev:
+                same += 1
+            else:
+                changed.append(merged)
+        report["novos"][kind], report["alterados"][kind], report["iguais"][kind] = len(new), len(changed), same
+        if changed:
+            ops.append(op_remove(kind, key, [r[key] for r in changed]))
+        ops += [op_append(kind, r) for r in changed + new]
+    report["erros"] = report["erros"][:MAX_ERRORS]
+    return ops, report
+
+
+@perf.timed()
+def import_csv(storage, sources: dict, dry_run: bool = False, skip_invalid: bool = False,
+               created_by: str = "importacao") -> dict:
+    """Importa os CSVs `sources` {kind: arquivo/buffer} num único commit (atômico também no
+    layout mensal: vários meses vão num commit só da Git Data API).
+
+    Com erros de validação nada é gravado, a menos que `skip_invalid` (só as linhas válidas
+    entram). Não roda `check_slots` no commit: a sobreposição já foi conferida aqui, em
+    lote, contra o estado lido no início.
+    """
+    db, _ = storage.load()
+    months = storage.stored_months()
+    if months is not None:
+        # backend particionado: todos os meses, para conferir ids e horários já gravados
+        db, _ = storage.load(months=months)
+    ops, report = plan_import(db, sources, created_by)
+    report["gravado"] = False
+    if dry_run or not ops or (report["total_erros"] and not skip_invalid):
+        return report
+    n = sum(1 for op in ops if op["op"] == "append")
+    report["versao"] = storage.commit(ops, f"feat: importação de planilha ({n} linhas)")
+    report["gravado"] = True
+    return report
+
+
+# =========================
+# Exportação
+# =========================
+def export_frames(db: dict) -> dict[str, pd.DataFrame]:
+    """{nome do arquivo: DataFrame} no layout de planilha_modelo/."""
+    out = {}
+    for kind, name in FILES.items():
+        df = pd.DataFrame(db.get(kind, []))
+        for col, db_col in RENAME.get(kind, {}).items():
+            if db_col in df.columns:
+                # o campo do DB vale mais que uma cópia antiga com o nome da planilha
+                src = df.pop(db_col)
+                df[col] = src.where(src.notna(), df[col]) if col in df.columns else src
+        df = df.reindex(columns=COLUMNS[kind]).fillna("")
+        if "active" in df.columns:
+            df["active"] = df["active"].map(lambda v: "TRUE" if str(v).strip().lower() in _TRUE else "FALSE")
+        if kind in ("agendamentos", "bloqueios"):
+            df = df.sort_values(["date", "start_time", "employee_id"], kind="mergesort")
+        out[name] = df
+    return out
+
+
+def export_csv(db: dict) -> dict[str, str]:
+    return {name: df.to_csv(index=False, lineterminator="\n") for name, df in export_frames(db).items()}
+
+
+def load_all(storage) -> dict:
+    """DB inteiro (todos os meses, em backends particionados).
+
+    Os meses ficam no snapshot de `storage`: no app, passe uma instância avulsa, não a
+    compartilhada (que só guarda os meses em uso).
+    """
+    db, _ = storage.load()
+    months = storage.stored_months()
+    return storage.load(months=months)[0] if months is not None else db
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Importa/exporta as planilhas (CSV) do DB.")
+    ap.add_argument("acao", choices=["importar", "exportar"])
+    ap.add_argument("caminho", help="pasta (ou arquivos .csv, ao importar)", nargs="+")
+    ap.add_argument("--secrets", default=".streamlit/secrets.toml")
+    ap.add_argument("--dry-run", action="store_true", help="só valida, não grava")
+    ap.add_argument("--ignorar-erros", action="store_true", help="grava as linhas válidas mesmo com erros")
+    args = ap.parse_args(argv)
+    with open(args.secrets, "rb") as f:
+        storage = from_config(tomllib.load(f))
+    if args.acao == "exportar":
+        os.makedirs(args.caminho[0], exist_ok=True)
+        for name, text in export_csv(load_all(storage)).items():
+            with open(os.path.join(args.caminho[0], name), "w", encoding="utf-8", newline="") as f:
+                f.write(text)
+        print(f"planilhas gravadas em {args.caminho[0]}")
+        return
+    paths = []
+    for p in args.caminho:
+        paths += [os.path.join(p, n) for n in sorted(os.listdir(p))] if os.path.isdir(p) else [p]
+    sources = {kind_of(p): p for p in paths if p.lower().endswith(".csv") and kind_of(p)}
+    if not sources:
+        ap.error("nenhum CSV reconhecido (appointments.csv, clients.csv, services.csv, employees.csv, blocks.csv)")
+    rep = import_csv(storage, sources, dry_run=args.dry_run, skip_invalid=args.ignorar_erros)
+    print(json.dumps(rep, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# refresher.py — Nessa Coiffeur — Revalidação do DB em segundo plano, uma por processo
+#
+# Uma thread (o app a guarda em st.cache_resource) chama `Storage.poll` a cada
+# `interval` segundos: no GitHub, um GET condicional na ref da branch (304 enquanto
+# ninguém commitar), e só então os arquivos que mudaram. O snapshot do Storage é
+# trocado uma vez por mudança; as sessões leem com `Storage.peek`, sem travar nem ir à
+# rede, e um fragmento do app dispara o rerun quando `version` muda.
+import threading
+import time
+
+import perf
+
+
+class Refresher:
+    def __init__(self, storage, interval: float = 5.0, on_change=None, max_backoff: float = 60.0):
+        self.storage = storage
+        self.interval = interval
+        self.on_change = on_change      # on_change(db, version), chamado na thread, a cada versão nova
+        self.max_backoff = max_backoff
+        self.version = None
+        self.checked_at = None          # epoch da última revalidação bem-sucedida
+        self.changed_at = None
+        self.polls = 0
+        self.changes = 0
+        self.errors = 0
+        self.last_error = None
+        self._lock = threading.Lock()   # uma revalidação por vez (thread ou `refresh` manual)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="db-refresher", daemon=True)
+        self._thread.start()
+
+    def refresh(self) -> bool:
+        """Revalida agora (também usado pelo botão de atualizar); False se falhou."""
+        with self._lock:
+            try:
+                with perf.span("db_refresh"):
+                    db, version = self.storage.poll()
+            except Exception as e:  # GitHub fora/sem cota: mantém o snapshot e tenta depois
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                perf.count("db_refresh_errors")
+                return False
+            self.polls += 1
+            self.checked_at = time.time()
+            self.last_error = None
+            if version != self.version:
+                if self.version is not None:
+                    self.changes += 1
+                    self.changed_at = self.checked_at
+                    perf.count("db_refresh_changes")
+                self.version = version
+                if self.on_change:
+                    try:
+                        self.on_change(db, version)
+                    except Exception:
+                        pass
+            return True
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> dict:
+        return {"interval": self.interval, "version": self.version, "checked_at": self.checked_at,
+                "changed_at": self.changed_at, "polls": self.polls, "changes": self.changes,
+                "errors": self.errors, "last_error": self.last_error}
+
+    # --- thread ---
+    def _run(self):
+        delay = 0.0
+        while not self._stop.wait(delay):
+            # em falha, espaça as tentativas (dobra até max_backoff)
+            delay = self.interval if self.refresh() else min(self.max_backoff, max(delay, self.interval) * 2)
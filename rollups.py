@@ -0,0 +1,185 @@
+# rollups.py — Nessa Coiffeur — Contadores materializados para o Dashboard
+#
+# Um bucket por dia (e, no arquivo morto, por mês) com quantidade, minutos e receita
+# (final_price) dos atendimentos booked/done, no total e por profissional/serviço.
+# O Model monta os buckets uma vez por versão do DB, herdando da versão anterior os dias
+# cujas linhas não mudaram (assinatura por dia), e `book_appointment` os atualiza em
+# seguida; os painéis de dia/semana/mês/ano só somam buckets, sem varrer agendamentos.
+import copy
+import datetime as dt
+import threading
+
+import pandas as pd
+
+from availability import BUSY_STATUSES, hhmm_to_min_col
+
+PERIODS = ("Dia", "Semana", "Mês", "Ano")
+_VALS = ("qtd", "minutos", "receita")
+_SIG_COLS = ("date", "status", "employee_id", "service_name", "duration_min", "final_price")
+
+
+def _num(v) -> float:
+    try:
+        return float(str(v).strip().replace(",", "."))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def new_bucket() -> dict:
+    return {"total": 0, "por_status": {}, "qtd": 0, "minutos": 0, "receita": 0.0,
+            "por_profissional": {}, "por_servico": {}}
+
+
+def _bump(d: dict, qtd: int, minutos: int, receita: float):
+    d["qtd"] += qtd
+    d["minutos"] += minutos
+    d["receita"] = round(d["receita"] + receita, 2)
+
+
+def add_row(bucket: dict, row: dict):
+    """Soma um agendamento (dict do DB) no bucket."""
+    status = str(row.get("status", "booked") or "booked").strip().lower()
+    bucket["total"] += 1
+    bucket["por_status"][status] = bucket["por_status"].get(status, 0) + 1
+    if status not in BUSY_STATUSES:
+        return
+    minutos, receita = int(_num(row.get("duration_min")) or 60), _num(row.get("final_price"))
+    _bump(bucket, 1, minutos, receita)
+    for group, key in (("por_profissional", row.get("employee_id")), ("por_servico", row.get("service_name"))):
+        d = bucket[group].setdefault(str(key or "").strip(), {"qtd": 0, "minutos": 0, "receita": 0.0})
+        _bump(d, 1, minutos, receita)
+
+
+def summarize(rows, by: str = "day") -> dict:
+    """{'YYYY-MM-DD' (ou 'YYYY-MM' com by='month'): bucket} a partir de linhas do DB."""
+    n = 7 if by == "month" else 10
+    out = {}
+    for r in rows:
+        d = str(r.get("date", "") or "").strip()
+        if len(d) >= n:
+            add_row(out.setdefault(d[:n], new_bucket()), r)
+    return out
+
+
+def period_range(ref: dt.date, period: str) -> tuple[dt.date, dt.date]:
+    """(início, fim) inclusivos do dia/semana (seg-dom)/mês/ano que contém `ref`."""
+    if period == "Semana":
+        ini = ref - dt.timedelta(days=ref.weekday())
+        return ini, ini + dt.timedelta(days=6)
+    if period == "Mês":
+        ini = ref.replace(day=1)
+        return ini, (ini + dt.timedelta(days=32)).replace(day=1) - dt.timedelta(days=1)
+    if period == "Ano":
+        return ref.replace(month=1, day=1), ref.replace(month=12, day=31)
+    return ref, ref
+
+
+class Rollups:
+    """Buckets diários (`days`) + mensais do arquivo morto (`months`)."""
+
+    def __init__(self):
+        self.days: dict[str, dict] = {}
+        self.months: dict[str, dict] = {}
+        self.sigs: dict[str, int] = {}   # dia -> assinatura (hash) das linhas que formam o bucket
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, appts: pd.DataFrame, archived_months: dict | None = None, prev: "Rollups | None" = None):
+        """Monta os buckets diários a partir de `Model.appts` (uma vez por versão).
+
+        Com `prev` (os rollups da versão anterior), os dias cuja assinatura não mudou são
+        herdados de lá e só os dias tocados passam pelo groupby: uma escrita nova refaz um
+        dia, não o histórico. Buckets herdados são compartilhados (add_appointment os copia).
+        """
+        ru = cls()
+        ru.months = dict(archived_months or {})
+        if appts.empty:
+            return ru
+        # assinatura por dia: soma dos hashes das linhas cruas (independe da ordem)
+        dates = appts["date"].dropna()
+        sig = pd.util.hash_pandas_object(appts.loc[dates.index, list(_SIG_COLS)], index=False)
+        sums = sig.groupby(dates.to_numpy()).sum()
+        ru.sigs = dict(zip(sums.index.strftime("%Y-%m-%d"), (int(h) for h in sums.to_numpy())))
+        if prev is not None:
+            with prev._lock:
+                keep = {d for d, h in ru.sigs.items() if prev.sigs.get(d) == h and d in prev.days}
+                ru.days = {d: prev.days[d] for d in keep}
+            if keep:
+                kept = pd.to_datetime(sorted(keep)).as_unit(dates.dt.unit)
+                appts = appts.loc[dates.index[~dates.isin(kept)]]
+        status = appts["status"].astype(str)
+        busy = status.isin(BUSY_STATUSES)
+        df = pd.DataFrame({
+            "day": appts["date"].dt.strftime("%Y-%m-%d"),
+            "status": status,
+            "emp": appts["employee_id"].astype(str).str.strip(),
+            "svc": appts["service_name"].astype(str).str.strip(),
+            "busy": busy,
+            "minutos": appts["duration_min"].where(busy, 0).astype("int64"),
+            "receita": pd.to_numeric(appts["final_price"].astype(str).str.strip().str.replace(",", ".", regex=False),
+                                     errors="coerce").fillna(0.0).where(busy, 0.0),
+        }).dropna(subset=["day"])
+        agg = {"qtd": ("busy", "sum"), "minutos": ("minutos", "sum"), "receita": ("receita", "sum")}
+
+        for day, total, qtd, minutos, receita in df.groupby("day").agg(total=("status", "size"), **agg).itertuples():
+            b = ru.days[day] = new_bucket()
+            b.update(total=int(total), qtd=int(qtd), minutos=int(minutos), receita=round(float(receita), 2))
+        for (day, s), n in df.groupby(["day", "status"]).size().items():
+            ru.days[day]["por_status"][s] = int(n)
+        df = df[df["busy"]]
+        for group, col in (("por_profissional", "emp"), ("por_servico", "svc")):
+            for (day, key), qtd, minutos, receita in df.groupby(["day", col]).agg(**agg).itertuples():
+                ru.days[day][group][key] = {"qtd": int(qtd), "minutos": int(minutos), "receita": round(float(receita), 2)}
+        return ru
+
+    def add_appointment(self, row: dict):
+        d = str(row.get("date", "") or "").strip()[:10]
+        if len(d) == 10:
+            with self._lock:
+                # copia: o bucket pode estar compartilhado com a versão seguinte/anterior
+                b = copy.deepcopy(self.days.get(d)) or new_bucket()
+                add_row(b, row)
+                self.days[d] = b
+                self.sigs.pop(d, None)   # o bucket já não corresponde às linhas da versão
+
+    def buckets(self, start: dt.date, end: dt.date) -> list[dict]:
+        """Buckets do intervalo: um por dia com movimento + meses arquivados inteiros no intervalo."""
+        out, cur = [], start
+        while cur <= end:
+            b = self.days.get(cur.isoformat())
+            if b:
+                out.append(b)
+            cur += dt.timedelta(days=1)
+        for m, b in self.months.items():
+            ini = dt.date.fromisoformat(f"{m}-01")
+            if start <= ini and period_range(ini, "Mês")[1] <= end:
+                out.append(b)
+        return out
+
+    def totals(self, start, end) -> dict:
+        tot = {"qtd": 0, "minutos": 0, "receita": 0.0}
+        for b in self.buckets(start, end):
+            _bump(tot, b["qtd"], b["minutos"], b["receita"])
+        return tot
+
+    def by_group(self, start, end, group: str) -> pd.DataFrame:
+        """qtd/minutos/receita por `group` ('por_profissional' | 'por_servico') no intervalo."""
+        acc = {}
+        for b in self.buckets(start, end):
+            for k, v in b.get(group, {}).items():
+                _bump(acc.setdefault(k, {"qtd": 0, "minutos": 0, "receita": 0.0}), v["qtd"], v["minutos"], v["receita"])
+        df = pd.DataFrame.from_dict(acc, orient="index", columns=list(_VALS))
+        return df.sort_values("qtd", ascending=False)
+
+    def by_day(self, start, end) -> pd.DataFrame:
+        idx = pd.date_range(start, end, freq="D")
+        rows = [{k: self.days.get(d.strftime("%Y-%m-%d"), {}).get(k, 0) for k in _VALS} for d in idx]
+        return pd.DataFrame(rows, index=idx.date)
+
+
+def capacity_minutes(employees: pd.DataFrame, start: dt.date, end: dt.date) -> pd.Series:
+    """Minutos de expediente padrão (default_start–default_end) por employee_id no intervalo."""
+    days = (end - start).days + 1
+    ini = hhmm_to_min_col(employees["default_start"].fillna("09:00")).fillna(9 * 60)
+    fim = hhmm_to_min_col(employees["default_end"].fillna("19:00")).fillna(19 * 60)
+    return pd.Series(((fim - ini).clip(lower=0) * days).to_numpy(), index=employees["employee_id"].astype(str))
@@ -0,0 +1,126 @@
+# sheet_sync.py — Nessa Coiffeur — Sincronização da aba DB_AGENDAMENTOS (Apps Script) com o DB
+#
+# O apps_script/code.gs registra em DB_AGENDAMENTOS, em lote, o que é digitado nas abas
+# mensais. Aqui essa aba (CSV publicado ou exportado, layout de
+# planilha_modelo/appointments.csv) entra no DB num único commit:
+#   - a chave é a célula de origem: source_sheet + source_row + profissional (a mesma linha
+#     da aba mensal tem uma coluna por profissional); vale a última linha de cada chave
+#   - chave que já está no DB mantém o appt_id de lá: célula editada atualiza o agendamento
+#     em vez de criar outro; duplicatas antigas da mesma célula são removidas
+#   - validação e diff reaproveitam planilha.plan_import (linhas iguais não geram escrita;
+#     linhas com erro, ex. horário sobreposto, ficam no relatório e fora do commit)
+#
+# Linha de comando (lê .streamlit/secrets.toml; sem `origem` usa SHEET_CSV_URL):
+#   python sheet_sync.py [origem.csv|URL] [--dry-run]
+import argparse
+import io
+import json
+import tomllib
+
+import pandas as pd
+import requests
+
+import perf
+from clients import name_key
+from planilha import load_all, plan_import, read_chunks
+from storage import from_config, op_remove
+
+CREATED_BY = "planilha"
+KEY_COLS = ("source_sheet", "source_row", "employee_name")
+
+
+def fetch(src):
+    """Caminho, buffer ou URL (http/https) -> algo que read_chunks lê."""
+    if isinstance(src, str) and src.lower().startswith(("http://", "https://")):
+        r = requests.get(src, timeout=60)
+        r.raise_for_status()
+        return io.BytesIO(r.content)
+    return src
+
+
+def _keys(df: pd.DataFrame) -> pd.Series:
+    # mesma normalização do code.gs (caixa alta, sem acentos)
+    return (df["source_sheet"].str.strip() + "|" + df["source_row"].str.strip() + "|"
+            + df["employee_name"].map(name_key))
+
+
+def prepare(db: dict, src) -> tuple[pd.DataFrame, list[str]]:
+    """Linhas da aba (uma por célula de origem, com o appt_id do DB quando já existe) e os
+    appt_ids de duplicatas antigas a remover."""
+    parts = list(read_chunks(fetch(src)))
+    df = pd.concat(parts) if parts else pd.DataFrame(columns=["appt_id", *KEY_COLS])
+    for c in ("appt_id", "employee_id", *KEY_COLS):
+        if c not in df.columns:
+            df[c] = ""
+    df = df[(df["source_sheet"].str.strip() != "") & (df["source_row"].str.strip() != "")]
+    df = df.assign(_key=_keys(df))
+    df = df[~df["_key"].duplicated(keep="last")]   # a versão mais nova de cada célula
+
+    stored, extra = {}, []
+    wanted = set(df["_key"])
+    for r in db.get("agendamentos", []):
+        if not str(r.get("source_sheet", "") or "").strip():
+            continue
+        key = "|".join((str(r.get("source_sheet", "")).strip(), str(r.get("source_row", "")).strip(),
+                        name_key(r.get("employee_name"))))
+        if key not in wanted:
+            continue
+        if key in stored:
+            extra.append(stored[key])
+        stored[key] = str(r.get("appt_id", "")).strip()
+    known = df["_key"].map(stored)
+    df["appt_id"] = known.fillna(df["appt_id"])
+
+    # ids de FUNCIONARIOS da planilha podem não ser os do DB: vale o nome
+    emps = db.get("funcionarios", [])
+    ids = {str(e.get("employee_id", "")).strip() for e in emps}
+    by_name = {name_key(e.get("name")): str(e.get("employee_id", "")).strip() for e in emps}
+    fix = ~df["employee_id"].str.strip().isin(ids)
+    df.loc[fix, "employee_id"] = df.loc[fix, "employee_name"].map(name_key).map(by_name).fillna("")
+    return df.drop(columns="_key"), extra
+
+
+@perf.timed()
+def sync(storage, src, dry_run: bool = False) -> dict:
+    """Grava no DB, num único commit, as linhas novas/alteradas da aba DB_AGENDAMENTOS
+    (no layout mensal, os meses tocados vão juntos num commit da Git Data API).
+
+    Linhas inválidas não bloqueiam as outras (a sincronização é automática): ficam em
+    `erros` no relatório.
+    """
+    db = load_all(storage)
+    df, extra = prepare(db, src)
+    if extra:
+        drop = set(extra)
+        db = {**db, "agendamentos": [r for r in db.get("agendamentos", [])
+                                     if str(r.get("appt_id", "")).strip() not in drop]}
+    ops, report = plan_import(db, {"agendamentos": df}, CREATED_BY)
+    if extra:
+        ops.insert(0, op_remove("agendamentos", "appt_id", extra))
+    report["duplicatas"] = len(extra)
+    report["gravado"] = False
+    if dry_run or not ops:
+        return report
+    n = report["novos"]["agendamentos"] + report["alterados"]["agendamentos"]
+    report["versao"] = storage.commit(ops, f"feat: sincronização da planilha ({n} agendamentos)")
+    report["gravado"] = True
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sincroniza a aba DB_AGENDAMENTOS (CSV) com o DB.")
+    ap.add_argument("origem", nargs="?", help="arquivo .csv ou URL; padrão: SHEET_CSV_URL")
+    ap.add_argument("--secrets", default=".streamlit/secrets.toml")
+    ap.add_argument("--dry-run", action="store_true", help="só valida, não grava")
+    args = ap.parse_args(argv)
+    with open(args.secrets, "rb") as f:
+        cfg = tomllib.load(f)
+    origem = args.origem or str(cfg.get("SHEET_CSV_URL", "")).strip()
+    if not origem:
+        ap.error("informe a origem ou configure SHEET_CSV_URL")
+    rep = sync(from_config(cfg), origem, dry_run=args.dry_run)
+    print(json.dumps(rep, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,958 @@
+# storage.py — Nessa Coiffeur — Backends de armazenamento do DB
+#
+# O app fala só com a interface `Storage` (load / commit / save / query).
+# Escritas são listas de operações pequenas (op log): acrescentar uma linha,
+# alterar uma linha. Em conflito de versão, o backend relê o DB, reaplica as
+# operações e tenta de novo, em vez de perder a escrita.
+# Implementações:
+#   - GitHubJSONStorage: o `db/db.json` no repositório, via Contents API
+#   - GitHubPartitionedStorage: `db/db.json` só com cadastros + um arquivo por mês para
+#     agendamentos e bloqueios (`db/agendamentos/2026-10.json`)
+#   - GitHubGitStorage: mesmo layout via Git Data API (blobs crus, sem limite de 1 MB;
+#     vários arquivos num único commit atômico)
+#   - SQLiteStorage:     arquivo SQLite local (WAL), indexado por data/profissional
+import copy
+import datetime as dt
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+import perf
+from github_api import (
+    configure, gh_commit_files, gh_get_blob, gh_get_commit_tree, gh_get_file, gh_get_ref, gh_get_tree, gh_list_dir,
+    gh_put_file,
+)
+
+KINDS = ("clientes", "servicos", "funcionarios", "agendamentos", "bloqueios")
+PARTITIONED_KINDS = ("agendamentos", "bloqueios")
+MAX_CONFLICT_RETRIES = 5
+
+
+class StorageConflict(Exception):
+    """A versão base da escrita não é mais a versão atual do DB."""
+
+
+class RowNotFound(Exception):
+    """Operação de update sem linha correspondente."""
+
+
+def empty_db() -> dict:
+    db = {k: [] for k in KINDS}
+    db["generated_at"] = dt.datetime.utcnow().isoformat() + "Z"
+    return db
+
+
+def month_of(date) -> str | None:
+    """'2026-10-16' (ou date) -> '2026-10'; None se não for uma data válida."""
+    if date is not None and not isinstance(date, str):
+        return date.strftime("%Y-%m")
+    d = str(date or "").strip()
+    try:
+        dt.datetime.strptime(d[:7], "%Y-%m")
+    except ValueError:
+        return None
+    return d[:7]
+
+
+def _norm(v) -> str:
+    return str(v if v is not None else "").strip().lower()
+
+
+def _matches(row: dict, key: str, value) -> bool:
+    return _norm(row.get(key, "")) == _norm(value)
+
+
+# =========================
+# Operações (op log)
+# =========================
+def op_append(kind: str, row: dict) -> dict:
+    return {"op": "append", "kind": kind, "row": row}
+
+
+def op_update(kind: str, key: str, value, changes: dict) -> dict:
+    """Altera a primeira linha de `kind` com row[key] == value (sem caixa/espaços)."""
+    return {"op": "update", "kind": kind, "key": key, "value": value, "changes": changes}
+
+
+def op_remove(kind: str, key: str, values) -> dict:
+    """Remove as linhas de `kind` com row[key] em `values`; valores ausentes são ignorados."""
+    return {"op": "remove", "kind": kind, "key": key, "values": sorted({_norm(v) for v in values})}
+
+
+def op_set(key: str, value) -> dict:
+    """Define um valor de topo do DB fora das listas (ex.: contadores do arquivo morto)."""
+    return {"op": "set", "key": key, "value": value}
+
+
+def apply_ops(db: dict, ops: list[dict]) -> dict:
+    """Novo DB com `ops` aplicadas. Cópia rasa: só as listas tocadas são copiadas, uma vez."""
+    out, copied = dict(db), set()
+
+    def rows(kind):
+        if kind not in copied:
+            out[kind] = list(out.get(kind, []))
+            copied.add(kind)
+        return out[kind]
+
+    for op in ops:
+        if op["op"] == "append":
+            rows(op["kind"]).append(op["row"])
+        elif op["op"] == "update":
+            lst = rows(op["kind"])
+            for i, r in enumerate(lst):
+                if _matches(r, op["key"], op["value"]):
+                    lst[i] = {**r, **op["changes"]}
+                    break
+            else:
+                raise RowNotFound(f"{op['kind']}: {op['key']}={op['value']!r}")
+        elif op["op"] == "remove":
+            drop = set(op["values"])
+            out[op["kind"]] = [r for r in out.get(op["kind"], []) if _norm(r.get(op["key"])) not in drop]
+            copied.add(op["kind"])
+        elif op["op"] == "set":
+            out[op["key"]] = op["value"]
+        else:
+            raise ValueError(f"operação desconhecida: {op['op']!r}")
+    return out
+
+
+def _commit_of(res: dict) -> tuple[str | None, str | None]:
+    """(commit, pai) da resposta de um PUT da Contents API."""
+    commit = res.get("commit") or {}
+    parents = commit.get("parents") or [{}]
+    return commit.get("sha"), parents[0].get("sha")
+
+
+def filter_rows(rows, date=None, employee_id=None):
+    if date is not None and not isinstance(date, str):
+        date = date.strftime("%Y-%m-%d")
+    out = []
+    for r in rows:
+        if date is not None and str(r.get("date", "")) != date:
+            continue
+        if employee_id is not None and str(r.get("employee_id", "")) != str(employee_id):
+            continue
+        out.append(r)
+    return out
+
+
+def db_query(db: dict):
+    """Função `query(kind, date=None, employee_id=None)` sobre um DB em memória."""
+    def query(kind, date=None, employee_id=None):
+        return filter_rows(db.get(kind, []), date, employee_id)
+    return query
+
+
+# =========================
+# Interface
+# =========================
+class Storage:
+    """Contrato comum dos backends. `version` identifica o estado do DB (sha no GitHub).
+
+    O DB devolvido por `load` é um snapshot compartilhado entre sessões: não deve ser
+    modificado. Escritas produzem um novo snapshot (cópia rasa), nunca alteram o anterior.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._snap = None        # (db, version)
+        self._checked_at = 0.0   # time.monotonic() da última revalidação
+        self._polled_head = None # cabeça do backend vista no último `poll`
+
+    def load(self, max_age: float = 0.0, months=None) -> tuple[dict, str | None]:
+        """Retorna (db, version), revalidando no backend se o snapshot tiver mais de `max_age` s.
+
+        `months` ('YYYY-MM') só importa para backends particionados: garante esses meses no
+        snapshot. Os demais sempre devolvem o DB inteiro.
+        """
+        with self._lock:
+            if self._snap is not None and time.monotonic() - self._checked_at < max_age:
+                return self._snap
+            self._snap = self._fetch()
+            self._checked_at = time.monotonic()
+            return self._snap
+
+    def invalidate(self):
+        """Força a próxima `load` a revalidar no backend."""
+        with self._lock:
+            self._checked_at = 0.0
+
+    def peek(self, months=None) -> tuple[dict, str | None] | None:
+        """Snapshot atual sem travar nem ir à rede; None se ainda não há (ou faltam `months`)."""
+        return self._snap
+
+    def poll(self) -> tuple[dict, str | None]:
+        """Revalidação do refresher em segundo plano: só relê o DB se a cabeça do backend andou."""
+        head = self._branch_head()
+        with self._lock:
+            if head is not None and head == self._polled_head and self._snap is not None:
+                self._checked_at = time.monotonic()
+                return self._snap
+            snap = self.load(max_age=0)
+            self._polled_head = head
+            return snap
+
+    def _branch_head(self) -> str | None:
+        """Identificador barato do estado do backend (None = sempre revalidar tudo)."""
+        return None
+
+    def _current(self) -> tuple[dict, str | None]:
+        return self._snap if self._snap is not None else self.load()
+
+    def _advance(self, db: dict | None, version: str | None):
+        self._snap = (db, version) if db is not None else None
+        self._checked_at = time.monotonic() if db is not None else 0.0
+
+    def _wrote(self, commit: str | None, parent: str | None):
+        """Escrita própria publicada como `commit` sobre `parent`: se a base era a cabeça já
+        conferida no último `poll`, o snapshot continua em dia e o próximo poll não relê nada."""
+        if commit and self._polled_head is not None and parent == self._polled_head:
+            self._polled_head = commit
+
+    def _fetch(self) -> tuple[dict, str | None]:
+        """Lê o DB do backend; deve reaproveitar `self._snap` quando a versão não mudou."""
+        raise NotImplementedError
+
+    def commit(self, ops: list[dict], msg: str, check=None) -> str | None:
+        """Aplica `ops` atomicamente e retorna a nova versão.
+
+        `check(query, ops)` roda contra o estado em que as ops serão aplicadas (de novo a cada
+        nova tentativa) e pode levantar uma exceção para recusar a escrita.
+        """
+        raise NotImplementedError
+
+    def save(self, db: dict, old_version: str | None, msg: str) -> str | None:
+        """Grava o DB inteiro; retorna a nova versão."""
+        raise NotImplementedError
+
+    def append(self, kind: str, row: dict, msg: str, check=None) -> str | None:
+        """Acrescenta uma linha em `kind`; retorna a nova versão."""
+        return self.commit([op_append(kind, row)], msg, check)
+
+    def update(self, kind: str, key: str, value, changes: dict, msg: str) -> tuple[bool, str | None]:
+        """Aplica `changes` na primeira linha de `kind` com row[key] == value (sem caixa/espaços)."""
+        try:
+            return True, self.commit([op_update(kind, key, value, changes)], msg)
+        except RowNotFound:
+            return False, self._current()[1]
+
+    def query(self, kind: str, date=None, employee_id=None) -> list[dict]:
+        """Linhas de `kind` filtradas por data (YYYY-MM-DD) e/ou profissional."""
+        with self._lock:
+            db, _ = self._current()
+            return [dict(r) for r in filter_rows(db.get(kind, []), date, employee_id)]
+
+    # --- arquivo morto (ver archive.py) ---
+    def stored_months(self) -> list[str] | None:
+        """Meses ('YYYY-MM') guardados em partições; None se o backend não particiona."""
+        return None
+
+    def release_months(self, months):
+        """Tira esses meses do snapshot em memória (backends particionados)."""
+
+    def read_archive(self, name: str) -> bytes | None:
+        """Conteúdo do arquivo morto `name` (ex. 'agendamentos-2025.json.gz'), ou None."""
+        raise NotImplementedError
+
+    def write_archive(self, name: str, data: bytes, msg: str):
+        raise NotImplementedError
+
+
+# =========================
+# GitHub (JSON único no repositório)
+# =========================
+class _ContentsArchive:
+    """Arquivo morto via Contents API, em `<pasta do DB>/arquivo/<nome>`."""
+
+    def _archive_path(self, name: str) -> str:
+        return f"{os.path.dirname(self.path) or 'db'}/arquivo/{name}"
+
+    def read_archive(self, name):
+        return gh_get_file(self.repo, self._archive_path(name), self.branch, binary=True)["content"]
+
+    def write_archive(self, name, data, msg):
+        path = self._archive_path(name)
+        for _ in range(MAX_CONFLICT_RETRIES):
+            sha = gh_get_file(self.repo, path, self.branch, binary=True)["sha"]
+            try:
+                gh_put_file(self.repo, path, self.branch, data, sha, msg)
+                return
+            except requests.HTTPError as e:
+                if (e.response.status_code if e.response is not None else None) not in (409, 422):
+                    raise
+        raise StorageConflict(f"{path}: conflito de versão após {MAX_CONFLICT_RETRIES} tentativas")
+
+
+class GitHubJSONStorage(_ContentsArchive, Storage):
+    name = "github"
+
+    def _branch_head(self):
+        # GET condicional na ref: 304 enquanto ninguém commitar na branch
+        return gh_get_ref(self.repo, self.branch)
+
+    def __init__(self, repo: str, path: str, branch: str):
+        super().__init__()
+        self.repo = repo
+        self.path = path
+        self.branch = branch
+
+    def _fetch(self):
+        # GET condicional só a partir da versão deste snapshot (o cache de ETags é do processo)
+        have = self._snap[1] if self._snap is not None else None
+        res = gh_get_file(self.repo, self.path, self.branch, have_sha=have)
+        if self._snap is not None and res["sha"] == self._snap[1]:
+            return self._snap
+        text = res["content"] or ""
+        # seed vazio (primeiro deploy)
+        with perf.span("json_decode"):
+            db = json.loads(text) if text else empty_db()
+        return db, res["sha"]
+
+    def _put(self, db, old_sha, msg):
+        res = gh_put_file(self.repo, self.path, self.branch,
+                          json.dumps(db, ensure_ascii=False, indent=2), old_sha, msg)
+        self._wrote(*_commit_of(res))
+        return res.get("content", {}).get("sha", old_sha)
+
+    def save(self, db, old_version, msg):
+        with self._lock:
+            db = copy.deepcopy(db)
+            sha = self._put(db, old_version, msg)
+            self._advance(db, sha)
+            return sha
+
+    def commit(self, ops, msg, check=None):
+        with self._lock:
+            for _ in range(MAX_CONFLICT_RETRIES):
+                base, sha = self._current()
+                if check:
+                    check(db_query(base), ops)
+                db = apply_ops(base, ops)
+                try:
+                    new_sha = self._put(db, sha, msg)
+                except requests.HTTPError as e:
+                    status = e.response.status_code if e.response is not None else None
+                    if status not in (409, 422):
+                        raise
+                    # sha desatualizado: outro processo gravou antes. Relê e reaplica o op log.
+                    self._snap = self._fetch()
+                    self._checked_at = time.monotonic()
+                    continue
+                self._advance(db, new_sha)
+                return new_sha
+            raise StorageConflict(f"{self.path}: conflito de versão após {MAX_CONFLICT_RETRIES} tentativas")
+
+
+# =========================
+# GitHub particionado por mês
+# =========================
+class GitHubPartitionedStorage(_ContentsArchive, Storage):
+    """Cadastros em `path`; agendamentos/bloqueios em `<dir>/<kind>/<YYYY-MM>.json` (lista JSON).
+
+    Só os meses pedidos em `load(months=...)` (ou tocados por uma escrita) ficam em memória,
+    e uma escrita só regrava o arquivo do mês dela (um PUT); escritas que tocam vários
+    arquivos vão num único commit da Git Data API. Linhas antigas ainda guardadas em `path`
+    continuam sendo lidas junto. A versão é um hash dos shas de todos os arquivos carregados.
+    """
+
+    name = "github-monthly"
+
+    def __init__(self, repo: str, path: str, branch: str, part_dir: str | None = None):
+        super().__init__()
+        self.repo = repo
+        self.path = path
+        self.branch = branch
+        self.part_dir = (part_dir or os.path.dirname(path) or "db").rstrip("/")
+        self._files: dict[str, tuple] = {}   # caminho -> (conteúdo parseado, sha)
+        self._months: set[str] = set()
+
+    # O snapshot é publicado junto com os meses que ele contém (uma única atribuição),
+    # para `peek` nunca devolver um snapshot sem um mês que já consta em `_months`.
+    @property
+    def _snap(self):
+        return self._view[0]
+
+    @_snap.setter
+    def _snap(self, snap):
+        self._view = (snap, frozenset(getattr(self, "_months", ())))
+
+    def peek(self, months=None):
+        snap, have = self._view
+        if snap is None or not {m for m in (months or ()) if m} <= have:
+            return None
+        return snap
+
+    def _branch_head(self):
+        return gh_get_ref(self.repo, self.branch)
+
+    def part_path(self, kind: str, month: str) -> str:
+        return f"{self.part_dir}/{kind}/{month}.json"
+
+    def _paths(self) -> list[str]:
+        return [self.path] + [self.part_path(k, m) for m in sorted(self._months) for k in PARTITIONED_KINDS]
+
+    def _refresh_file(self, path: str) -> bool:
+        """Relê `path` (GET condicional); True se mudou."""
+        old = self._files.get(path)
+        res = gh_get_file(self.repo, path, self.branch, have_sha=old[1] if old is not None else None)
+        if old is not None and res["sha"] == old[1]:
+            return False
+        self._files[path] = (self._parse(path, res["content"]), res["sha"])
+        return True
+
+    def _parse(self, path: str, text: str | None):
+        with perf.span("json_decode"):
+            if path == self.path:
+                return json.loads(text) if text else empty_db()
+            return json.loads(text) if text else []
+
+    def _version(self) -> str:
+        h = hashlib.sha1()
+        for p in self._paths():
+            h.update(f"{p}:{self._files[p][1]}\n".encode())
+        return h.hexdigest()
+
+    def _assemble(self) -> tuple[dict, str]:
+        master = self._files[self.path][0]
+        db = dict(master)
+        for kind in PARTITIONED_KINDS:
+            rows = list(master.get(kind, []))   # legado: linhas ainda no arquivo mestre
+            for m in sorted(self._months):
+                rows.extend(self._files[self.part_path(kind, m)][0])
+            db[kind] = rows
+        return db, self._version()
+
+    def _fetch(self):
+        for p in self._paths():
+            self._refresh_file(p)
+        if self._snap is not None and self._snap[1] == self._version():
+            return self._snap
+        return self._assemble()
+
+    def _ensure_months(self, months) -> bool:
+        missing = {m for m in (months or ()) if m and m not in self._months}
+        if not missing:
+            return False
+        if self.path not in self._files:
+            self._refresh_file(self.path)
+        for m in sorted(missing):
+            for kind in PARTITIONED_KINDS:
+                self._refresh_file(self.part_path(kind, m))
+        self._months |= missing
+        return True
+
+    def load(self, max_age=0.0, months=None):
+        with self._lock:
+            first = self.path not in self._files
+            if self._ensure_months(months) or first:
+                # só os meses novos foram buscados; o resto segue o prazo de revalidação
+                if first:
+                    self._refresh_file(self.path)
+                    self._checked_at = time.monotonic()
+                self._snap = self._assemble()
+                return self._snap
+            return super().load(max_age)
+
+    def query(self, kind, date=None, employee_id=None):
+        with self._lock:
+            if kind in PARTITIONED_KINDS and date is not None:
+                self.load(max_age=float("inf"), months=[month_of(date)])
+            return super().query(kind, date, employee_id)
+
+    def stored_months(self):
+        names = set()
+        for kind in PARTITIONED_KINDS:
+            names.update(gh_list_dir(self.repo, f"{self.part_dir}/{kind}", self.branch))
+        return sorted({n[:-5] for n in names if n.endswith(".json") and month_of(n[:-5]) == n[:-5]})
+
+    def release_months(self, months):
+        with self._lock:
+            drop = set(months) & self._months
+            if not drop or self._snap is None:
+                return
+            self._months -= drop
+            for m in drop:
+                for kind in PARTITIONED_KINDS:
+                    self._files.pop(self.part_path(kind, m), None)
+            self._advance(*self._assemble())
+
+    # --- escrita ---
+    def _files_with(self, kind, key, values) -> list[str]:
+        """Arquivos carregados com alguma linha de `kind` cujo row[key] está em `values`."""
+        paths = [self.path]
+        if kind in PARTITIONED_KINDS:
+            paths += [self.part_path(kind, m) for m in sorted(self._months)]
+        out = []
+        for p in paths:
+            rows = self._files[p][0]
+            rows = rows.get(kind, []) if p == self.path else rows
+            if any(_norm(r.get(key)) in values for r in rows):
+                out.append(p)
+        return out
+
+    def _route(self, op) -> str:
+        """Arquivo onde a op é aplicada."""
+        if op["op"] == "set" or op["kind"] not in PARTITIONED_KINDS:
+            return self.path
+        if op["op"] == "append":
+            m = month_of(op["row"].get("date"))
+            return self.part_path(op["kind"], m) if m else self.path
+        found = self._files_with(op["kind"], op["key"], {_norm(op["value"])})
+        if not found:
+            raise RowNotFound(f"{op['kind']}: {op['key']}={op['value']!r}")
+        return found[0]
+
+    def _apply_file(self, path, data, ops):
+        if path == self.path:
+            return apply_ops(data, ops)
+        kind = ops[0]["kind"]
+        return apply_ops({kind: data}, ops)[kind]
+
+    def _by_path(self, ops) -> dict[str, list]:
+        """Garante os meses das ops no snapshot e agrupa as ops por arquivo de destino."""
+        self._current()
+        self._ensure_months(month_of(op["row"].get("date")) for op in ops if op["op"] == "append")
+        by_path: dict[str, list] = {}
+        for op in ops:
+            if op["op"] == "remove":
+                # as linhas podem estar em vários meses (e no legado do arquivo mestre)
+                for p in self._files_with(op["kind"], op["key"], set(op["values"])):
+                    by_path.setdefault(p, []).append(op)
+                continue
+            by_path.setdefault(self._route(op), []).append(op)
+        return by_path
+
+    def save(self, db, old_version, msg):
+        raise NotImplementedError("layout mensal: grave com commit(ops)")
+
+    def commit(self, ops, msg, check=None):
+        with self._lock:
+            by_path = self._by_path(ops)
+            if not by_path:
+                return self._current()[1]
+            if len(by_path) > 1:
+                return self._commit_tree(ops, msg, check)
+            # um arquivo só: um PUT da Contents API, com o ciclo de conflito do próprio arquivo
+            (path, fops), = by_path.items()
+            for _ in range(MAX_CONFLICT_RETRIES):
+                db, _ = self._assemble()
+                if check:
+                    check(db_query(db), ops)
+                data, sha = self._files[path]
+                new = self._apply_file(path, data, fops)
+                try:
+                    res = gh_put_file(self.repo, path, self.branch,
+                                      json.dumps(new, ensure_ascii=False, indent=2), sha, msg)
+                except requests.HTTPError as e:
+                    status = e.response.status_code if e.response is not None else None
+                    if status not in (409, 422):
+                        raise
+                    self._refresh_file(path)
+                    continue
+                self._files[path] = (new, res.get("content", {}).get("sha", sha))
+                self._wrote(*_commit_of(res))
+                db, version = self._assemble()
+                self._advance(db, version)
+                return version
+            raise StorageConflict(f"{path}: conflito de versão após {MAX_CONFLICT_RETRIES} tentativas")
+
+    def _commit_tree(self, ops, msg, check):
+        """Escrita que toca vários arquivos (ex. meses diferentes): um commit da Git Data API.
+
+        A Contents API grava um arquivo por PUT; arquivo a arquivo, uma falha no meio (ou o
+        `check` recusando depois de um conflito) deixaria os primeiros gravados. Aqui todos
+        vão num commit sobre o head da branch, publicado por um update de ref sem force: ou
+        tudo entra, ou nada muda. O sha de um arquivo na Contents API é o sha do blob, então
+        os dois caminhos de escrita continuam se reconhecendo.
+        """
+        for _ in range(MAX_CONFLICT_RETRIES):
+            head = gh_get_ref(self.repo, self.branch)
+            if head is None:
+                raise RuntimeError(f"branch {self.branch!r} não encontrada em {self.repo}")
+            tree = gh_get_commit_tree(self.repo, head)
+            blobs = gh_get_tree(self.repo, tree)
+            # os arquivos carregados precisam ser os deste head (senão, relê os que mudaram)
+            for p in self._paths():
+                if blobs.get(p) != self._files[p][1]:
+                    self._refresh_file(p)
+            by_path = self._by_path(ops)
+            if any(blobs.get(p) != self._files[p][1] for p in by_path):
+                continue   # o head andou entre as leituras: começa de novo
+            db, _ = self._assemble()
+            if check:
+                check(db_query(db), ops)
+            new = {p: self._apply_file(p, self._files[p][0], fops) for p, fops in by_path.items()}
+            files = {p: json.dumps(data, ensure_ascii=False, indent=2) for p, data in new.items()}
+            try:
+                res = gh_commit_files(self.repo, self.branch, head, tree, files, msg)
+            except requests.HTTPError as e:
+                if (e.response.status_code if e.response is not None else None) not in (409, 422):
+                    raise
+                continue   # a branch andou: relê e reaplica as ops sobre o novo head
+            for p, data in new.items():
+                self._files[p] = (data, res["blobs"][p])
+            # todos os arquivos carregados foram conferidos contra `head`: em dia com o commit novo
+            self._polled_head = res["commit"]
+            db, version = self._assemble()
+            self._advance(db, version)
+            return version
+        raise StorageConflict(f"conflito de versão após {MAX_CONFLICT_RETRIES} tentativas")
+
+
+# =========================
+# GitHub via Git Data API
+# =========================
+class GitHubGitStorage(GitHubPartitionedStorage):
+    """Mesmos arquivos, lidos e gravados pela Git Data API em vez da Contents API.
+
+    Leitura: ref da branch (GET condicional) -> tree do commit -> só os blobs cujo sha mudou,
+    em formato cru (sem base64 e sem o limite de 1 MB). Escrita: todos os arquivos tocados
+    num único commit (tree + commit + update da ref sem force); se a branch andou, o update
+    falha e as ops são reaplicadas sobre o novo head. Com `monthly=False`, tudo fica em `path`.
+    """
+
+    name = "github-git"
+
+    def __init__(self, repo: str, path: str, branch: str, part_dir: str | None = None, monthly: bool = True):
+        super().__init__(repo, path, branch, part_dir)
+        self.monthly = monthly
+        self._head = None            # (sha do commit, sha da tree)
+        self._tree: dict[str, str] = {}   # caminho -> sha do blob no head
+
+    def _sync_head(self) -> bool:
+        """Atualiza head/tree se a branch andou; True se mudou."""
+        commit = gh_get_ref(self.repo, self.branch)
+        if commit is None:
+            raise RuntimeError(f"branch {self.branch!r} não encontrada em {self.repo}")
+        if self._head is not None and self._head[0] == commit:
+            return False
+        tree = gh_get_commit_tree(self.repo, commit)
+        self._tree = gh_get_tree(self.repo, tree)
+        self._head = (commit, tree)
+        return True
+
+    def _refresh_file(self, path: str) -> bool:
+        if self._head is None:
+            self._sync_head()
+        sha = self._tree.get(path)
+        old = self._files.get(path)
+        if old is not None and old[1] == sha:
+            return False
+        self._files[path] = (self._parse(path, gh_get_blob(self.repo, sha) if sha else None), sha)
+        return True
+
+    def _fetch(self):
+        # 1 GET condicional na ref; blobs só se o head mudou e o sha do arquivo também
+        if self._head is not None:
+            self._sync_head()
+        return super()._fetch()
+
+    def _branch_head(self):
+        # `_fetch` já começa pelo GET condicional na ref e não relê nada se o head não andou
+        return None
+
+    def _ensure_months(self, months) -> bool:
+        return super()._ensure_months(months) if self.monthly else False
+
+    def _route(self, op) -> str:
+        return super()._route(op) if self.monthly else self.path
+
+    def stored_months(self):
+        if not self.monthly:
+            return None
+        with self._lock:
+            self._sync_head()
+            prefixes = tuple(f"{self.part_dir}/{k}/" for k in PARTITIONED_KINDS)
+            return sorted({p.rsplit("/", 1)[1][:-5] for p in self._tree
+                           if p.startswith(prefixes) and p.endswith(".json") and month_of(p.rsplit("/", 1)[1][:-5])})
+
+    def read_archive(self, name):
+        with self._lock:
+            self._sync_head()
+            sha = self._tree.get(self._archive_path(name))
+        return gh_get_blob(self.repo, sha, binary=True) if sha else None
+
+    def write_archive(self, name, data, msg):
+        path = self._archive_path(name)
+        with self._lock:
+            for _ in range(MAX_CONFLICT_RETRIES):
+                self._sync_head()
+                try:
+                    res = gh_commit_files(self.repo, self.branch, self._head[0], self._head[1], {path: data}, msg)
+                except requests.HTTPError as e:
+                    if (e.response.status_code if e.response is not None else None) not in (409, 422):
+                        raise
+                    continue
+                self._head = (res["commit"], res["tree"])
+                self._tree[path] = res["blobs"][path]
+                return
+            raise StorageConflict(f"{path}: conflito de versão após {MAX_CONFLICT_RETRIES} tentativas")
+
+    def commit(self, ops, msg, check=None):
+        with self._lock:
+            by_path = self._by_path(ops)
+            for _ in range(MAX_CONFLICT_RETRIES):
+                db, _ = self._assemble()
+                if check:
+                    check(db_query(db), ops)
+                new = {p: self._apply_file(p, self._files[p][0], fops) for p, fops in by_path.items()}
+                files = {p: json.dumps(data, ensure_ascii=False, indent=2) for p, data in new.items()}
+                try:
+                    res = gh_commit_files(self.repo, self.branch, self._head[0], self._head[1], files, msg)
+                except requests.HTTPError as e:
+                    status = e.response.status_code if e.response is not None else None
+                    if status not in (409, 422):
+                        raise
+                    # a branch andou: relê os arquivos carregados no novo head e tenta de novo
+                    self._sync_head()
+                    for p in self._paths():
+                        self._refresh_file(p)
+                    by_path = self._by_path(ops)
+                    continue
+                self._head = (res["commit"], res["tree"])
+                for p, data in new.items():
+                    self._tree[p] = res["blobs"][p]
+                    self._files[p] = (data, res["blobs"][p])
+                db, version = self._assemble()
+                self._advance(db, version)
+                return version
+            raise StorageConflict(f"conflito de versão após {MAX_CONFLICT_RETRIES} tentativas")
+
+
+# =========================
+# SQLite local (WAL)
+# =========================
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS registros (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind        TEXT NOT NULL,
+    date        TEXT NOT NULL DEFAULT '',
+    employee_id TEXT NOT NULL DEFAULT '',
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_registros_kind_date_emp
+    ON registros (kind, date, employee_id);
+CREATE INDEX IF NOT EXISTS idx_registros_kind_emp_date
+    ON registros (kind, employee_id, date);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS arquivo (
+    name TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+"""
+
+
+class SQLiteStorage(Storage):
+    """Cada linha do DB vira um registro JSON, com `date`/`employee_id` em colunas indexadas.
+
+    A versão é um contador em `meta`, incrementado a cada escrita. Commits rodam numa
+    transação IMMEDIATE, então o `check` enxerga exatamente o estado em que as ops entram.
+    Valores de topo que não são listas (op_set) ficam em `meta` como `db:<chave>`; o arquivo
+    morto fica na tabela `arquivo`.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, seed_path: str | None = None):
+        super().__init__()
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        if self._version_num() == 0 and seed_path and os.path.exists(seed_path):
+            with open(seed_path, encoding="utf-8") as f:
+                self.save(json.load(f), None, f"seed: {seed_path}")
+
+    # --- internos ---
+    def _version_num(self) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _current_version(self) -> str | None:
+        n = self._version_num()
+        return f"sqlite:{n}" if n else None
+
+    def _bump(self) -> str:
+        n = self._version_num() + 1
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(n),))
+        return f"sqlite:{n}"
+
+    @staticmethod
+    def _record(kind, row):
+        return (kind, str(row.get("date", "") or ""), str(row.get("employee_id", "") or ""),
+                json.dumps(row, ensure_ascii=False))
+
+    def _write(self, fn):
+        """Roda `fn(versão anterior)` numa transação IMMEDIATE e devolve (versão anterior, resultado)."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            prev = self._current_version()
+            out = fn(prev)
+            self._conn.execute("COMMIT")
+            return prev, out
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _follow(self, prev, version, ops):
+        # se o snapshot em memória era a versão anterior, avança sem reler o arquivo
+        if self._snap is not None and self._snap[1] == prev:
+            try:
+                self._advance(apply_ops(self._snap[0], ops), version)
+                return
+            except RowNotFound:
+                pass
+        self._advance(None, None)
+
+    def _query(self, kind, date=None, employee_id=None):
+        if date is not None and not isinstance(date, str):
+            date = date.strftime("%Y-%m-%d")
+        sql, args = "SELECT data FROM registros WHERE kind = ?", [kind]
+        if date is not None:
+            sql += " AND date = ?"
+            args.append(date)
+        if employee_id is not None:
+            sql += " AND employee_id = ?"
+            args.append(str(employee_id))
+        return [json.loads(d) for (d,) in self._conn.execute(sql + " ORDER BY id", args)]
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                           (f"db:{key}", json.dumps(value, ensure_ascii=False)))
+
+    def _apply(self, op):
+        if op["op"] == "append":
+            self._conn.execute(
+                "INSERT INTO registros (kind, date, employee_id, data) VALUES (?, ?, ?, ?)",
+                self._record(op["kind"], op["row"]),
+            )
+            return
+        if op["op"] == "set":
+            self._set_meta(op["key"], op["value"])
+            return
+        if op["op"] == "remove":
+            drop = set(op["values"])
+            ids = [(rid,) for rid, data in self._conn.execute(
+                "SELECT id, data FROM registros WHERE kind = ?", (op["kind"],)).fetchall()
+                if _norm(json.loads(data).get(op["key"])) in drop]
+            self._conn.executemany("DELETE FROM registros WHERE id = ?", ids)
+            return
+        if op["op"] != "update":
+            raise ValueError(f"operação desconhecida: {op['op']!r}")
+        for rid, data in self._conn.execute(
+                "SELECT id, data FROM registros WHERE kind = ? ORDER BY id", (op["kind"],)).fetchall():
+            row = json.loads(data)
+            if _matches(row, op["key"], op["value"]):
+                row.update(op["changes"])
+                _, date, emp, payload = self._record(op["kind"], row)
+                self._conn.execute(
+                    "UPDATE registros SET date = ?, employee_id = ?, data = ? WHERE id = ?",
+                    (date, emp, payload, rid),
+                )
+                return
+        raise RowNotFound(f"{op['kind']}: {op['key']}={op['value']!r}")
+
+    # --- interface ---
+    def _fetch(self):
+        version = self._current_version()
+        if self._snap is not None and self._snap[1] == version:
+            return self._snap
+        db = {k: [] for k in KINDS}
+        with perf.span("sqlite_read"):
+            for kind, data in self._conn.execute("SELECT kind, data FROM registros ORDER BY id"):
+                db.setdefault(kind, []).append(json.loads(data))
+            for key, value in self._conn.execute("SELECT key, value FROM meta WHERE key LIKE 'db:%'"):
+                db[key[3:]] = json.loads(value)
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'generated_at'").fetchone()
+        db["generated_at"] = row[0] if row else dt.datetime.utcnow().isoformat() + "Z"
+        return db, version
+
+    def save(self, db, old_version, msg):
+        def fn(prev):
+            if old_version is not None and old_version != prev:
+                raise StorageConflict(f"versão {old_version} desatualizada ({prev})")
+            self._conn.execute("DELETE FROM registros")
+            self._conn.executemany(
+                "INSERT INTO registros (kind, date, employee_id, data) VALUES (?, ?, ?, ?)",
+                [self._record(k, r) for k, rows in db.items() if isinstance(rows, list) for r in rows],
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('generated_at', ?)",
+                               (str(db.get("generated_at") or dt.datetime.utcnow().isoformat() + "Z"),))
+            self._conn.execute("DELETE FROM meta WHERE key LIKE 'db:%'")
+            for k, v in db.items():
+                if not isinstance(v, list) and k != "generated_at":
+                    self._set_meta(k, v)
+            return self._bump()
+
+        with self._lock:
+            _, version = self._write(fn)
+            self._advance(copy.deepcopy(db), version)
+            return version
+
+    def commit(self, ops, msg, check=None):
+        def fn(prev):
+            if check:
+                check(self._query, ops)
+            for op in ops:
+                self._apply(op)
+            return self._bump()
+
+        with self._lock:
+            prev, version = self._write(fn)
+            self._follow(prev, version, ops)
+            return version
+
+    def query(self, kind, date=None, employee_id=None):
+        with self._lock:
+            return self._query(kind, date, employee_id)
+
+    def read_archive(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM arquivo WHERE name = ?", (name,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def write_archive(self, name, data, msg):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO arquivo (name, data) VALUES (?, ?)", (name, data))
+
+
+# =========================
+# Configuração
+# =========================
+def from_config(cfg, session=None) -> Storage:
+    """Backend a partir das chaves de `st.secrets` (ou de um dict com as mesmas chaves).
+
+    Usado pelo app e pelos scripts de linha de comando (ex. archive.py).
+    """
+    backend = str(cfg.get("STORAGE_BACKEND", "github")).strip().lower()
+    db_path = cfg.get("DB_PATH", "db/db.json")
+    if backend == "sqlite":
+        # primeiro uso: semeia o SQLite com o JSON versionado no repositório
+        return SQLiteStorage(cfg.get("SQLITE_PATH", "db/nessa.sqlite3"), seed_path=db_path)
+    if backend != "github":
+        raise ValueError(f"STORAGE_BACKEND inválido: {backend!r} (use 'github' ou 'sqlite')")
+    # GH_API_BASE: outra URL da API (GitHub Enterprise ou o servidor falso de bench/)
+    configure(cfg.get("GITHUB_TOKEN", ""), api_base=cfg.get("GH_API_BASE") or None, session=session)
+    repo = cfg.get("GH_REPO", "yurirasch/nessacoiffeur")
+    branch = cfg.get("GH_BRANCH", "main")
+    monthly = str(cfg.get("DB_LAYOUT", "monthly")).strip().lower() != "single"
+    if str(cfg.get("GH_API", "contents")).strip().lower() == "git":
+        # Git Data API: arquivos de qualquer tamanho e escritas multi-arquivo num commit só
+        return GitHubGitStorage(repo, db_path, branch, monthly=monthly)
+    if not monthly:
+        return GitHubJSONStorage(repo, db_path, branch)
+    # agendamentos/bloqueios em db/<kind>/<AAAA-MM>.json: um agendamento regrava só o seu mês
+    return GitHubPartitionedStorage(repo, db_path, branch)
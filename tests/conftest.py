@@ -0,0 +1,27 @@
+import os
+import sys
+
+# os módulos do app ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+
+import pytest
+
+import github_api
+from bench.fake_github import FakeGitHub
+from storage import empty_db
+
+REPO, PATH, BRANCH = "teste/nessa", "db/db.json", "main"
+
+
+@pytest.fixture
+def fake_gh():
+    """Contents API local (bench/fake_github.py) com um DB vazio em db/db.json."""
+    fake = FakeGitHub()
+    github_api.configure("teste", api_base=fake.start(), session=github_api.new_session())
+    github_api._ETAGS.clear()
+    fake.put(PATH, json.dumps(empty_db()))
+    yield fake
+    fake.stop()
+    github_api._ETAGS.clear()
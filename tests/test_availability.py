@@ -0,0 +1,61 @@
+import pandas as pd
+
+from availability import earliest_slots, free_slots
+
+EMP = pd.DataFrame([{"employee_id": "1", "default_start": "09:00", "default_end": "13:00"}])
+DAY = "2030-01-07"
+
+
+def test_within_off_grid_keeps_form_grid():
+    # faixa começando fora da grade (09:30, passo 60): os horários continuam os do formulário
+    form = free_slots(pd.DataFrame(columns=["employee_id", "date", "start_min", "end_min"]), EMP, [DAY], 60, 60)
+    found = earliest_slots(pd.DataFrame(columns=["employee_id", "date", "start_min", "end_min"]), EMP, DAY, 60,
+                           k=5, step_min=60, days=1, within=(9 * 60 + 30, 13 * 60))
+    assert list(found["time"]) == ["10:00", "11:00", "12:00"]
+    assert set(found["time"]) <= set(form["time"])
+
+
+def test_within_respects_busy_and_end():
+    busy = pd.DataFrame([{"employee_id": "1", "date": DAY, "start_min": 10 * 60, "end_min": 11 * 60}])
+    found = free_slots(busy, EMP, [DAY], 60, 60, within=(9 * 60 + 30, 12 * 60 + 30))
+    assert list(found["time"]) == ["11:00"]
+
+
+def test_fully_busy_window_is_empty():
+    busy = pd.DataFrame([{"employee_id": "1", "date": DAY, "start_min": 7 * 60, "end_min": 22 * 60}])
+    assert free_slots(busy, EMP, [DAY], 60, 60).empty
+    assert earliest_slots(busy, EMP, DAY, 60, k=5, step_min=60, days=1).empty
+
+
+def test_index_matches_brute_force_and_reads_are_consistent():
+    import random
+    import threading
+
+    from availability import AvailabilityIndex
+
+    rng, idx, ivs = random.Random(0), AvailabilityIndex(), []
+    stop, seen_bad = threading.Event(), []
+
+    def reader():
+        day = None
+        while not stop.is_set():
+            day = day or idx._days.get(("1", DAY))
+            if day is not None:
+                starts, ends, max_end = day.state
+                if not (len(starts) == len(ends) == len(max_end)):
+                    seen_bad.append(len(starts))
+
+    t = threading.Thread(target=reader)
+    t.start()
+    for _ in range(300):
+        s = rng.randrange(0, 1400)
+        e = s + rng.randrange(1, 90)
+        idx.add("1", DAY, s, e)
+        ivs.append((s, e))
+    stop.set()
+    t.join()
+    assert not seen_bad
+    for _ in range(500):
+        s = rng.randrange(0, 1440)
+        e = s + rng.randrange(1, 60)
+        assert idx.overlaps("1", DAY, s, e) == any(a < e and b > s for a, b in ivs)
@@ -0,0 +1,101 @@
+import json
+import time
+
+import pytest
+
+from availability import AvailabilityIndex, SlotTaken, check_slots
+from journal import Flusher, Journal
+from storage import SQLiteStorage, op_append
+from write_queue import WriteQueue
+
+
+def appt(appt_id, start="09:00", emp="1", date="2030-01-07"):
+    return {"appt_id": appt_id, "date": date, "start_time": start, "duration_min": 60,
+            "employee_id": emp, "status": "booked"}
+
+
+def wait_until(cond, timeout=10.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def ids(storage):
+    return sorted(r["appt_id"] for r in storage.load(max_age=0)[0]["agendamentos"])
+
+
+@pytest.fixture
+def db(tmp_path):
+    return SQLiteStorage(str(tmp_path / "t.sqlite3"))
+
+
+def test_replay_after_restart(tmp_path, db):
+    path = str(tmp_path / "j.jsonl")
+    j = Journal(path)
+    j.append([op_append("agendamentos", appt("A1"))], "a1", check="check_slots")
+    j.append([op_append("agendamentos", appt("A2", "10:00"))], "a2", check="check_slots")
+    j._f.close()   # "queda" antes de enviar ao backend
+
+    j2 = Journal(path)
+    assert [e["msg"] for e in j2.pending()] == ["a1", "a2"]
+    flusher = Flusher(j2, WriteQueue(db, window=0.01), checks={"check_slots": check_slots})
+    assert wait_until(lambda: not j2.pending())
+    assert ids(db) == ["A1", "A2"]
+    assert flusher.status()["failed"] == 0
+    assert Journal(path).pending() == []
+
+
+def test_slot_taken_is_permanent(tmp_path, db):
+    db.commit([op_append("agendamentos", appt("OUTRO"))], "antes")
+    j = Journal(str(tmp_path / "j.jsonl"))
+    Flusher(j, WriteQueue(db, window=0.01), checks={"check_slots": check_slots})
+    j.append([op_append("agendamentos", appt("A1"))], "a1", check="check_slots")
+    assert wait_until(lambda: j.failed())
+    assert "SlotTaken" in j.failed()[0]["error"]
+    assert ids(db) == ["OUTRO"]
+
+
+def test_transient_decode_error_is_retried(tmp_path, db):
+    # uma resposta ruim do backend (JSONDecodeError é um ValueError) não recusa a entrada
+    real, calls = db.commit, []
+
+    def flaky(ops, msg, check=None):
+        calls.append(msg)
+        if len(calls) == 1:
+            raise json.JSONDecodeError("resposta cortada", "", 0)
+        return real(ops, msg, check)
+
+    db.commit = flaky
+    j = Journal(str(tmp_path / "j.jsonl"))
+    Flusher(j, WriteQueue(db, window=0.01), checks={"check_slots": check_slots}, retry=0.05)
+    j.append([op_append("agendamentos", appt("A1"))], "a1", check="check_slots")
+    assert wait_until(lambda: not j.pending())
+    assert j.failed() == []
+    assert ids(db) == ["A1"]
+    assert len(calls) >= 2
+
+
+def test_validate_sees_pending_entries_without_rebuilding(tmp_path):
+    # o índice "montado" não conhece A1; a entrada pendente no diário basta para recusar A2
+    j = Journal(str(tmp_path / "j.jsonl"))
+    base = AvailabilityIndex()
+    seen = []
+
+    def validate(ops):
+        def run(pendentes):
+            seen.append(len(pendentes))
+            base.check(ops, AvailabilityIndex.from_ops(pendentes))
+        return run
+
+    a1 = [op_append("agendamentos", appt("A1"))]
+    j.append(a1, "a1", check="check_slots", validate=validate(a1))
+    a2 = [op_append("agendamentos", appt("A2", "09:30"))]
+    with pytest.raises(SlotTaken):
+        j.append(a2, "a2", check="check_slots", validate=validate(a2))
+    a3 = [op_append("agendamentos", appt("A3", "10:00"))]
+    j.append(a3, "a3", check="check_slots", validate=validate(a3))
+    assert seen == [0, 1, 1]
+    assert [e["msg"] for e in j.pending()] == ["a1", "a3"]
@@ -0,0 +1,39 @@
+import io
+import json
+
+import pytest
+
+from conftest import BRANCH, PATH, REPO
+from planilha import import_csv
+from storage import GitHubPartitionedStorage, StorageConflict, empty_db
+
+
+def seed(fake_gh):
+    fake_gh.put(PATH, json.dumps({**empty_db(), "funcionarios": [{"employee_id": "1", "name": "ANA", "active": True}],
+                                  "servicos": [{"service_id": "S1", "name": "CORTE", "duration_min": 60}]}))
+
+
+def six_months_csv():
+    lines = ["appt_id,date,start_time,duration_min,employee_id,employee_name,service_name,status"]
+    lines += [f"A{m},2030-{m:02d}-07,09:00,60,1,ANA,CORTE,booked" for m in range(1, 7)]
+    return io.StringIO("\n".join(lines) + "\n")
+
+
+def month_files(fake_gh):
+    return sorted(p for p in fake_gh.files if p.startswith("db/agendamentos/"))
+
+
+def test_import_spanning_months_is_one_commit(fake_gh):
+    seed(fake_gh)
+    rep = import_csv(GitHubPartitionedStorage(REPO, PATH, BRANCH), {"agendamentos": six_months_csv()})
+    assert rep["gravado"], rep["erros"]
+    assert fake_gh.stats.get("PATCH 200") == 1 and "PUT 200" not in fake_gh.stats
+    assert len(month_files(fake_gh)) == 6
+
+
+def test_failed_import_writes_nothing(fake_gh):
+    seed(fake_gh)
+    fake_gh.p409 = 1.0   # toda gravação perde a corrida
+    with pytest.raises(StorageConflict):
+        import_csv(GitHubPartitionedStorage(REPO, PATH, BRANCH), {"agendamentos": six_months_csv()})
+    assert month_files(fake_gh) == []
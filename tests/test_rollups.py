@@ -0,0 +1,38 @@
+import datetime as dt
+
+from model import Model
+
+
+def appt(appt_id, date, emp="1", status="booked", price="50", svc="CORTE"):
+    return {"appt_id": appt_id, "date": date, "start_time": "09:00", "duration_min": 60, "employee_id": emp,
+            "service_name": svc, "status": status, "final_price": price}
+
+
+def dump(ru):
+    return {d: b for d, b in sorted(ru.days.items())}
+
+
+def test_incremental_matches_full_rebuild():
+    rows = [appt(f"A{i}", f"2030-01-{1 + i % 20:02d}", emp=str(i % 3)) for i in range(200)]
+    old = Model({"agendamentos": rows})
+    changed = rows[:5] + [dict(rows[5], status="cancelled")] + rows[6:] + [appt("N1", "2030-01-25")]
+    changed[10] = dict(changed[10], final_price="80")
+    new = Model({"agendamentos": changed}, prev=old)
+    assert dump(new.rollups) == dump(Model({"agendamentos": changed}).rollups)
+    # dias sem mudança são herdados (mesmo objeto), os tocados são refeitos
+    assert new.rollups.days["2030-01-15"] is old.rollups.days["2030-01-15"]
+    assert new.rollups.days[changed[10]["date"]] is not old.rollups.days[changed[10]["date"]]
+
+
+def test_add_appointment_does_not_leak_into_shared_bucket():
+    rows = [appt("A1", "2030-01-07")]
+    old = Model({"agendamentos": rows})
+    new = Model({"agendamentos": rows}, prev=old)
+    shared = new.rollups.days["2030-01-07"]
+    assert shared is old.rollups.days["2030-01-07"]
+    old.rollups.add_appointment(appt("A2", "2030-01-07"))   # sessão ainda na versão anterior
+    assert new.rollups.totals(dt.date(2030, 1, 7), dt.date(2030, 1, 7))["qtd"] == 1
+    assert old.rollups.totals(dt.date(2030, 1, 7), dt.date(2030, 1, 7))["qtd"] == 2
+    # o dia tocado por add_appointment nunca é herdado como se estivesse em dia com as linhas
+    again = Model({"agendamentos": rows}, prev=old)
+    assert again.rollups.totals(dt.date(2030, 1, 7), dt.date(2030, 1, 7))["qtd"] == 1
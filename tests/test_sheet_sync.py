@@ -0,0 +1,21 @@
+import io
+import json
+
+from conftest import BRANCH, PATH, REPO
+from sheet_sync import sync
+from storage import GitHubPartitionedStorage, empty_db
+
+
+def test_sync_spanning_months_is_one_commit(fake_gh):
+    fake_gh.put(PATH, json.dumps({**empty_db(), "funcionarios": [{"employee_id": "1", "name": "ANA", "active": True}],
+                                  "servicos": [{"service_id": "S1", "name": "CORTE", "duration_min": 60}]}))
+    lines = ["date,start_time,duration_min,employee_id,employee_name,service_name,source_sheet,source_row,status"]
+    lines += [f"2030-{m:02d}-07,09:00,60,1,ANA,CORTE,{m:02d}/2030,5,booked" for m in (1, 2, 3)]
+    csv = "\n".join(lines) + "\n"
+
+    rep = sync(GitHubPartitionedStorage(REPO, PATH, BRANCH), io.StringIO(csv))
+    assert rep["gravado"], rep["erros"]
+    assert fake_gh.stats.get("PATCH 200") == 1 and "PUT 200" not in fake_gh.stats
+    # sincronizar de novo não grava nada
+    rep = sync(GitHubPartitionedStorage(REPO, PATH, BRANCH), io.StringIO(csv))
+    assert not rep["gravado"] and rep["iguais"]["agendamentos"] == 3
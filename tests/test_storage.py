@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import github_api
+from availability import SlotTaken, check_slots
+from conftest import BRANCH, PATH, REPO
+from storage import GitHubJSONStorage, GitHubPartitionedStorage, empty_db, op_append
+
+
+def appt(appt_id, start="09:00", emp="1", date="2030-01-07"):
+    return {"appt_id": appt_id, "date": date, "start_time": start, "duration_min": 60,
+            "employee_id": emp, "status": "booked"}
+
+
+@pytest.mark.parametrize("cls", [GitHubJSONStorage, GitHubPartitionedStorage])
+def test_two_instances_in_one_process(fake_gh, cls):
+    # o cache de ETags é do processo: o 304 que B provoca não pode esconder de A a versão nova
+    fake_gh.put(PATH, json.dumps({**empty_db(), "funcionarios": [{"employee_id": "1", "name": "ANA"}]}))
+    a, b = cls(REPO, PATH, BRANCH), cls(REPO, PATH, BRANCH)
+    a.load(months=["2030-01"])
+    b.load(months=["2030-01"])
+    ok, _ = b.update("funcionarios", "employee_id", "1", {"specialty": "cabelo"}, "b")
+    assert ok
+    b.load(months=["2030-01"])   # B relê: o cache guarda o ETag da versão nova
+    # A grava sobre o sha antigo: 409, relê (304 pelo cache) e precisa enxergar a versão de B
+    ok, _ = a.update("funcionarios", "employee_id", "1", {"name": "ANA MARIA"}, "a")
+    assert ok
+    db, _ = cls(REPO, PATH, BRANCH).load(months=["2030-01"])
+    assert db["funcionarios"] == [{"employee_id": "1", "name": "ANA MARIA", "specialty": "cabelo"}]
+
+
+@pytest.mark.parametrize("cls", [GitHubJSONStorage, GitHubPartitionedStorage])
+def test_concurrent_conflicting_commit_raises_slot_taken(fake_gh, cls):
+    a, b = cls(REPO, PATH, BRANCH), cls(REPO, PATH, BRANCH)
+    a.load(months=["2030-01"])
+    b.load(months=["2030-01"])
+    assert a.commit([op_append("agendamentos", appt("A1", "09:00"))], "a", check=check_slots)
+    # B ainda está na versão antiga (horário livre lá): o 409 faz reler e o check recusa
+    with pytest.raises(SlotTaken):
+        b.commit([op_append("agendamentos", appt("B1", "09:30"))], "b", check=check_slots)
+    assert fake_gh.stats.get("PUT 409") == 1
+    # horário sem conflito na mesma corrida passa
+    assert b.commit([op_append("agendamentos", appt("B2", "10:00"))], "b", check=check_slots)
+    db, _ = cls(REPO, PATH, BRANCH).load(months=["2030-01"])
+    assert sorted(r["appt_id"] for r in db["agendamentos"]) == ["A1", "B2"]
+
+
+def test_multi_month_commit_is_atomic(fake_gh):
+    # A grava jan+fev; B já ocupou o horário de fev: nada de A pode ficar gravado em jan
+    a, b = GitHubPartitionedStorage(REPO, PATH, BRANCH), GitHubPartitionedStorage(REPO, PATH, BRANCH)
+    a.load(months=["2030-01", "2030-02"])
+    b.load(months=["2030-02"])
+    b.commit([op_append("agendamentos", appt("B1", "09:00", date="2030-02-04"))], "b", check=check_slots)
+    with pytest.raises(SlotTaken):
+        a.commit([op_append("agendamentos", appt("A1", "09:00", date="2030-01-07")),
+                  op_append("agendamentos", appt("A2", "09:30", date="2030-02-04"))], "a", check=check_slots)
+    db, _ = GitHubPartitionedStorage(REPO, PATH, BRANCH).load(months=["2030-01", "2030-02"])
+    assert [r["appt_id"] for r in db["agendamentos"]] == ["B1"]
+
+
+def test_multi_month_commit_is_one_commit(fake_gh):
+    s = GitHubPartitionedStorage(REPO, PATH, BRANCH)
+    s.load(months=["2030-01"])
+    s.commit([op_append("agendamentos", appt(f"A{m}", date=f"2030-{m:02d}-07")) for m in range(1, 7)], "lote")
+    assert fake_gh.stats.get("PATCH 200") == 1 and "PUT 200" not in fake_gh.stats
+    # o sha gravado pelo commit é o mesmo que a Contents API conhece: o PUT seguinte não conflita
+    s.commit([op_append("agendamentos", appt("B1", "11:00", date="2030-03-07"))], "b", check=check_slots)
+    assert fake_gh.stats.get("PUT 200") == 1 and "PUT 409" not in fake_gh.stats
+    db, _ = GitHubPartitionedStorage(REPO, PATH, BRANCH).load(months=[f"2030-{m:02d}" for m in range(1, 7)])
+    assert sorted(r["appt_id"] for r in db["agendamentos"]) == ["A1", "A2", "A3", "A4", "A5", "A6", "B1"]
+
+
+@pytest.mark.parametrize("cls", [GitHubJSONStorage, GitHubPartitionedStorage])
+def test_etag_cache_keeps_no_content_and_own_write_is_not_reread(fake_gh, cls):
+    s = cls(REPO, PATH, BRANCH)
+    s.load(months=["2030-01"])
+    s.poll()
+    assert all(set(v) == {"etag", "sha"} for v in github_api._ETAGS.values())
+    s.commit([op_append("agendamentos", appt("A1"))], "a1", check=check_slots)
+    before = fake_gh.stats.get("GET 200", 0)
+    db, _ = s.poll()
+    # só a ref mudou (pelo próprio commit): nenhum arquivo é baixado de novo
+    assert fake_gh.stats.get("GET 200", 0) - before == 1
+    assert [r["appt_id"] for r in db["agendamentos"]] == ["A1"]
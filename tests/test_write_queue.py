@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from availability import SlotTaken, check_slots
+from conftest import BRANCH, PATH, REPO
+from storage import GitHubJSONStorage, GitHubPartitionedStorage, empty_db, op_append, op_update
+from write_queue import WriteQueue
+
+
+def appt(appt_id, start="09:00", emp="1", date="2030-01-07"):
+    return {"appt_id": appt_id, "date": date, "start_time": start, "duration_min": 60,
+            "employee_id": emp, "status": "booked"}
+
+
+def test_mixed_batch_is_one_commit(fake_gh):
+    fake_gh.put(PATH, json.dumps({**empty_db(), "funcionarios": [{"employee_id": "1", "name": "ANA"}],
+                                  "agendamentos": [appt("A0", "14:00")]}))
+    storage = GitHubJSONStorage(REPO, PATH, BRANCH)
+    storage.load()
+    wq = WriteQueue(storage, window=0.5)
+    futures = [
+        wq.submit([op_append("agendamentos", appt("A1", "09:00"))], "a1", check=check_slots),
+        wq.submit([op_update("agendamentos", "appt_id", "A0", {"status": "done"})], "a0 done"),
+        wq.submit([op_append("agendamentos", appt("A2", "09:30"))], "a2", check=check_slots),   # conflita com A1
+        wq.submit([op_update("funcionarios", "employee_id", "1", {"specialty": "cabelo"})], "ana"),
+        wq.submit([op_append("agendamentos", appt("A3", "10:00"))], "a3", check=check_slots),
+    ]
+    with pytest.raises(SlotTaken):
+        futures[2].result(timeout=10)
+    versions = {f.result(timeout=10) for i, f in enumerate(futures) if i != 2}
+    # o item recusado sai do lote antes do PUT: o resto vira um único commit
+    assert len(versions) == 1 and None not in versions
+    assert fake_gh.stats.get("PUT 200") == 1
+    db = json.loads(fake_gh.files[PATH][0])
+    assert {r["appt_id"]: r["status"] for r in db["agendamentos"]} == {"A0": "done", "A1": "booked", "A3": "booked"}
+    assert db["funcionarios"][0]["specialty"] == "cabelo"
+
+
+def test_rejected_multi_month_item_leaves_nothing_behind(fake_gh):
+    storage = GitHubPartitionedStorage(REPO, PATH, BRANCH)
+    storage.load(months=["2030-01", "2030-02"])
+    # outro processo ocupa o horário de fevereiro depois da leitura
+    other = GitHubPartitionedStorage(REPO, PATH, BRANCH)
+    other.commit([op_append("agendamentos", appt("X1", "09:00", date="2030-02-04"))], "x", check=check_slots)
+    wq = WriteQueue(storage, window=0.5)
+    serie = wq.submit([op_append("agendamentos", appt("S1", "09:00", date="2030-01-07")),
+                       op_append("agendamentos", appt("S2", "09:00", date="2030-02-04"))], "serie", check=check_slots)
+    avulso = wq.submit([op_append("agendamentos", appt("A1", "11:00", date="2030-01-07"))], "a1", check=check_slots)
+    with pytest.raises(SlotTaken):
+        serie.result(timeout=10)
+    assert avulso.result(timeout=10)
+    db, _ = GitHubPartitionedStorage(REPO, PATH, BRANCH).load(months=["2030-01", "2030-02"])
+    assert sorted(r["appt_id"] for r in db["agendamentos"]) == ["A1", "X1"]
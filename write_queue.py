@@ -0,0 +1,117 @@
+# write_queue.py — Nessa Coiffeur — Group commit: várias escritas, um commit
+#
+# Uma fila por processo (o app a guarda em st.cache_resource). Escritas que chegam
+# dentro da mesma janela (padrão 250 ms) viram um único Storage.commit — no GitHub,
+# um único PUT/commit — com mensagem combinada. Cada chamador recebe um Future que
+# resolve com a nova versão quando a sua escrita está gravada, ou com a exceção dela.
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from storage import filter_rows
+
+
+class _Rejected(Exception):
+    def __init__(self, pos: int, error: Exception):
+        super().__init__(str(error))
+        self.pos = pos
+        self.error = error
+
+
+def overlay_query(query, ops: list[dict]):
+    """`query` que também enxerga as linhas acrescentadas por `ops` (ainda não gravadas)."""
+    def q(kind, date=None, employee_id=None):
+        extra = [op["row"] for op in ops if op.get("op") == "append" and op.get("kind") == kind]
+        return list(query(kind, date, employee_id)) + filter_rows(extra, date, employee_id)
+    return q
+
+
+def combined_message(msgs: list[str]) -> str:
+    if len(msgs) == 1:
+        return msgs[0]
+    return f"feat: {len(msgs)} escritas agrupadas\n\n" + "\n".join(f"- {m}" for m in msgs)
+
+
+class _Item:
+    __slots__ = ("ops", "msg", "check", "future")
+
+    def __init__(self, ops, msg, check):
+        self.ops, self.msg, self.check = ops, msg, check
+        self.future = Future()
+
+
+class WriteQueue:
+    def __init__(self, storage, window: float = 0.25, max_batch: int = 50):
+        self.storage = storage
+        self.window = window
+        self.max_batch = max_batch
+        self._q: queue.Queue[_Item] = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, ops: list[dict], msg: str, check=None) -> Future:
+        item = _Item(ops, msg, check)
+        self._q.put(item)
+        return item.future
+
+    def commit(self, ops: list[dict], msg: str, check=None, timeout: float | None = 120):
+        """Atalho síncrono: enfileira e espera o commit do lote."""
+        return self.submit(ops, msg, check).result(timeout=timeout)
+
+    # --- thread de gravação ---
+    def _run(self):
+        while True:
+            batch = [self._q.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(self._q.get(timeout=left))
+                except queue.Empty:
+                    break
+            try:
+                self._flush(batch)
+            except Exception as e:  # nunca deixa a thread morrer com chamadores esperando
+                for it in batch:
+                    if not it.future.done():
+                        it.future.set_exception(e)
+
+    def _flush(self, batch: list[_Item]):
+        pending = [it for it in batch if it.future.set_running_or_notify_cancel()]
+        while pending:
+            def check(query, _ops, items=pending):
+                # cada item é validado contra o DB + os itens anteriores do mesmo lote
+                done = []
+                for pos, it in enumerate(items):
+                    if it.check:
+                        try:
+                            it.check(overlay_query(query, done), it.ops)
+                        except Exception as e:
+                            raise _Rejected(pos, e)
+                    done.extend(it.ops)
+
+            ops = [op for it in pending for op in it.ops]
+            try:
+                version = self.storage.commit(ops, combined_message([it.msg for it in pending]), check)
+            except _Rejected as r:
+                # só o item recusado falha; o resto do lote tenta de novo sem ele
+                pending[r.pos].future.set_exception(r.error)
+                pending = pending[:r.pos] + pending[r.pos + 1:]
+                continue
+            except Exception as e:
+                if len(pending) == 1:
+                    pending[0].future.set_exception(e)
+                    return
+                # falha que não é de um check (ex.: RowNotFound): grava um a um para isolar
+                for it in pending:
+                    try:
+                        it.future.set_result(self.storage.commit(it.ops, it.msg, it.check))
+                    except Exception as e1:
+                        it.future.set_exception(e1)
+                return
+            for it in pending:
+                it.future.set_result(version)
+            return